@@ -0,0 +1,158 @@
+"""
+Dynamic Micro-Batching for Sentence Embeddings
+
+Concurrent /query threads each encode a single short string. EmbeddingBatcher
+collects those requests for a short window (or until max_batch_size texts are
+queued), runs one batched forward pass and resolves each caller's future.
+
+It wraps any SentenceTransformer-compatible model and exposes the same
+encode() call, so MathKnowledgeBase can use it transparently
+(EMBEDDING_BATCH_WAIT_MS / EMBEDDING_BATCH_SIZE). The Unix-socket embedding
+service (app/embedding_service.py) uses the same batcher.
+
+No forward pass is wider than max_batch_size, or than the batch_size a caller
+passes to encode(). A bulk request (rebuild, /kb/sync, bulk ingest) is queued
+one chunk at a time, and the next chunk is queued only after the previous one
+is encoded. Queries arriving meanwhile share the next pass instead of waiting
+for the whole request.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent encode requests into batched forward passes"""
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 3.0):
+        """
+        Args:
+            model: SentenceTransformer (or anything with a compatible encode())
+            max_batch_size: Maximum texts per forward pass
+            max_wait_ms: How long the first request in a batch waits for company
+        """
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.requests_served = 0
+        self.batches_run = 0
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_worker(self) -> queue.Queue:
+        """Start the batching thread on first use (and again after a fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+        return self._queue
+
+    def submit(self, texts: List[str], batch_size: Optional[int] = None) -> Future:
+        """
+        Queue texts for encoding.
+
+        Args:
+            texts: Texts to encode
+            batch_size: Maximum texts per forward pass for this request (capped at max_batch_size)
+
+        Returns:
+            Future resolving to a (len(texts), dim) array
+        """
+        texts = list(texts)
+        chunk = min(self.max_batch_size, max(1, batch_size or self.max_batch_size))
+        if len(texts) <= chunk:
+            future: Future = Future()
+            self._ensure_worker().put((texts, future, chunk, True))
+            return future
+
+        result: Future = Future()
+        parts: List[np.ndarray] = []
+
+        def queue_next(done: Optional[Future] = None):
+            # Runs on the batcher thread once the previous chunk is encoded
+            if done is not None:
+                if done.exception() is not None:
+                    result.set_exception(done.exception())
+                    return
+                parts.append(done.result())
+            start = len(parts) * chunk
+            if start >= len(texts):
+                result.set_result(np.concatenate(parts))
+                return
+            part: Future = Future()
+            part.add_done_callback(queue_next)
+            self._ensure_worker().put((texts[start:start + chunk], part, chunk, start + chunk >= len(texts)))
+
+        queue_next()
+        return result
+
+    def encode(self, sentences, convert_to_tensor: bool = False, batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        """SentenceTransformer-compatible encode (1-D for a string, 2-D for a list)"""
+        single = isinstance(sentences, str)
+        vectors = self.submit([sentences] if single else sentences, batch_size=batch_size).result()
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _collect(self, work: queue.Queue) -> List[Tuple[List[str], Future, int, bool]]:
+        """Block for the first request, then gather more until full or the window closes"""
+        batch = [work.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                remaining = deadline - time.perf_counter()
+                item = work.get(timeout=remaining) if remaining > 0 else work.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _run(self, work: queue.Queue):
+        while True:
+            batch = self._collect(work)
+            texts = [text for item_texts, *_ in batch for text in item_texts]
+            # The last item can overshoot max_batch_size, and a request may ask for smaller passes
+            width = min(limit for _, _, limit, _ in batch)
+            try:
+                if texts:
+                    vectors = np.concatenate([
+                        np.asarray(
+                            self.model.encode(texts[start:start + width], convert_to_tensor=False, batch_size=width),
+                            dtype=np.float32
+                        )
+                        for start in range(0, len(texts), width)
+                    ])
+                else:
+                    vectors = np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Batched encode of {len(texts)} texts failed: {e}")
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.requests_served += sum(1 for *_, last in batch if last)  # Chunks of a bulk request count once
+            offset = 0
+            for item_texts, future, _, _ in batch:
+                future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
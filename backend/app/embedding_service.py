@@ -0,0 +1,274 @@
+"""
+Local Embedding Service over a Unix Domain Socket
+
+One process owns the SentenceTransformer and serves encode requests to every
+local process (gunicorn workers, mcp_server.py, scripts), so the model is
+loaded once and concurrent requests are batched into one forward pass.
+
+Run the daemon:
+    python -m app.embedding_service --socket /tmp/math-embed.sock
+
+Point clients at it:
+    EMBEDDING_SOCKET=/tmp/math-embed.sock uvicorn app.main:app
+
+Wire protocol (all integers big-endian):
+    request:  >I length + UTF-8 JSON {"op": "encode", "texts": [...], "batch_size": n (optional)} or {"op": "info"}
+    response: >BI status, length + payload
+              status 0: >II rows, dim + float32 little-endian matrix
+              status 1: UTF-8 error message
+              status 2: UTF-8 JSON (info)
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.embedding_batcher import EmbeddingBatcher
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/math-embed.sock"
+
+STATUS_ARRAY = 0
+STATUS_ERROR = 1
+STATUS_JSON = 2
+
+_REQUEST_HEADER = struct.Struct(">I")
+_RESPONSE_HEADER = struct.Struct(">BI")
+_ARRAY_HEADER = struct.Struct(">II")
+
+
+def _encode_array(vectors: np.ndarray) -> bytes:
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    rows, dim = vectors.shape
+    return _ARRAY_HEADER.pack(rows, dim) + vectors.tobytes()
+
+
+def _decode_array(payload: bytes) -> np.ndarray:
+    rows, dim = _ARRAY_HEADER.unpack_from(payload)
+    return np.frombuffer(payload, dtype="<f4", offset=_ARRAY_HEADER.size).reshape(rows, dim)
+
+
+class EmbeddingServer:
+    """Asyncio Unix-socket server with dynamic micro-batching"""
+
+    def __init__(
+        self,
+        model,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 3.0
+    ):
+        """
+        Args:
+            model: SentenceTransformer (or anything with a compatible encode())
+            socket_path: Filesystem path of the Unix domain socket
+            max_batch_size: Maximum texts per forward pass
+            max_wait_ms: How long to wait for more requests before encoding
+        """
+        self.model = model
+        self.socket_path = socket_path
+        # Encoding runs on the batcher's thread so the event loop keeps accepting requests
+        self.batcher = EmbeddingBatcher(model, max_batch_size, max_wait_ms)
+        self._weights: Optional[str] = None  # Model weights hash for KB artifact checks (computed on first info)
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def serve(self, ready: Optional[threading.Event] = None):
+        """Serve until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(
+            f"Embedding service listening on {self.socket_path} "
+            f"(max_batch_size={self.batcher.max_batch_size}, max_wait={self.batcher.max_wait * 1000:.1f} ms)"
+        )
+        if ready is not None:
+            ready.set()
+
+        try:
+            await self._stop.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logger.info("Embedding service stopped")
+
+    def stop(self):
+        """Stop serving (safe to call from any thread)"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(_REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break  # Client closed the connection
+                (length,) = _REQUEST_HEADER.unpack(header)
+                request = json.loads(await reader.readexactly(length))
+                status, payload = await self._dispatch(request)
+                writer.write(_RESPONSE_HEADER.pack(status, len(payload)) + payload)
+                await writer.drain()
+        except Exception as e:
+            logger.error(f"Embedding client error: {e}")
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> Tuple[int, bytes]:
+        op = request.get("op", "encode")
+        try:
+            if op == "info":
+                if self._weights is None:
+                    from app.kb_artifact import weights_fingerprint
+                    self._weights = await asyncio.to_thread(weights_fingerprint, self.model) or ""
+                info = {
+                    "dim": self.model.get_sentence_embedding_dimension(),
+                    "weights_sha256": self._weights or None,
+                    "requests_served": self.batcher.requests_served,
+                    "batches_run": self.batcher.batches_run
+                }
+                return STATUS_JSON, json.dumps(info).encode("utf-8")
+            if op == "encode":
+                texts = request.get("texts") or []
+                # Bulk requests are encoded in passes of at most max_batch_size (or their batch_size)
+                vectors = await asyncio.wrap_future(self.batcher.submit(texts, batch_size=request.get("batch_size")))
+                return STATUS_ARRAY, _encode_array(vectors)
+            return STATUS_ERROR, f"Unknown op: {op}".encode("utf-8")
+        except Exception as e:
+            return STATUS_ERROR, str(e).encode("utf-8")
+
+
+class RemoteEmbedder:
+    """
+    Drop-in replacement for SentenceTransformer.encode() backed by the embedding service.
+
+    Keeps one connection per thread, so it can be shared by the request threads of a worker.
+    A process forked after the embedder connected (gunicorn --preload) opens its own
+    connection instead of sharing the parent's stream.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._dim: Optional[int] = None
+
+    def _connection(self) -> socket.socket:
+        """One connection per thread (and per process after a fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                conn.close()  # Our copy of the parent's socket; the parent's stays open
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.socket_path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+
+    @staticmethod
+    def _recv_exact(conn: socket.socket, size: int) -> bytes:
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = conn.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError("Embedding service closed the connection")
+            chunks.extend(chunk)
+        return bytes(chunks)
+
+    def _request(self, request: dict) -> Tuple[int, bytes]:
+        body = json.dumps(request).encode("utf-8")
+        frame = _REQUEST_HEADER.pack(len(body)) + body
+        # Retry once on a fresh connection (e.g. after the daemon restarted)
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.sendall(frame)
+                status, length = _RESPONSE_HEADER.unpack(self._recv_exact(conn, _RESPONSE_HEADER.size))
+                return status, self._recv_exact(conn, length)
+            except (ConnectionError, BrokenPipeError, FileNotFoundError, socket.timeout):
+                self._close()
+                if attempt == 1:
+                    raise
+        raise ConnectionError("Embedding service unavailable")
+
+    def encode(self, sentences, convert_to_tensor: bool = False, batch_size: Optional[int] = None, **kwargs) -> np.ndarray:
+        """Encode one string (returns 1-D) or a list of strings (returns 2-D)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        request = {"op": "encode", "texts": texts}
+        if batch_size is not None:
+            request["batch_size"] = batch_size
+        status, payload = self._request(request)
+        if status != STATUS_ARRAY:
+            raise RuntimeError(f"Embedding service error: {payload.decode('utf-8', 'replace')}")
+        vectors = _decode_array(payload)
+        return vectors[0] if single else vectors
+
+    def info(self) -> dict:
+        """Model dimension, weights hash and daemon counters"""
+        status, payload = self._request({"op": "info"})
+        if status != STATUS_JSON:
+            raise RuntimeError(f"Embedding service error: {payload.decode('utf-8', 'replace')}")
+        return json.loads(payload)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        if self._dim is None:
+            self._dim = int(self.info()["dim"])
+        return self._dim
+
+    def weights_fingerprint(self) -> Optional[str]:
+        """Hash of the daemon's model weights (see app/kb_artifact.py)"""
+        return self.info().get("weights_sha256")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings over a Unix domain socket")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SOCKET", DEFAULT_SOCKET_PATH))
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--max-batch-size", type=int, default=int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "3")))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from sentence_transformers import SentenceTransformer
+
+    start = time.perf_counter()
+    model = SentenceTransformer(args.model)
+    logger.info(f"Loaded {args.model} in {time.perf_counter() - start:.1f}s")
+    model.encode("Warm-up: solve x^2 - 1 = 0")
+
+    server = EmbeddingServer(model, args.socket, args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Structural Expression Fingerprints
+
+Many incoming questions are a KB problem with cosmetic differences: other
+variable names, reordered terms, an equation moved to one side. The
+fingerprint of a question is a hash of
+
+    words      content words outside the main expression, synonyms merged and
+               filler dropped ("Solve for x:" -> solve, "find all roots of" -> solve)
+    numbers    numeric literals outside the main expression (bounds, points, ...)
+    structure  the main expression parsed with sympy, expanded, equations as
+               lhs - rhs up to sign, variables renamed canonically (v0, v1, ...)
+
+so "Solve for x: x³ - 3x + 2 = 0" and "solve y**3 + 2 = 3*y" share one
+fingerprint, while "differentiate x^3 - 3x + 2" does not. MathKnowledgeBase
+keeps fingerprint -> problem_id in a FingerprintTable and answers a hit with a
+dict lookup before any embedding is computed (KB_FINGERPRINT_LOOKUP). Writes
+update the table in place, like the topic centroids (app/topic_router.py).
+
+Anything that cannot be fingerprinted safely returns None and the caller falls
+back to dense search: no math span (or several), an unknown multi-letter name,
+no variable, a huge exponent or power tower, a sympy parse error, or sympy not
+installed. Input reaches sympy's parser only after a character whitelist and
+with a namespace limited to single-letter symbols and known functions.
+
+Expansion is the expensive step ("(a+b+c+x+1)^20" expands to 10,626 terms and
+takes over a minute), so the number of terms is bounded from the parsed tree
+before expanding and larger expressions get no fingerprint. The sympy work also
+runs on one worker thread under a hard time budget: a caller waits at most
+_TIME_BUDGET seconds, and while a computation that overran is still running,
+later calls skip fingerprinting instead of queueing behind it.
+"""
+
+import hashlib
+import itertools
+import logging
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.math_canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+# Prose outside the expression is reduced to its content words, with synonyms merged
+_SYNONYMS = {
+    "solution": "solve", "solutions": "solve", "root": "solve", "roots": "solve", "zero": "solve", "zeros": "solve",
+    "differentiate": "derivative", "derivatives": "derivative", "integrate": "integral", "antiderivative": "integral", "int": "integral",
+    "lim": "limit", "factorise": "factor", "factorize": "factor", "maxima": "maximum", "minima": "minimum",
+}
+_STOPWORDS = frozenset(
+    "a all an and are at be by can compute calculate completely determine do equation evaluate exact expression "
+    "find for function given how i if in is it let me of on please polynomial real respect show that the then "
+    "this to value values we what where which with you".split()
+)
+_FUNCTIONS = ("sin", "cos", "tan", "cot", "sec", "csc", "asin", "acos", "atan", "sinh", "cosh", "tanh",
+              "ln", "log", "exp", "sqrt", "abs", "pi")
+_SEPARATORS = re.compile(r"[ ,;]+")
+_MATH_TOKEN = re.compile(r"[a-z0-9^*/+\-=().]+")
+_OPERATOR = re.compile(r"[\^*/+\-=()]")
+_NAME = re.compile(r"[a-z]+")
+_DIFFERENTIAL = re.compile(r"d[a-z]")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_EXPONENT = re.compile(r"\^\(?(\d+)")
+_POWER_TOWER = re.compile(r"\^[a-z0-9.]*\^|\^\([^)]*\^")
+_DEFINITION = re.compile(r"[a-z](\([a-z]\))?")
+_MAX_LENGTH = 120
+_MAX_EXPONENT = 20
+_MAX_RENAMED = 4
+_MAX_TERMS = 64  # Largest expansion fingerprinted (a normal question has a handful of terms)
+_TIME_BUDGET = 0.5  # Seconds a caller waits for sympy
+
+
+def math_runs(text: str) -> List[str]:
+    """Runs of math-looking tokens (containing an operator) in canonical text, in order"""
+    runs, run = [], []
+    # "x:" in "solve for x: ..." is a label and fails the token pattern, ending the run
+    for token in _SEPARATORS.split(text) + [""]:
+        if _MATH_TOKEN.fullmatch(token) and (_OPERATOR.search(token) or token.isdigit()):
+            run.append(token)
+            continue
+        candidate = " ".join(run)
+        if _OPERATOR.search(candidate):
+            runs.append(candidate)
+        run = []
+    return runs
+
+
+def main_expression(text: str) -> Optional[str]:
+    """
+    The run of math-looking tokens in canonical text, or None when there is none
+    or several (a system of equations, a point next to a curve, ...): one
+    fingerprint can't stand for more than one expression.
+    """
+    runs = math_runs(text)
+    return runs[0] if len(runs) == 1 else None
+
+
+def _words(prose: str) -> str:
+    """Sorted content words of the text around the expression (single letters are variable names, dx a differential)"""
+    words = {_SYNONYMS.get(word, word) for word in _NAME.findall(prose) if len(word) > 1 and not _DIFFERENTIAL.fullmatch(word)}
+    return " ".join(sorted(words - _STOPWORDS))
+
+
+@lru_cache(maxsize=1)
+def _parser():
+    """sympy parser, namespace and transformations (None when sympy is missing)"""
+    try:
+        import sympy
+        from sympy.parsing.sympy_parser import (
+            convert_xor, implicit_multiplication_application, parse_expr, standard_transformations
+        )
+    except ImportError:
+        logger.info("sympy not installed: expression fingerprint lookup disabled")
+        return None
+    names = {letter: sympy.Symbol(letter) for letter in "abcdfghjklmnopqrstuvwxyz"}
+    names.update({"e": sympy.E, "i": sympy.I, "pi": sympy.pi, "ln": sympy.log, "abs": sympy.Abs})
+    names.update({name: getattr(sympy, name) for name in _FUNCTIONS if name not in names})
+    builtins = {"Integer": sympy.Integer, "Float": sympy.Float, "Rational": sympy.Rational,
+                "Symbol": sympy.Symbol, "Function": sympy.Function, "__builtins__": {}}
+    transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
+    return sympy, parse_expr, names, builtins, transformations
+
+
+def _safe_structure(expression: str) -> Optional[str]:
+    try:
+        return _structure(expression)
+    except Exception as e:  # sympy raises a wide range of errors on odd input
+        logger.debug(f"No fingerprint for {expression!r}: {e}")
+        return None
+
+
+class _Skipped(Exception):
+    """Not fingerprinted this time (over the time budget, or the worker is still busy with an overrun)"""
+
+
+_worker_state = {"pid": None, "pool": None, "overrun": None}
+_worker_lock = threading.Lock()
+
+
+def _worker() -> dict:
+    """The sympy worker thread of this process (created on first use, and again after a fork)"""
+    with _worker_lock:
+        if _worker_state["pid"] != os.getpid():
+            _worker_state.update(
+                pid=os.getpid(), overrun=None,
+                pool=ThreadPoolExecutor(max_workers=1, thread_name_prefix="expr-fingerprint")
+            )
+        return _worker_state
+
+
+def _structure_within_budget(expression: str) -> Optional[str]:
+    """_safe_structure on the worker thread, raising _Skipped past _TIME_BUDGET"""
+    if _parser() is None:  # Also imports sympy outside the budget
+        return None
+    state = _worker()
+    overrun = state["overrun"]
+    if overrun is not None and not overrun.done():
+        raise _Skipped("still busy with an expression that overran its budget")
+    future = state["pool"].submit(_safe_structure, expression)
+    try:
+        return future.result(timeout=_TIME_BUDGET)
+    except FutureTimeout:
+        if not future.cancel():
+            state["overrun"] = future  # sympy can't be interrupted; it holds the worker until done
+        logger.warning(f"Fingerprint of {expression[:50]!r} skipped: over the {_TIME_BUDGET * 1000:.0f} ms budget")
+        raise _Skipped(expression)
+
+
+def _expanded_terms(expr) -> int:
+    """Upper bound on the number of terms sympy.expand(expr) produces, without expanding"""
+    if expr.is_Add:
+        return sum(_expanded_terms(arg) for arg in expr.args)
+    if expr.is_Mul:
+        return math.prod(_expanded_terms(arg) for arg in expr.args)
+    if expr.is_Pow and expr.exp.is_Integer:
+        # Monomials of degree n in t terms: C(n + t - 1, t - 1)
+        terms = _expanded_terms(expr.base)
+        return math.comb(abs(int(expr.exp)) + terms - 1, terms - 1)
+    return max([1] + [_expanded_terms(arg) for arg in expr.args])
+
+
+def _structure(expression: str) -> Optional[str]:
+    parser = _parser()
+    if parser is None:
+        return None
+    sympy, parse_expr, names, builtins, transformations = parser
+    if len(expression) > _MAX_LENGTH or expression.count("=") > 1:
+        return None
+    if any(name not in names for name in _NAME.findall(expression) if len(name) > 1):
+        return None
+    if _POWER_TOWER.search(expression) or any(int(power) > _MAX_EXPONENT for power in _EXPONENT.findall(expression)):
+        return None  # 9^9^9 would be evaluated exactly
+
+    def parse(side):
+        return parse_expr(side, local_dict=dict(names), global_dict=dict(builtins), transformations=transformations)
+
+    equation = "=" in expression
+    if equation:
+        lhs, rhs = expression.split("=")
+        if _DEFINITION.fullmatch(lhs.strip()):
+            expr, equation = parse(rhs), False  # "f(x) = ..." / "y = ..." defines an expression
+        else:
+            expr = parse(lhs) - parse(rhs)
+    else:
+        expr = parse(expression)
+    if _expanded_terms(expr) > _MAX_TERMS:
+        return None  # "(a+b+c+1)^20" would expand to 1,771 terms
+    expr = sympy.expand(expr)
+    symbols = sorted(expr.free_symbols, key=lambda s: s.name)
+    if not symbols:
+        return None
+
+    forms = [expr, -expr] if equation else [expr]
+    orders = itertools.permutations(symbols) if len(symbols) <= _MAX_RENAMED else [symbols]
+    renamed = []
+    for order in orders:
+        mapping = {symbol: sympy.Symbol(f"v{i}") for i, symbol in enumerate(order)}
+        renamed.extend(sympy.srepr(form.xreplace(mapping)) for form in forms)
+    return min(renamed)
+
+
+@lru_cache(maxsize=4096)
+def _fingerprint_canonical(text: str) -> Optional[str]:
+    expression = main_expression(text)
+    if expression is None:
+        return None
+    structure = _structure_within_budget(expression)
+    if structure is None:
+        return None
+    prose = text.replace(expression, " ")
+    numbers = ",".join(_NUMBER.findall(prose))
+    return hashlib.sha1(f"{_words(prose)}|{numbers}|{structure}".encode("utf-8")).hexdigest()[:20]
+
+
+def expression_fingerprint(question: str) -> Optional[str]:
+    """
+    Structural fingerprint of a question's main expression.
+
+    Args:
+        question: Question as typed (any notation app/math_canonical.py understands)
+
+    Returns:
+        Hex digest, or None when no expression could be fingerprinted
+    """
+    try:
+        return _fingerprint_canonical(canonicalize(question))
+    except _Skipped:
+        return None  # Not cached: the next ask may get a fingerprint
+
+
+def _math_text_key(text: str, runs: List[str]) -> str:
+    if runs:
+        return "runs:" + "|".join(sorted(runs))
+    return "numbers:" + ",".join(sorted(_NUMBER.findall(text)))
+
+
+@lru_cache(maxsize=4096)
+def _math_content_canonical(text: str) -> str:
+    runs = math_runs(text)
+    structure = _structure_within_budget(runs[0]) if len(runs) == 1 else None
+    if structure is not None:
+        return "expr:" + hashlib.sha1(structure.encode("utf-8")).hexdigest()[:20]
+    return _math_text_key(text, runs)
+
+
+def math_content(question: str) -> str:
+    """
+    Key for the math in a question, ignoring its prose: the expression structure
+    (as in the fingerprint) when there is one parseable expression, otherwise the
+    sorted math runs, otherwise the numbers of a word problem. Two questions
+    with different keys are never near-duplicates (see app/kb_dedupe.py).
+    Expressions too large to expand, or over the time budget, are keyed by
+    their math runs.
+    """
+    text = canonicalize(question)
+    try:
+        return _math_content_canonical(text)
+    except _Skipped:
+        return _math_text_key(text, math_runs(text))  # Not cached, like expression_fingerprint
+
+
+class FingerprintTable:
+    """Expression fingerprint -> problem_id of the stored problems, updated incrementally"""
+
+    def __init__(self):
+        self.generation: Optional[int] = None  # KB generation the table reflects (None: never built)
+        self._lock = threading.Lock()
+        self._problems: Dict[str, Tuple[str, Optional[str]]] = {}  # problem_id -> (question, fingerprint)
+        self._owners: Dict[str, Set[str]] = {}  # fingerprint -> problem_ids
+        self._index: Dict[str, str] = {}  # fingerprint -> lowest problem_id
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        return self._index.get(fingerprint)
+
+    def index(self) -> Dict[str, str]:
+        """Fingerprint -> problem_id (when several problems share a fingerprint the lowest problem_id wins)"""
+        return dict(self._index)
+
+    def _own(self, fingerprint: str, problem_id: str, owned: bool):
+        owners = self._owners.setdefault(fingerprint, set())
+        if owned:
+            owners.add(problem_id)
+        else:
+            owners.discard(problem_id)
+        if owners:
+            self._index[fingerprint] = min(owners)
+        else:
+            del self._owners[fingerprint]
+            self._index.pop(fingerprint, None)
+
+    def add(self, payloads: Iterable[Dict]):
+        """Index problems that were just written (replacing their previous questions)"""
+        for payload in payloads:
+            problem_id, question = payload["problem_id"], payload["question"]
+            previous = self._problems.get(problem_id)
+            if previous is not None and previous[0] == question:
+                continue
+            fingerprint = expression_fingerprint(question)  # sympy runs outside the lock
+            with self._lock:
+                self._drop(problem_id)
+                self._problems[problem_id] = (question, fingerprint)
+                if fingerprint is not None:
+                    self._own(fingerprint, problem_id, True)
+
+    def remove(self, problem_ids: Iterable[str]):
+        with self._lock:
+            for problem_id in problem_ids:
+                self._drop(problem_id)
+
+    def _drop(self, problem_id: str):
+        previous = self._problems.pop(problem_id, None)
+        if previous is not None and previous[1] is not None:
+            self._own(previous[1], problem_id, False)
+
+    def reset(self, payloads: Iterable[Dict], generation: int):
+        """Re-index every stored problem, reusing the fingerprints of questions that did not change"""
+        previous = self._problems
+        problems: Dict[str, Tuple[str, Optional[str]]] = {}
+        for payload in payloads:
+            problem_id, question = payload["problem_id"], payload["question"]
+            known = previous.get(problem_id)
+            problems[problem_id] = known if known is not None and known[0] == question else (question, expression_fingerprint(question))
+        owners: Dict[str, Set[str]] = {}
+        for problem_id, (_, fingerprint) in problems.items():
+            if fingerprint is not None:
+                owners.setdefault(fingerprint, set()).add(problem_id)
+        with self._lock:
+            self._problems, self._owners = problems, owners
+            self._index = {fingerprint: min(ids) for fingerprint, ids in owners.items()}
+            self.generation = generation
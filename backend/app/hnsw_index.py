@@ -0,0 +1,269 @@
+"""
+In-process Approximate Nearest-Neighbour Index (HNSW)
+
+The default Qdrant client (local mode) and the mmap backend both search
+exhaustively: every query scores every stored vector. That is fine for
+thousands of problems but grows linearly with the KB, and Qdrant's local mode
+ignores HNSW settings entirely. KB_BACKEND=hnsw keeps the vectors in an
+hnswlib graph instead (optional dependency: `pip install hnswlib`):
+
+    M                graph degree: higher = better recall, more memory, slower build
+    ef_construction  candidate list while inserting: higher = better graph, slower build
+    ef               candidate list per query: higher = better recall, slower search
+
+scripts/bench_ann.py reports recall@k against exact search, p50/p99 latency and
+memory for a grid of M/ef values.
+
+Like the default Qdrant backend the graph lives in each process's memory.
+Searches hold a shared lock; writes take it exclusively for one chunk at a
+time, and a rebuild builds a complete new graph before swapping it in.
+
+Filtered searches (where={"topic": {...}, ...}) take the admitted labels from
+a payload index (see app/payload_index.py). hnswlib's filtered search walks
+the graph past the rejected nodes, so when the selection is small
+(exact_filter_limit) its vectors are scored directly instead, which is both
+faster and exact.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.payload_index import PayloadIndex, Where
+from app.rwlock import RWLock
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HnswVectorIndex:
+    """Approximate cosine-similarity index (hnswlib graph + payloads keyed by problem_id)"""
+
+    def __init__(
+        self,
+        dim: int,
+        m: int = 16,
+        ef_construction: int = 200,
+        ef: int = 64,
+        initial_capacity: int = 1024,
+        write_chunk_size: int = 1024,
+        exact_filter_limit: int = 500
+    ):
+        """
+        Args:
+            dim: Embedding dimension
+            m: Graph degree (links per node)
+            ef_construction: Candidate list size while inserting
+            ef: Candidate list size per query (raised to top_k when smaller)
+            initial_capacity: Elements allocated up front (the graph grows by doubling)
+            write_chunk_size: Points inserted per exclusive lock hold
+            exact_filter_limit: Filtered searches selecting at most this many problems skip the graph
+        """
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("KB_BACKEND=hnsw needs the hnswlib package (pip install hnswlib)") from e
+        self._hnswlib = hnswlib
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.write_chunk_size = max(1, write_chunk_size)
+        self.exact_filter_limit = exact_filter_limit
+        self._rw = RWLock()
+        self._generation = 0
+        self._graph = self._new_graph(max(1, initial_capacity))
+        self._labels: Dict[str, int] = {}
+        self._payloads: Dict[int, Dict] = {}
+        self._payload_index = PayloadIndex()
+        self._next_label = 0
+        self._catalog_cache: Optional[Tuple[int, Dict]] = None
+
+    def _new_graph(self, capacity: int):
+        graph = self._hnswlib.Index(space="cosine", dim=self.dim)
+        graph.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.m, allow_replace_deleted=True)
+        graph.set_ef(self.ef)
+        return graph
+
+    def set_ef(self, ef: int):
+        """Change the per-query candidate list size (recall/latency trade-off)"""
+        with self._rw.write_locked():
+            self.ef = ef
+            self._graph.set_ef(ef)
+
+    # ------------------------------------------------------------------ reads
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def count(self) -> int:
+        return len(self._labels)
+
+    def search(
+        self,
+        vector,
+        top_k: int = 3,
+        score_threshold: float = 0.0,
+        payload_filter: Optional[Callable[[Dict], bool]] = None,
+        where: Optional[Where] = None,
+        hydrate: bool = True
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Return up to top_k (score, payload) pairs with score >= score_threshold (and passing where).
+        The payloads live in process memory and are returned as is, so hydrate=False costs nothing extra.
+        """
+        query = _normalize(vector)
+        with self._rw.read_locked():
+            k = min(top_k, len(self._labels))
+            payloads = self._payloads
+            allowed = self._payload_index.select(where) if where else None
+            if allowed is not None and len(allowed) <= self.exact_filter_limit:
+                hits = self._score_labels(query[0], sorted(allowed), top_k, payload_filter)
+                return [(score, payload) for score, payload in hits if score >= score_threshold]
+            if allowed is not None and payload_filter is not None:
+                label_filter = lambda label: label in allowed and payload_filter(payloads[label])
+            elif allowed is not None:
+                label_filter = allowed.__contains__
+            elif payload_filter is not None:
+                label_filter = lambda label: payload_filter(payloads[label])
+            else:
+                label_filter = None
+            while k > 0:
+                try:
+                    labels, distances = self._graph.knn_query(query, k=k, filter=label_filter)
+                    break
+                except RuntimeError:
+                    # The filter left fewer than k reachable matches
+                    k //= 2
+            else:
+                return []
+            hits = [(1.0 - float(distance), payloads[int(label)]) for label, distance in zip(labels[0], distances[0])]
+        return [(score, payload) for score, payload in hits if score >= score_threshold]
+
+    def _score_labels(self, query: np.ndarray, labels: List[int], top_k: int, payload_filter) -> List[Tuple[float, Dict]]:
+        """Exact best-first (score, payload) pairs among the given labels (read lock held)"""
+        if payload_filter is not None:
+            labels = [label for label in labels if payload_filter(self._payloads[label])]
+        if not labels:
+            return []
+        scores = np.asarray(self._graph.get_items(labels), dtype=np.float32) @ query
+        order = np.argsort(-scores)[:top_k]
+        return [(float(scores[i]), self._payloads[labels[i]]) for i in order]
+
+    def get(self, problem_id: str) -> Optional[Dict]:
+        """Payload of one problem, or None"""
+        label = self._labels.get(problem_id)
+        return self._payloads.get(label) if label is not None else None
+
+    def payloads(self) -> List[Dict]:
+        with self._rw.read_locked():
+            return list(self._payloads.values())
+
+    def vectors(self, problem_ids: List[str]) -> np.ndarray:
+        """Stored (normalized) vectors of existing problems, in the given order"""
+        with self._rw.read_locked():
+            return np.asarray(self._graph.get_items([self._labels[pid] for pid in problem_ids]), dtype=np.float32)
+
+    def catalog(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """problem_id -> (topic, difficulty) (cached per generation)"""
+        cached = self._catalog_cache
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        with self._rw.read_locked():
+            generation = self._generation
+            catalog = {p["problem_id"]: (p.get("topic"), p.get("difficulty")) for p in self._payloads.values()}
+        self._catalog_cache = (generation, catalog)
+        return catalog
+
+    # ----------------------------------------------------------------- writes
+
+    def upsert(self, points: List[Tuple[np.ndarray, Dict]]):
+        """Insert or replace problems (keyed by payload["problem_id"]); unchanged points are skipped"""
+        points = list({payload["problem_id"]: (vector, payload) for vector, payload in points}.values())
+        for offset in range(0, len(points), self.write_chunk_size):
+            chunk = points[offset:offset + self.write_chunk_size]
+            vectors = _normalize(np.stack([np.asarray(vector, dtype=np.float32) for vector, _ in chunk]))
+            with self._rw.write_locked():
+                labels, rows, payloads = [], [], []
+                existing = [self._labels.get(payload["problem_id"]) for _, payload in chunk]
+                known = [label for label in existing if label is not None]
+                stored = dict(zip(known, self._graph.get_items(known))) if known else {}
+                for row, ((_, payload), label) in enumerate(zip(chunk, existing)):
+                    if label is not None and self._payloads[label] == payload and np.allclose(stored[label], vectors[row], atol=1e-5):
+                        continue
+                    if label is None:
+                        label = self._next_label
+                        self._next_label += 1
+                    labels.append(label)
+                    rows.append(row)
+                    payloads.append(payload)
+                if not labels:
+                    continue
+                needed = self._graph.element_count + len(labels)
+                if needed > self._graph.max_elements:
+                    self._graph.resize_index(max(needed, 2 * self._graph.max_elements))
+                self._graph.add_items(vectors[rows], labels, replace_deleted=True)
+                for label, payload in zip(labels, payloads):
+                    previous = self._payloads.get(label)
+                    if previous is not None:
+                        self._payload_index.remove(label, previous)
+                    self._labels[payload["problem_id"]] = label
+                    self._payloads[label] = payload
+                    self._payload_index.add(label, payload)
+                self._generation += 1
+
+    def delete(self, problem_ids: List[str]):
+        """Remove problems by problem_id (their graph slots are reused by later inserts)"""
+        with self._rw.write_locked():
+            removed = 0
+            for problem_id in problem_ids:
+                label = self._labels.pop(problem_id, None)
+                if label is None:
+                    continue
+                self._graph.mark_deleted(label)
+                self._payload_index.remove(label, self._payloads.pop(label))
+                removed += 1
+            if removed:
+                self._generation += 1
+
+    def rebuild(
+        self,
+        vectors: np.ndarray,
+        payloads: List[Dict],
+        validate: Optional[Callable[[int, Callable], None]] = None
+    ) -> int:
+        """
+        Replace the whole index (blue/green).
+
+        A new graph is built next to the live one and, if given, validate(count, search)
+        runs against it; an exception from validate leaves the live graph untouched.
+
+        Returns:
+            The new generation number
+        """
+        staged = HnswVectorIndex(
+            self.dim, m=self.m, ef_construction=self.ef_construction, ef=self.ef,
+            initial_capacity=max(1, len(payloads)), write_chunk_size=max(1, len(payloads)),
+            exact_filter_limit=self.exact_filter_limit
+        )
+        staged.upsert(list(zip(vectors, payloads)))
+        if validate is not None:
+            validate(staged.count(), staged.search)
+        with self._rw.write_locked():
+            self._graph, self._labels, self._payloads = staged._graph, staged._labels, staged._payloads
+            self._payload_index = staged._payload_index
+            self._next_label = staged._next_label
+            self._generation += 1
+            generation = self._generation
+        logger.info(f"HNSW index rebuilt: {len(payloads)} problems (generation {generation})")
+        return generation
@@ -0,0 +1,75 @@
+"""
+One-time initialization primitive shared by threads and asyncio tasks.
+
+The first caller runs the initializer; every concurrent caller (sync or
+async, on any thread or event loop) waits for that single in-progress run
+instead of starting its own. If the initializer fails, all waiters see the
+exception and the next call retries.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class InitOnce:
+    """Run a blocking initializer exactly once"""
+
+    def __init__(self, initializer: Callable[[], None], name: str = "init"):
+        """
+        Args:
+            initializer: Blocking function performing the initialization
+            name: Label used in log messages
+        """
+        self._initializer = initializer
+        self._name = name
+        self._lock = threading.Lock()
+        self._future: Optional[Future] = None
+        self._done = False
+
+    @property
+    def done(self) -> bool:
+        """True once the initializer has completed successfully"""
+        return self._done
+
+    def _claim(self) -> Tuple[Future, bool]:
+        """Return the shared future and whether this caller must run the initializer"""
+        with self._lock:
+            if self._future is None:
+                self._future = Future()
+                return self._future, True
+            return self._future, False
+
+    def _execute(self, future: Future):
+        try:
+            self._initializer()
+        except BaseException as e:
+            logger.error(f"Initialization '{self._name}' failed: {e}")
+            with self._lock:
+                self._future = None  # Allow a later call to retry
+            future.set_exception(e)
+        else:
+            self._done = True
+            future.set_result(None)
+
+    def run(self):
+        """Initialize from synchronous code (blocks until done)"""
+        if self._done:
+            return
+        future, owner = self._claim()
+        if owner:
+            self._execute(future)
+        future.result()
+
+    async def run_async(self):
+        """Initialize from a coroutine without blocking the event loop"""
+        if self._done:
+            return
+        future, owner = self._claim()
+        if owner:
+            await asyncio.to_thread(self._execute, future)
+        await asyncio.wrap_future(future)
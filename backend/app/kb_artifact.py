@@ -0,0 +1,297 @@
+"""
+Canonical KB Seed Dataset and Compiled Index Artifact
+
+The seed problems live in one versioned JSONL file (kb/dataset/math_problems.v1.jsonl).
+`python -m app.kb_artifact build` embeds it once and writes an artifact directory:
+
+    index.bin      embeddings + payloads in the mmap index format (app/mmap_index.py)
+    manifest.json  dataset version and sha256, problem_ids, facet counts and the
+                   embedding model fingerprint
+
+Every entry point (app.main, mcp_server.py, scripts/) seeds its knowledge base with
+seed_knowledge_base(), which loads the precomputed vectors directly and only falls
+back to embedding the dataset when the artifact is missing, was built from a
+different dataset, or was built with a different embedding model.
+
+`python -m app.kb_artifact sync` (or POST /kb/sync) applies dataset edits to an existing
+KB, embedding only new or changed questions (MathKnowledgeBase.sync_problems).
+
+The model fingerprint is the encoder's name, dimension and a sha256 over its
+parameter tensors, so a changed model, revision or local copy with other weights
+is detected without running the model: checking the artifact does no forward
+pass, which keeps it safe in a gunicorn master before fork (PRELOAD_MODEL).
+Encoders without readable weights (test doubles) are compared by name.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.kb_dataset import load_problems
+from app.math_canonical import CANONICAL_VERSION
+from app.mmap_index import read_index, write_index
+
+logger = logging.getLogger(__name__)
+
+_KB_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "kb"))
+DEFAULT_DATASET_PATH = os.path.join(_KB_DIR, "dataset", "math_problems.v1.jsonl")
+DEFAULT_ARTIFACT_PATH = os.path.join(_KB_DIR, "artifact")
+
+FORMAT_VERSION = 2  # 2: model fingerprint from weights instead of probe embeddings
+INDEX_FILE = "index.bin"
+MANIFEST_FILE = "manifest.json"
+
+
+def dataset_path() -> str:
+    return os.getenv("KB_DATASET_PATH") or DEFAULT_DATASET_PATH
+
+
+def artifact_path() -> str:
+    return os.getenv("KB_ARTIFACT_PATH") or DEFAULT_ARTIFACT_PATH
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_version(path: str) -> Dict:
+    """Name, version tag (from a '.vN' file suffix) and content hash of a dataset file"""
+    name = os.path.basename(path)
+    stem = name.rsplit(".", 1)[0]
+    version = stem.rsplit(".", 1)[1] if "." in stem else None
+    return {"file": name, "version": version, "sha256": _sha256(path)}
+
+
+def weights_fingerprint(model) -> Optional[str]:
+    """sha256 over an encoder's parameter tensors (no forward pass), or None if they aren't readable"""
+    from app.embedding_batcher import EmbeddingBatcher
+
+    if isinstance(model, EmbeddingBatcher):
+        model = model.model
+    if hasattr(model, "weights_fingerprint"):
+        return model.weights_fingerprint()  # Embedding service: hashed in the daemon
+    state_dict = getattr(model, "state_dict", None)
+    if state_dict is None:
+        return None
+    digest = hashlib.sha256()
+    for name, tensor in state_dict().items():
+        digest.update(name.encode("utf-8"))
+        digest.update(tensor.detach().cpu().float().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def model_fingerprint(kb) -> Dict:
+    """Embedding model name, dimension, text canonicalization and weights hash for a knowledge base's encoder"""
+    return {
+        "name": kb.embedding_model_name,
+        "canonical_version": CANONICAL_VERSION if kb.canonicalize else None,
+        "dim": int(kb.embedding_model.get_sentence_embedding_dimension()),
+        "weights_sha256": weights_fingerprint(kb.embedding_model)
+    }
+
+
+def _same_model(expected: Dict, actual: Dict) -> bool:
+    if expected.get("dim") != actual["dim"]:
+        return False
+    if expected.get("canonical_version") != actual["canonical_version"]:
+        return False  # Stored vectors were embedded from differently normalized text
+    if expected.get("weights_sha256") and actual["weights_sha256"]:
+        return expected["weights_sha256"] == actual["weights_sha256"]  # Any name or path for the same weights
+    return expected.get("name") == actual["name"]
+
+
+def _write_json(path: str, data: Dict):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def build_artifact(kb, dataset: Optional[str] = None, output: Optional[str] = None, batch_size: int = 64) -> Dict:
+    """
+    Embed the seed dataset and write the index artifact.
+
+    Args:
+        kb: MathKnowledgeBase whose encoder produces the embeddings
+        dataset: JSONL dataset path (default: KB_DATASET_PATH or the bundled dataset)
+        output: Artifact directory (default: KB_ARTIFACT_PATH or kb/artifact)
+        batch_size: Questions per forward pass
+
+    Returns:
+        The manifest that was written
+    """
+    dataset = dataset or dataset_path()
+    output = output or artifact_path()
+    start = time.perf_counter()
+    problems = load_problems(dataset)
+    ids = [p["problem_id"] for p in problems]
+    duplicates = sorted(pid for pid, n in Counter(ids).items() if n > 1)
+    if duplicates:
+        raise ValueError(f"Duplicate problem_ids in {dataset}: {', '.join(duplicates)}")
+
+    embeddings = kb.generate_embeddings([p["question"] for p in problems], batch_size=batch_size)
+    os.makedirs(output, exist_ok=True)
+    index_file = os.path.join(output, INDEX_FILE)
+    write_index(index_file, embeddings, problems, generation=1)
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "dataset": dataset_version(dataset),
+        "count": len(problems),
+        "problem_ids": ids,
+        "facets": {
+            "topic": dict(Counter(p["topic"] for p in problems)),
+            "difficulty": dict(Counter(p["difficulty"] for p in problems))
+        },
+        "model": model_fingerprint(kb),
+        "index_sha256": _sha256(index_file),
+        "build_seconds": round(time.perf_counter() - start, 3)
+    }
+    _write_json(os.path.join(output, MANIFEST_FILE), manifest)
+    logger.info(f"Built KB artifact {output}: {len(problems)} problems from {manifest['dataset']['file']} "
+                f"in {manifest['build_seconds']:.1f}s")
+    return manifest
+
+
+def read_manifest(path: Optional[str] = None) -> Optional[Dict]:
+    """The artifact manifest, or None if there is no artifact at path"""
+    manifest_file = os.path.join(path or artifact_path(), MANIFEST_FILE)
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StaleArtifactError(Exception):
+    """The artifact cannot be used for this dataset or encoder"""
+
+
+def load_artifact(kb, path: Optional[str] = None, dataset: Optional[str] = None) -> Tuple[List[Dict], np.ndarray, Dict]:
+    """
+    Read a compiled artifact after checking it against the dataset and the KB's encoder.
+
+    Returns:
+        (payloads, embeddings, manifest)
+
+    Raises:
+        StaleArtifactError: Missing, corrupt, or built from another dataset/model
+    """
+    path = path or artifact_path()
+    dataset = dataset or dataset_path()
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise StaleArtifactError(f"no artifact at {path}")
+    if manifest.get("format") != FORMAT_VERSION:
+        raise StaleArtifactError(f"unsupported artifact format {manifest.get('format')}")
+    if os.path.exists(dataset) and dataset_version(dataset)["sha256"] != manifest["dataset"]["sha256"]:
+        raise StaleArtifactError(f"artifact was built from a different version of {os.path.basename(dataset)}")
+    index_file = os.path.join(path, INDEX_FILE)
+    if not os.path.exists(index_file) or _sha256(index_file) != manifest["index_sha256"]:
+        raise StaleArtifactError("artifact index is missing or does not match its manifest")
+    if not _same_model(manifest["model"], model_fingerprint(kb)):
+        raise StaleArtifactError(f"artifact was embedded with a different model ({manifest['model'].get('name')})")
+    embeddings, payloads = read_index(index_file)
+    return payloads, embeddings, manifest
+
+
+def seed_knowledge_base(kb, dataset: Optional[str] = None, artifact: Optional[str] = None, embed: bool = True) -> Dict:
+    """
+    Load the canonical seed problems into a knowledge base.
+
+    Uses the precomputed artifact when it matches the dataset and the KB's encoder,
+    otherwise embeds the dataset (and logs why).
+
+    Args:
+        embed: Whether a stale artifact may be replaced by embedding the dataset; with
+            False (gunicorn master before fork) nothing is seeded and the report's
+            source is "deferred", so the caller can seed again after the fork
+
+    Returns:
+        Report with source ("artifact", "dataset" or "deferred"), count, written and seconds
+    """
+    dataset = dataset or dataset_path()
+    artifact = artifact or artifact_path()
+    start = time.perf_counter()
+    try:
+        payloads, embeddings, manifest = load_artifact(kb, artifact, dataset)
+    except StaleArtifactError as e:
+        if not embed:
+            logger.warning(f"Deferring KB seeding until after fork: {e}")
+            return {"source": "deferred", "path": dataset, "count": 0, "written": 0, "reason": str(e),
+                    "seconds": round(time.perf_counter() - start, 3)}
+        logger.warning(f"Embedding the KB seed dataset: {e} (run `python -m app.kb_artifact build`)")
+        problems = load_problems(dataset)
+        # Only new or changed questions are embedded (see MathKnowledgeBase.sync_problems)
+        diff = kb.sync_problems(problems, delete_missing=False)
+        written = diff["added"] + diff["reembedded"] + diff["payload_only"]
+        report = {"source": "dataset", "path": dataset, "dataset": dataset_version(dataset), "count": len(problems),
+                  "written": written, "embedded": diff["embedded"], "reason": str(e)}
+    else:
+        written = kb.upsert_embedded(payloads, embeddings)
+        report = {"source": "artifact", "path": artifact, "dataset": manifest["dataset"], "count": len(payloads),
+                  "written": written}
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Seeded KB from {report['source']} ({report['count']} problems, {written} written) in {report['seconds']:.2f}s")
+    return report
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile the KB seed dataset into a precomputed index artifact")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Embed the dataset and write index.bin + manifest.json")
+    build.add_argument("--dataset", default=None, help="JSONL dataset (default: KB_DATASET_PATH or the bundled dataset)")
+    build.add_argument("--output", default=None, help="Artifact directory (default: KB_ARTIFACT_PATH or kb/artifact)")
+    build.add_argument("--batch-size", type=int, default=64)
+    sub.add_parser("info", help="Print the manifest of the current artifact")
+    sync = sub.add_parser("sync", help="Apply dataset changes to the configured KB, embedding only changed questions")
+    sync.add_argument("--dataset", default=None, help="JSONL dataset (default: KB_DATASET_PATH or the bundled dataset)")
+    sync.add_argument("--keep-missing", action="store_true", help="Do not delete KB problems missing from the dataset")
+    sync.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        manifest = read_manifest()
+        if manifest is None:
+            raise SystemExit(f"No KB artifact at {artifact_path()}")
+        print(json.dumps({k: v for k, v in manifest.items() if k != "problem_ids"}, indent=2, ensure_ascii=False))
+        return
+
+    from app.vector_db import MathKnowledgeBase
+    if args.command == "sync":
+        kb = MathKnowledgeBase()
+        if kb.index is None and kb.store is None:
+            logger.warning("The in-memory KB is discarded on exit: set KB_BACKEND=mmap or KB_STORE_PATH, "
+                           "or call POST /kb/sync on the running server")
+        report = kb.sync_problems(load_problems(args.dataset or dataset_path()),
+                                  delete_missing=not args.keep_missing, dry_run=args.dry_run)
+        print(json.dumps(report, indent=2))
+        return
+
+    manifest = build_artifact(MathKnowledgeBase(), args.dataset, args.output, args.batch_size)
+    print(f"✅ KB artifact built: {manifest['count']} problems, dataset {manifest['dataset']['file']} "
+          f"({manifest['dataset']['sha256'][:12]}), model {manifest['model']['name']}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,47 @@
+"""
+Knowledge Base Source Datasets
+
+Loads math problems from a JSON list or a JSONL file (one problem per line) and
+checks that each record has the fields MathKnowledgeBase.add_problem expects.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("problem_id", "question", "solution_steps", "final_answer", "difficulty", "tags", "topic")
+
+
+def validate_problem(problem: Dict) -> Dict:
+    """Return the problem restricted to KB fields, raising ValueError if one is missing"""
+    missing = [field for field in REQUIRED_FIELDS if field not in problem]
+    if missing:
+        raise ValueError(f"Problem {problem.get('problem_id', '?')} is missing fields: {', '.join(missing)}")
+    return {field: problem[field] for field in REQUIRED_FIELDS}
+
+
+def content_hashes(problem: Dict) -> Tuple[str, str]:
+    """
+    (question hash, payload hash) of a problem.
+
+    Only the question is embedded, so a changed question hash needs a new
+    embedding while a changed payload hash alone only needs a payload update.
+    """
+    question = hashlib.sha256(problem["question"].encode("utf-8")).hexdigest()
+    payload = json.dumps({field: problem[field] for field in REQUIRED_FIELDS}, ensure_ascii=False, sort_keys=True)
+    return question, hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_problems(path: str) -> List[Dict]:
+    """Load problems from a .json (list) or .jsonl file"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    problems = [validate_problem(record) for record in records]
+    logger.info(f"Loaded {len(problems)} problems from {path}")
+    return problems
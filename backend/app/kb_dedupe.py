@@ -0,0 +1,363 @@
+"""
+Near-duplicate Detection at Ingestion (MinHash / LSH)
+
+Bulk imports bring near-duplicates of stored problems, such as the same x^x
+derivative under two ids and with slightly different prose. They waste index
+space and crowd diverse problems out of top-k. A pair counts as a near-duplicate
+only when all three checks pass:
+
+    text    MinHash estimate of the Jaccard similarity of the canonical
+            question's character 4-gram shingles >= jaccard_threshold
+    math    identical math content: the same expression structure, or the same
+            math runs / numbers (app/expr_fingerprint.math_content). "Maclaurin
+            series of sin(x)" and "... of e^x" share most shingles but are different
+            problems. The numbers of one question must also all appear in the
+            other, so "from 0 to 2" vs "from 0 to 3" differ while an added
+            qualifier ("x^x for x > 0") does not
+    vector  cosine similarity of the stored embeddings >= cosine_threshold
+            (skipped when no embeddings are given, e.g. the offline report)
+
+Candidates come from an LSH index (bands x rows of the signature). Band keys
+are prefixed with the numbers of the question's math (regex only, no parse), so
+templated problems that differ only in their coefficients, which share most
+shingles, land in different buckets. Every problem touches `bands` buckets,
+each compared up to max_bucket members, so a bulk import is linear in its
+size. Signatures are computed in numpy over batches of texts; the math key (a
+sympy parse) is only computed for pairs that pass the text test.
+
+MathKnowledgeBase runs the check in upsert_problems with KB_DEDUPE:
+    off     no check
+    report  write everything, log and record the pairs (default)
+    skip    drop incoming near-duplicates
+    merge   drop them and add their tags to the problem they duplicate
+
+Offline report for a dataset file (text and math checks only):
+    python -m app.kb_dedupe kb/dataset/math_problems.v1.jsonl
+"""
+
+import argparse
+import json
+import logging
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from app.expr_fingerprint import math_content, math_runs
+from app.math_canonical import canonicalize
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("off", "report", "skip", "merge")
+SHINGLE_SIZE = 4
+_PRIME = np.uint64((1 << 31) - 1)
+_BATCH_SHINGLES = 1 << 16  # shingles hashed per numpy step (num_perm x this many uint64 temporaries)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def number_key(question: str) -> str:
+    """Sorted numbers of the question's math runs (of the whole text for word problems)"""
+    text = canonicalize(question)
+    runs = math_runs(text)
+    return ",".join(sorted(_NUMBER.findall(" ".join(runs) if runs else text)))
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    """Distinct 4-byte shingles of the canonical text, each packed into one uint32"""
+    data = np.frombuffer(canonicalize(text).encode("utf-8").ljust(SHINGLE_SIZE), dtype=np.uint8).astype(np.uint32)
+    packed = data[:-3] << 24 | data[1:-2] << 16 | data[2:-1] << 8 | data[3:]
+    return np.unique(packed)
+
+
+class MinHasher:
+    """MinHash signatures with num_perm universal hash functions (a * x + b) mod (2^31 - 1)"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)[:, None]
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), num_perm) uint32 signatures, hashed in shingle batches"""
+        out = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        shingles = [_shingle_hashes(text) for text in texts]
+        start = 0
+        while start < len(texts):
+            end, total = start, 0
+            while end < len(texts) and (end == start or total + len(shingles[end]) <= _BATCH_SHINGLES):
+                total += len(shingles[end])
+                end += 1
+            values = np.concatenate(shingles[start:end]).astype(np.uint64) % _PRIME
+            offsets = np.cumsum([0] + [len(s) for s in shingles[start:end - 1]])
+            hashed = (self._a * values[None, :] + self._b) % _PRIME
+            out[start:end] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            start = end
+        return out
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures: problems sharing any band are candidates"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, max_bucket: int = 64):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_bucket = max_bucket
+        self.signatures: Dict[str, np.ndarray] = {}
+        self._prefixes: Dict[str, bytes] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+
+    def _keys(self, signature: np.ndarray, prefix: bytes) -> List[bytes]:
+        return [prefix + signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def add(self, problem_id: str, signature: np.ndarray, prefix: bytes = b""):
+        """Index a signature; only problems with the same key prefix can be candidates"""
+        self.remove(problem_id)
+        self.signatures[problem_id] = signature
+        self._prefixes[problem_id] = prefix
+        for buckets, key in zip(self._buckets, self._keys(signature, prefix)):
+            buckets.setdefault(key, []).append(problem_id)
+
+    def remove(self, problem_id: str):
+        signature = self.signatures.pop(problem_id, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self._keys(signature, self._prefixes.pop(problem_id))):
+            members = buckets.get(key)
+            if members is not None and problem_id in members:
+                members.remove(problem_id)
+                if not members:
+                    del buckets[key]
+
+    def candidates(self, signature: np.ndarray, prefix: bytes = b"") -> Set[str]:
+        """Problems sharing the prefix and at least one band (at most max_bucket per band)"""
+        found: Set[str] = set()
+        for buckets, key in zip(self._buckets, self._keys(signature, prefix)):
+            found.update(buckets.get(key, ())[:self.max_bucket])
+        return found
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+class NearDuplicateDetector:
+    """LSH index of the stored problems plus the three-way near-duplicate test"""
+
+    def __init__(
+        self,
+        action: str = "report",
+        jaccard_threshold: float = 0.5,
+        cosine_threshold: float = 0.85,
+        num_perm: int = 128,
+        bands: int = 32,
+        max_bucket: int = 64
+    ):
+        """
+        Args:
+            action: "report", "skip" or "merge" (see module docstring)
+            jaccard_threshold: Minimum estimated shingle Jaccard similarity
+            cosine_threshold: Minimum embedding cosine similarity
+            num_perm: MinHash signature length
+            bands: LSH bands (rows per band = num_perm / bands; the candidate
+                probability is 1 - (1 - J^rows)^bands, about 0.87 at J = 0.5 with the defaults)
+            max_bucket: Members compared per LSH bucket (bounds the work per problem)
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown dedupe action: {action!r} (expected one of {', '.join(ACTIONS)})")
+        self.action = action
+        self.jaccard_threshold = jaccard_threshold
+        self.cosine_threshold = cosine_threshold
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(num_perm, bands, max_bucket)
+        self.generation: Optional[int] = None
+        self._math: Dict[str, str] = {}
+        self._questions: Dict[str, str] = {}
+
+    def load(self, payloads: Iterable[Dict], generation: Optional[int] = None):
+        """(Re)index stored problems, reusing the signatures of questions that did not change"""
+        previous, signatures, prefixes, maths = self._questions, self.index.signatures, self.index._prefixes, self._math
+        self.index = LSHIndex(self.hasher.num_perm, self.index.bands, self.index.max_bucket)
+        self._math, self._questions = {}, {}
+        fresh = []
+        for payload in payloads:
+            problem_id = payload["problem_id"]
+            if previous.get(problem_id) == payload["question"]:
+                self._add(payload, signatures[problem_id], prefixes[problem_id], maths.get(problem_id))
+            else:
+                fresh.append(payload)
+        self.add(fresh)
+        self.generation = generation
+
+    def _add(self, payload: Dict, signature: np.ndarray, prefix: bytes, math: Optional[str] = None):
+        problem_id = payload["problem_id"]
+        self.index.add(problem_id, signature, prefix)
+        self._questions[problem_id] = payload["question"]
+        if math is not None:
+            self._math[problem_id] = math
+
+    def _stored_math(self, problem_id: str) -> str:
+        math = self._math.get(problem_id)
+        if math is None:
+            math = self._math[problem_id] = math_content(self._questions[problem_id])
+        return math
+
+    def add(self, payloads: List[Dict]):
+        """Index problems that were just written"""
+        if not payloads:
+            return
+        for payload, signature in zip(payloads, self.hasher.signatures([p["question"] for p in payloads])):
+            self._add(payload, signature, _prefix(payload))
+
+    def remove(self, problem_ids: Iterable[str]):
+        for problem_id in problem_ids:
+            self.index.remove(problem_id)
+            self._math.pop(problem_id, None)
+            self._questions.pop(problem_id, None)
+
+    def check(
+        self,
+        payloads: List[Dict],
+        embeddings: Optional[np.ndarray] = None,
+        stored_vectors: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+    ) -> List[Dict]:
+        """
+        Find near-duplicates of incoming problems among the indexed ones and
+        earlier problems of the same batch. The index itself is not modified.
+
+        Args:
+            payloads: Incoming problems (problem_id, question, tags, ...)
+            embeddings: Their question embeddings, row-aligned (None skips the vector test)
+            stored_vectors: Looks up embeddings of indexed problems by problem_id (needed
+                with embeddings; problems it does not return are not duplicates)
+
+        Returns:
+            One entry per incoming duplicate: problem_id, duplicate_of (an indexed
+            problem or an earlier non-duplicate of the batch), jaccard, cosine
+        """
+        if not payloads:
+            return []
+        signatures = self.hasher.signatures([p["question"] for p in payloads])
+        maths: List[Optional[str]] = [None] * len(payloads)
+
+        def batch_math(row: int) -> str:
+            if maths[row] is None:
+                maths[row] = math_content(payloads[row]["question"])
+            return maths[row]
+        batch = LSHIndex(self.hasher.num_perm, self.index.bands, self.index.max_bucket)
+        batch_rows: Dict[str, int] = {}
+
+        # Text + math tests first; vectors of the stored candidates are then fetched in one call
+        pending = []
+        for row, (payload, signature) in enumerate(zip(payloads, signatures)):
+            problem_id = payload["problem_id"]
+            prefix = _prefix(payload)
+            matches = []
+            for other in self.index.candidates(signature, prefix) | batch.candidates(signature, prefix):
+                if other == problem_id:
+                    continue  # an update of the same problem
+                in_batch = other in batch_rows
+                other_signature = signatures[batch_rows[other]] if in_batch else self.index.signatures[other]
+                jaccard = estimated_jaccard(signature, other_signature)
+                other_question = payloads[batch_rows[other]]["question"] if in_batch else self._questions[other]
+                if jaccard < self.jaccard_threshold or not nested_numbers(payload["question"], other_question):
+                    continue
+                other_math = batch_math(batch_rows[other]) if in_batch else self._stored_math(other)
+                if other_math == batch_math(row):
+                    matches.append((other, in_batch, jaccard))
+            pending.append((row, matches))
+            batch.add(problem_id, signature, prefix)
+            batch_rows[problem_id] = row
+
+        vectors: Dict[str, np.ndarray] = {}
+        if embeddings is not None:
+            stored = sorted({other for _, matches in pending for other, in_batch, _ in matches if not in_batch})
+            if stored and stored_vectors is not None:
+                vectors = stored_vectors(stored)
+
+        duplicates, dropped = [], {}
+        for row, matches in pending:
+            best = None
+            for other, in_batch, jaccard in matches:
+                cosine = None
+                if embeddings is not None:
+                    other_vector = embeddings[batch_rows[other]] if in_batch else vectors.get(other)
+                    if other_vector is None:
+                        continue
+                    cosine = _cosine(embeddings[row], other_vector)
+                    if cosine < self.cosine_threshold:
+                        continue
+                score = (cosine if cosine is not None else 0.0, jaccard)
+                if best is None or score > best[0]:
+                    best = (score, other, jaccard, cosine)
+            if best is None:
+                continue
+            _, other, jaccard, cosine = best
+            problem_id = payloads[row]["problem_id"]
+            # A duplicate of a dropped batch problem resolves to what that one duplicated
+            target = dropped.get(other, other) if self.action != "report" else other
+            duplicates.append({
+                "problem_id": problem_id,
+                "duplicate_of": target,
+                "jaccard": round(jaccard, 3),
+                "cosine": round(cosine, 4) if cosine is not None else None
+            })
+            if self.action != "report":
+                dropped[problem_id] = target
+        return duplicates
+
+
+@lru_cache(maxsize=65536)
+def _numbers(question: str) -> Counter:
+    return Counter(_NUMBER.findall(canonicalize(question)))
+
+
+def nested_numbers(a: str, b: str) -> bool:
+    """Whether the numbers of one question all appear in the other"""
+    numbers_a, numbers_b = _numbers(a), _numbers(b)
+    return not numbers_a - numbers_b or not numbers_b - numbers_a
+
+
+def _prefix(payload: Dict) -> bytes:
+    return number_key(payload["question"]).encode("ascii") + b"|"
+
+
+def _cosine(a, b) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    denominator = float(np.linalg.norm(a) * np.linalg.norm(b))
+    return float(a @ b) / denominator if denominator else 0.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.kb_dataset import load_problems
+
+    parser = argparse.ArgumentParser(description="Report near-duplicate problems in a dataset (text and math checks)")
+    parser.add_argument("dataset", help="JSONL/JSON problems file")
+    parser.add_argument("--jaccard", type=float, default=0.5)
+    parser.add_argument("--bands", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    problems = load_problems(args.dataset)
+    detector = NearDuplicateDetector("report", jaccard_threshold=args.jaccard, bands=args.bands)
+    duplicates = detector.check(problems)
+    report = {
+        "dataset": args.dataset,
+        "problems": len(problems),
+        "duplicates": duplicates,
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""
+Background Ingestion Queue for Runtime KB Writes
+
+The /kb/problems endpoints enqueue upserts and deletes here and return
+immediately. A single ingestion thread drains the queue in batches, so the
+questions of many queued problems are embedded in one forward pass
+(MathKnowledgeBase.upsert_problems), and records a per-problem status that
+clients can poll.
+
+Statuses: queued -> indexing -> indexed | duplicate | deleted | failed
+(duplicate: dropped as a near-duplicate with KB_DEDUPE=skip/merge, see app/kb_dedupe.py)
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+
+class KBIngestQueue:
+    """Serialize runtime KB writes onto one batching thread"""
+
+    def __init__(self, kb, batch_size: int = 32, max_wait_ms: float = 50.0, max_tracked: int = 10000):
+        """
+        Args:
+            kb: MathKnowledgeBase receiving the writes
+            batch_size: Maximum problems embedded per forward pass
+            max_wait_ms: How long to wait for more items before writing a batch
+            max_tracked: Number of per-problem statuses kept (oldest are forgotten first)
+        """
+        self.kb = kb
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_tracked = max_tracked
+        self._statuses: "OrderedDict[str, Dict]" = OrderedDict()
+        self._status_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_worker(self) -> queue.Queue:
+        """Start the ingestion thread on first use (and again after a fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name="kb-ingest", daemon=True)
+                self._thread.start()
+        return self._queue
+
+    # ----------------------------------------------------------------- status
+
+    def _set_status(self, problem_id: str, op: str, status: str, error: Optional[str] = None):
+        with self._status_lock:
+            self._statuses.pop(problem_id, None)
+            self._statuses[problem_id] = {
+                "problem_id": problem_id,
+                "op": op,
+                "status": status,
+                "error": error,
+                "updated_at": time.time()
+            }
+            while len(self._statuses) > self.max_tracked:
+                self._statuses.popitem(last=False)
+
+    def status(self, problem_id: str) -> Optional[Dict]:
+        """Latest indexing status of a problem submitted through this queue"""
+        with self._status_lock:
+            entry = self._statuses.get(problem_id)
+            return dict(entry) if entry else None
+
+    def pending(self, problem_id: str) -> Optional[str]:
+        """The queued/in-progress op for a problem, if any"""
+        entry = self.status(problem_id)
+        if entry and entry["status"] in ("queued", "indexing"):
+            return entry["op"]
+        return None
+
+    # ----------------------------------------------------------------- submit
+
+    def submit_upserts(self, problems: List[Dict]) -> List[str]:
+        """Queue problems to add or replace; returns their problem_ids"""
+        work = self._ensure_worker()
+        for problem in problems:
+            self._set_status(problem["problem_id"], OP_UPSERT, "queued")
+            work.put((OP_UPSERT, problem))
+        return [p["problem_id"] for p in problems]
+
+    def submit_deletes(self, problem_ids: List[str]) -> List[str]:
+        """Queue problems to delete; returns their problem_ids"""
+        work = self._ensure_worker()
+        for problem_id in problem_ids:
+            self._set_status(problem_id, OP_DELETE, "queued")
+            work.put((OP_DELETE, problem_id))
+        return list(problem_ids)
+
+    def join(self):
+        """Block until everything queued so far has been written"""
+        self._ensure_worker().join()
+
+    # ----------------------------------------------------------------- worker
+
+    def _collect(self, work: queue.Queue) -> List[Tuple[str, object]]:
+        batch = [work.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.perf_counter()
+                batch.append(work.get(timeout=remaining) if remaining > 0 else work.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _apply(self, op: str, items: list):
+        """Write one run of same-op items"""
+        ids = [item["problem_id"] for item in items] if op == OP_UPSERT else list(items)
+        for problem_id in ids:
+            self._set_status(problem_id, op, "indexing")
+        report = {}
+        try:
+            if op == OP_UPSERT:
+                self.kb.upsert_problems(items, batch_size=self.batch_size, dedupe_report=report)
+            else:
+                self.kb.delete_problems(ids)
+        except Exception as e:
+            if len(items) > 1:
+                # Retry one by one, so a bad record fails alone instead of with its whole batch
+                logger.warning(f"KB ingest batch of {len(ids)} {op}s failed ({e}); retrying them one by one")
+                for item in items:
+                    self._apply(op, [item])
+                return
+            logger.error(f"KB ingest {op} of {ids[0]} failed: {e}")
+            self._set_status(ids[0], op, "failed", str(e))
+            return
+        done = "indexed" if op == OP_UPSERT else "deleted"
+        dropped = {}
+        if report.get("action") in ("skip", "merge"):
+            dropped = {d["problem_id"]: d["duplicate_of"] for d in report["duplicates"]}
+        for problem_id in ids:
+            if problem_id in dropped:
+                self._set_status(problem_id, op, "duplicate", f"near-duplicate of {dropped[problem_id]}")
+            else:
+                self._set_status(problem_id, op, done)
+
+    def _run(self, work: queue.Queue):
+        while True:
+            batch = self._collect(work)
+            try:
+                # Keep submission order: apply consecutive runs of the same op together
+                run_op, run_items = None, []
+                for op, item in batch:
+                    if op != run_op and run_items:
+                        self._apply(run_op, run_items)
+                        run_items = []
+                    run_op = op
+                    run_items.append(item)
+                if run_items:
+                    self._apply(run_op, run_items)
+                logger.info(f"KB ingest wrote {len(batch)} items")
+            finally:
+                for _ in batch:
+                    work.task_done()
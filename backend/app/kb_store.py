@@ -0,0 +1,171 @@
+"""
+Shared Persistent KB Store (SQLite)
+
+With several gunicorn workers each holding its own QdrantClient(":memory:"),
+a problem written through one worker is invisible to the others. KBStore is
+the shared source of truth: every write goes to one SQLite file (WAL mode)
+and is stamped with the next value of a generation counter. Each worker
+remembers the last generation it applied and, at most every
+KB_SYNC_INTERVAL_MS, compares it with the store's counter (one indexed
+read); when it moved, only the rows with a newer seq are fetched and applied.
+
+Deleted problems are kept as tombstones so the deletion reaches every worker.
+Vectors are stored as float32 bytes, so syncing never re-embeds anything.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS problems (
+    problem_id TEXT PRIMARY KEY,
+    payload TEXT,
+    vector BLOB,
+    seq INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS problems_seq ON problems (seq);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+
+def _dumps(payload: Dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class KBStore:
+    """Problems, vectors and a generation counter shared by all processes"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Args:
+            path: SQLite database file shared by all workers
+            timeout: Seconds to wait for another process's write transaction
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (and per process after a fork)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def generation(self) -> int:
+        """Current generation (bumped by every committed write)"""
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def unchanged(self, payloads: Iterable[Dict]) -> Set[str]:
+        """problem_ids whose stored payload is identical (nothing to embed or write)"""
+        payloads = list(payloads)
+        if not payloads:
+            return set()
+        conn = self._conn()
+        wanted = {p["problem_id"]: _dumps(p) for p in payloads}
+        same = set()
+        ids = list(wanted)
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            rows = conn.execute(
+                f"SELECT problem_id, payload FROM problems WHERE deleted = 0 AND problem_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            same.update(pid for pid, payload in rows if payload == wanted[pid])
+        return same
+
+    def _write(self, apply) -> int:
+        """Run apply(conn, seq) in one write transaction stamped with the next generation"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0] + 1
+            apply(conn, seq)
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (seq,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return seq
+
+    @staticmethod
+    def _upsert_rows(conn: sqlite3.Connection, seq: int, payloads: List[Dict], vectors: np.ndarray):
+        conn.executemany(
+            "INSERT INTO problems (problem_id, payload, vector, seq, deleted) VALUES (?, ?, ?, ?, 0) "
+            "ON CONFLICT (problem_id) DO UPDATE SET payload = excluded.payload, vector = excluded.vector, "
+            "seq = excluded.seq, deleted = 0",
+            [
+                (payload["problem_id"], _dumps(payload), np.asarray(vector, dtype="<f4").tobytes(), seq)
+                for payload, vector in zip(payloads, vectors)
+            ]
+        )
+
+    def upsert(self, payloads: List[Dict], vectors: np.ndarray) -> int:
+        """Insert or replace problems; returns the new generation"""
+        return self._write(lambda conn, seq: self._upsert_rows(conn, seq, payloads, vectors))
+
+    def delete(self, problem_ids: List[str]) -> int:
+        """Tombstone problems; returns the new generation"""
+        def apply(conn, seq):
+            conn.executemany(
+                "UPDATE problems SET deleted = 1, payload = NULL, vector = NULL, seq = ? WHERE problem_id = ? AND deleted = 0",
+                [(seq, pid) for pid in problem_ids]
+            )
+        return self._write(apply)
+
+    def replace_all(self, payloads: List[Dict], vectors: np.ndarray) -> int:
+        """Make the store hold exactly these problems (used by blue/green rebuilds)"""
+        keep = {p["problem_id"] for p in payloads}
+
+        def apply(conn, seq):
+            stale = [pid for (pid,) in conn.execute("SELECT problem_id FROM problems WHERE deleted = 0") if pid not in keep]
+            conn.executemany(
+                "UPDATE problems SET deleted = 1, payload = NULL, vector = NULL, seq = ? WHERE problem_id = ?",
+                [(seq, pid) for pid in stale]
+            )
+            self._upsert_rows(conn, seq, payloads, vectors)
+        return self._write(apply)
+
+    def changes_since(self, generation: int) -> Tuple[List[Tuple[Dict, np.ndarray]], List[str], int]:
+        """
+        Rows written after a generation.
+
+        Returns:
+            (upserts as (payload, vector) pairs, deleted problem_ids, current generation)
+        """
+        conn = self._conn()
+        # One read transaction so the rows and the generation are consistent
+        conn.execute("BEGIN")
+        try:
+            current = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            rows = conn.execute(
+                "SELECT problem_id, payload, vector, deleted FROM problems WHERE seq > ? AND seq <= ? ORDER BY seq",
+                (generation, current)
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        upserts, deleted = [], []
+        for problem_id, payload, vector, is_deleted in rows:
+            if is_deleted:
+                deleted.append(problem_id)
+            else:
+                upserts.append((json.loads(payload), np.frombuffer(vector, dtype="<f4")))
+        return upserts, deleted, current
@@ -3,9 +3,11 @@ LangGraph Workflow for Agentic RAG Math Agent
 Orchestrates the decision flow: DB Search → Perplexity Analysis → Web Search → Not Found
 """
 
-from typing import TypedDict, Annotated, Literal
+from typing import TypedDict, Annotated, Literal, Optional
 from langgraph.graph import StateGraph, END
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +15,8 @@ logger = logging.getLogger(__name__)
 class RAGState(TypedDict):
     """State for the RAG workflow"""
     question: str
-    difficulty: str
+    difficulty: str  # KB prefilter (None searches every difficulty)
+    topic: str       # KB prefilter, subtopics included (None searches every topic)
     kb_results: list
     confidence: str
     confidence_score: float
@@ -23,59 +26,101 @@ class RAGState(TypedDict):
     source: str
     note: str
     error: str
+    timings: dict  # Stage durations in seconds (embed, kb_search, llm)
+
+
+# Executors for running the workflow graph
+EXECUTOR_LANGGRAPH = "langgraph"  # StateGraph.invoke (default)
+EXECUTOR_DIRECT = "direct"        # Plain function calls, same nodes and routers
+EXECUTORS = (EXECUTOR_LANGGRAPH, EXECUTOR_DIRECT)
+
+ENTRY_NODE = "search_database"
 
 
 class MathRAGWorkflow:
     """LangGraph workflow for math problem solving"""
     
-    def __init__(self, kb, perplexity_fn):
+    def __init__(self, kb, perplexity_fn, executor: Optional[str] = None):
         """
         Initialize workflow with dependencies
         
         Args:
             kb: Knowledge base instance
             perplexity_fn: Function to call Perplexity API
+            executor: "langgraph" or "direct" (defaults to WORKFLOW_EXECUTOR env var, then "langgraph")
         """
         self.kb = kb
         self.perplexity_fn = perplexity_fn
-        self.graph = self._build_graph()
+        self.executor = (executor or os.getenv("WORKFLOW_EXECUTOR", EXECUTOR_LANGGRAPH)).lower()
+        if self.executor not in EXECUTORS:
+            raise ValueError(f"Unknown workflow executor '{self.executor}', expected one of {EXECUTORS}")
+        
+        # Graph topology shared by both executors
+        self.nodes = {
+            "search_database": self.search_database,
+            "perplexity_analyze": self.perplexity_analyze,
+            "not_found": self.not_found,
+        }
+        self.conditional_edges = {
+            "search_database": (
+                self.route_after_db_search,
+                {
+                    "perplexity_analyze": "perplexity_analyze",  # Always go to Perplexity
+                }
+            ),
+            "perplexity_analyze": (
+                self.route_after_perplexity,
+                {
+                    "success": END,      # Perplexity succeeded
+                    "not_found": "not_found"  # Perplexity failed
+                }
+            ),
+        }
+        self.edges = {
+            "not_found": END,  # Not found leads to end
+        }
+        
+        self.graph = self._build_graph() if self.executor == EXECUTOR_LANGGRAPH else None
     
     def _build_graph(self):
         """Build the LangGraph workflow"""
         workflow = StateGraph(RAGState)
         
         # Add nodes (steps in the workflow)
-        workflow.add_node("search_database", self.search_database)
-        workflow.add_node("perplexity_analyze", self.perplexity_analyze)
-        workflow.add_node("not_found", self.not_found)
+        for name, node in self.nodes.items():
+            workflow.add_node(name, node)
         
         # Define entry point
-        workflow.set_entry_point("search_database")
+        workflow.set_entry_point(ENTRY_NODE)
         
         # Add conditional edges based on decision logic
-        workflow.add_conditional_edges(
-            "search_database",
-            self.route_after_db_search,
-            {
-                "perplexity_analyze": "perplexity_analyze",  # Always go to Perplexity
-            }
-        )
-        
-        # Perplexity analysis has conditional routing
-        workflow.add_conditional_edges(
-            "perplexity_analyze",
-            self.route_after_perplexity,
-            {
-                "success": END,      # Perplexity succeeded
-                "not_found": "not_found"  # Perplexity failed
-            }
-        )
+        for source, (router, path_map) in self.conditional_edges.items():
+            workflow.add_conditional_edges(source, router, path_map)
         
-        # Not found leads to end
-        workflow.add_edge("not_found", END)
+        for source, target in self.edges.items():
+            workflow.add_edge(source, target)
         
         return workflow.compile()
     
+    def _run_direct(self, state: RAGState) -> RAGState:
+        """
+        Fast-path executor: walk the same nodes and routers without LangGraph.
+        
+        Avoids per-step state copying, channel bookkeeping and validation; the
+        graph is linear with trivial routers so plain calls are equivalent.
+        """
+        state = dict(state)
+        node = ENTRY_NODE
+        while node != END:
+            state = self.nodes[node](state)
+            if node in self.conditional_edges:
+                router, path_map = self.conditional_edges[node]
+                node = path_map[router(state)]
+            else:
+                node = self.edges[node]
+        # Match graph.invoke, which only returns declared state keys
+        return {key: state[key] for key in RAGState.__annotations__ if key in state}
+    
     def search_database(self, state: RAGState) -> RAGState:
         """
         Node 1: Search knowledge base for similar problems
@@ -83,13 +128,26 @@ class MathRAGWorkflow:
         logger.info(f"🔍 [Node 1: DB Search] Searching for: {state['question']}")
         
         try:
-            # Search KB
+            # Search KB (lightweight hits: only the best match is needed in full)
             kb_results = self.kb.search_similar(
                 state['question'],
                 top_k=3,
-                score_threshold=0.5
+                score_threshold=0.5,
+                timings=state['timings'],
+                topic_filter=state.get('topic'),
+                difficulty_filter=state.get('difficulty'),
+                hydrate=False
             )
             
+            if kb_results:
+                best_match = self.kb.hydrate(kb_results[:1], timings=state['timings'])[0]
+                if "question" not in best_match:
+                    # Deleted between search and hydrate: no problem to give Perplexity as context
+                    logger.warning(f"⚠️ Best match {best_match.get('problem_id')} was deleted before hydration")
+                    kb_results = []
+                else:
+                    state['best_match'] = best_match
+            
             # Calculate confidence
             confidence, best_score = self.kb.get_retrieval_confidence(kb_results)
             
@@ -98,7 +156,6 @@ class MathRAGWorkflow:
             state['confidence_score'] = best_score
             
             if kb_results:
-                state['best_match'] = kb_results[0]
                 logger.info(f"✅ Found {len(kb_results)} matches. Best: {best_score:.2%}")
             else:
                 logger.info(f"❌ No matches found in database")
@@ -150,7 +207,9 @@ Difficulty: {best_match.get('difficulty')}
 Please analyze if this database solution applies to the user's question. If it's the same problem, explain the solution step-by-step. If it's different, solve the user's question step-by-step."""
                 
                 # Call Perplexity with DB context
+                llm_start = time.perf_counter()
                 perplexity_response = self.perplexity_fn(enriched_question)
+                state['timings']['llm'] = time.perf_counter() - llm_start
                 
                 state['perplexity_response'] = perplexity_response
                 state['final_answer'] = perplexity_response
@@ -170,7 +229,9 @@ Please analyze if this database solution applies to the user's question. If it's
             
             try:
                 # Call Perplexity for web search
+                llm_start = time.perf_counter()
                 perplexity_response = self.perplexity_fn(state['question'])
+                state['timings']['llm'] = time.perf_counter() - llm_start
                 
                 state['perplexity_response'] = perplexity_response
                 state['final_answer'] = perplexity_response
@@ -229,13 +290,14 @@ This question could not be answered because:
         
         return state
     
-    def run(self, question: str, difficulty: str = "JEE_Main") -> dict:
+    def run(self, question: str, difficulty: Optional[str] = None, topic: Optional[str] = None) -> dict:
         """
         Execute the workflow
         
         Args:
             question: Math question to solve
-            difficulty: Difficulty level
+            difficulty: Only search KB problems of this difficulty (None: all)
+            topic: Only search KB problems of this topic or its subtopics (None: all)
             
         Returns:
             Final state with answer
@@ -249,6 +311,7 @@ This question could not be answered because:
         initial_state = RAGState(
             question=question,
             difficulty=difficulty,
+            topic=topic,
             kb_results=[],
             confidence='none',
             confidence_score=0.0,
@@ -258,11 +321,15 @@ This question could not be answered because:
             final_answer='',
             source='',
             note='',
-            error=''
+            error='',
+            timings={}
         )
         
         # Run the graph
-        final_state = self.graph.invoke(initial_state)
+        if self.executor == EXECUTOR_DIRECT:
+            final_state = self._run_direct(initial_state)
+        else:
+            final_state = self.graph.invoke(initial_state)
         
         logger.info(f"\n{'='*60}")
         logger.info(f"✨ Workflow Complete!")
@@ -1,19 +1,30 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, Depends, Header
+from fastapi.responses import JSONResponse, FileResponse, HTMLResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
+import time
+import secrets
+import asyncio
 import logging
 import requests
 from typing import Optional, List, Dict
+from contextlib import contextmanager
 
 # Delay heavy imports until needed
 # from app.vector_db import MathKnowledgeBase
 # from app.langgraph_workflow import MathRAGWorkflow
 from app.guardrails import AIGateway, ValidationResult
 from app.feedback import get_hitl_system
+from app.init_once import InitOnce
+from app.kb_artifact import DEFAULT_DATASET_PATH
+from app.metrics import (
+    REGISTRY, CONTENT_TYPE_LATEST, HTTP_REQUESTS, HTTP_LATENCY, QUERY_REQUESTS,
+    QUERY_LATENCY, QUERY_STAGE_LATENCY, KB_SIZE, GUARDRAIL_CHECKS, LLM_IN_FLIGHT, LLM_ERRORS, ERRORS,
+    format_server_timing
+)
 
 load_dotenv()
 
@@ -52,17 +63,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 # Serve static files from backend directory
 static_dir = os.path.join(os.path.dirname(__file__), "..")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+# Request count/latency per route template (recorded lock-free, see app/metrics.py)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUESTS.inc(route=route_path, method=request.method, status=status_code)
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=route_path, method=request.method)
+
 # Health endpoint for Cloud Run / Docker health checks
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "math-backend", "version": app.version}
 
+# Readiness endpoint: 503 until the KB, embedding model and workflow are loaded and warm
+@app.get("/ready")
+def ready():
+    body = {
+        "status": startup_state["status"],
+        "warmup_on_startup": WARMUP_ON_STARTUP,
+        "phases_ms": startup_state["phases"],
+        "total_ms": startup_state.get("total_ms"),
+        "kb_count": kb.count_problems() if kb else 0
+    }
+    if startup_state.get("seed"):
+        body["kb_seed"] = {k: startup_state["seed"][k] for k in ("source", "count", "seconds")}
+    if startup_state.get("error"):
+        body["error"] = startup_state["error"]
+    if startup_state["status"] != "ready":
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+# Prometheus scrape endpoint (per-worker metrics)
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
 # Serve frontend static files (React build)
 frontend_build_dir = os.path.join(os.path.dirname(__file__), "../../frontend/build")
 if os.path.exists(frontend_build_dir):
@@ -79,20 +129,41 @@ def get_admin_sessions():
 # Initialize components - delay heavy initialization
 kb = None  # Will be initialized on first request
 workflow = None  # LangGraph workflow will be initialized after startup
+warm_up_task = None  # Background warm-up task (kept referenced so it isn't garbage collected)
+
+# Start loading the KB/model in the background at startup (set to false for pure lazy init)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+# Canonical seed dataset and its compiled index artifact (see app/kb_artifact.py)
+KB_DATASET_PATH = os.getenv("KB_DATASET_PATH")
+KB_ARTIFACT_PATH = os.getenv("KB_ARTIFACT_PATH")
+
+# Initialization progress reported by /ready
+startup_state = {"status": "pending", "phases": {}, "error": None}
 ai_gateway = AIGateway()
 hitl_system = get_hitl_system()
 
+KB_SIZE.set_function(lambda: kb.count_problems() if kb else 0)
+
 class Query(BaseModel):
     question: str
-    difficulty: Optional[str] = "JEE_Main"  # JEE_Main or JEE_Advanced
-    topic: Optional[str] = None
+    difficulty: Optional[str] = None  # KB prefilter: JEE_Main or JEE_Advanced (omit to search both)
+    topic: Optional[str] = None  # KB prefilter: e.g. "Calculus" (subtopics included) or "Calculus - Limits"
+    include_timings: Optional[bool] = False  # Add per-stage "timings" (ms) to the response body
+    include_kb_results: Optional[bool] = False  # Full kb_results (question, solution_steps, ...) instead of ids, scores and topics
 
 def query_perplexity_api(question: str) -> str:
     """Query Perplexity API for web search and answer generation"""
     if not PERPLEXITY_API_KEY:
         logger.error("Perplexity API key is missing.")
+        LLM_ERRORS.inc(kind="missing_key")
         return "Perplexity API key is missing."
     
+    with LLM_IN_FLIGHT.track_inprogress():
+        return _call_perplexity(question)
+
+def _call_perplexity(question: str) -> str:
+    """Perform the Perplexity HTTP request (wrapped by the in-flight gauge)"""
     try:
         # Perplexity API endpoint
         url = "https://api.perplexity.ai/chat/completions"
@@ -135,10 +206,12 @@ def query_perplexity_api(question: str) -> str:
             
             return answer
         else:
+            LLM_ERRORS.inc(kind="empty")
             return "No answer generated by Perplexity"
             
     except requests.RequestException as e:
         logger.error(f"Perplexity API request failed: {e}")
+        LLM_ERRORS.inc(kind="request")
         # FALLBACK: Return helpful error message
         logger.warning("Perplexity API unavailable - question not found in knowledge base")
         return f"""**Web Search Unavailable**
@@ -160,141 +233,133 @@ Unfortunately, this question is not in our knowledge base and the Perplexity web
 *This is a demonstration system. For production use, ensure API keys are valid.*"""
     except Exception as e:
         logger.error(f"Perplexity API error: {e}")
+        LLM_ERRORS.inc(kind="response")
         return f"Error processing Perplexity response: {str(e)}"
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize app - delayed heavy initialization for Render deployment"""
-    global workflow
+    """Initialize app - optionally warm up KB & workflow in the background"""
+    global warm_up_task
     
     logger.info("🚀 FastAPI server starting...")
-    logger.info("⚠️  Heavy initialization (KB & LangGraph) will happen on first request")
+    if WARMUP_ON_STARTUP:
+        logger.info("🔥 Warming up knowledge base & LangGraph in the background (see /ready)")
+        warm_up_task = asyncio.create_task(background_warm_up())
+    else:
+        logger.info("⚠️  Heavy initialization (KB & LangGraph) will happen on first request")
     logger.info("✅ Server is ready to accept connections")
 
+async def background_warm_up():
+    """Run lazy_init at startup so the first user doesn't pay for model loading"""
+    try:
+        await lazy_init()
+    except Exception as e:
+        logger.error(f"❌ Background warm-up failed: {e}")
+
+@contextmanager
+def _startup_phase(name: str):
+    """Time one initialization phase and record it for /ready"""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    startup_state["phases"][name] = round(elapsed * 1000, 1)
+    logger.info(f"⏱️  Startup phase '{name}' took {elapsed * 1000:.0f} ms")
+
 async def lazy_init():
-    """Lazy initialization of KB and workflow - called on first request"""
-    global workflow, kb
+    """
+    Lazy initialization of KB and workflow - called at startup (warm-up) or on first request.
     
-    if workflow is not None and kb is not None:
-        return  # Already initialized
+    Concurrent callers share a single in-progress initialization (see app/init_once.py);
+    the blocking work runs in a worker thread so the event loop stays free.
+    """
+    await kb_init.run_async()
+    await encoder_warm_up.run_async()
+
+def _initialize_components():
+    """Load the KB, seed it, build the workflow and warm the encoder (blocking)"""
+    global workflow, kb
     
     logger.info("🔄 Starting lazy initialization of knowledge base and workflow...")
+    startup_state["status"] = "initializing"
+    init_start = time.perf_counter()
     
-    # Import heavy modules only when needed
-    from app.vector_db import MathKnowledgeBase
-    from app.langgraph_workflow import MathRAGWorkflow
-    
-    # Initialize knowledge base first
-    if kb is None:
-        logger.info("Initializing MathKnowledgeBase...")
-        kb = MathKnowledgeBase()
-    
-    # Sample problems for testing
-    sample_problems = [
-        {
-            "problem_id": "calc_001",
-            "question": "Evaluate the integral ∫₀¹ x² ln(x) dx using integration by parts",
-            "solution_steps": [
-                "Use integration by parts with u = ln(x) and dv = x² dx",
-                "Then du = (1/x)dx and v = x³/3",
-                "Apply the formula: ∫u dv = uv - ∫v du",
-                "This gives: [x³ln(x)/3]₀¹ - ∫₀¹ (x³/3)(1/x) dx",
-                "Simplify: [x³ln(x)/3]₀¹ - ∫₀¹ x²/3 dx",
-                "Evaluate limits and integral: 0 - [x³/9]₀¹ = -1/9"
-            ],
-            "final_answer": "-1/9",
-            "difficulty": "JEE_Advanced",
-            "tags": ["integration", "integration_by_parts", "logarithm"],
-            "topic": "Calculus"
-        },
-        {
-            "problem_id": "alg_001",
-            "question": "Solve for x: x³ - 3x + 2 = 0",
-            "solution_steps": [
-                "Try to factor the cubic equation",
-                "Test x = 1: 1³ - 3(1) + 2 = 0 ✓",
-                "So (x - 1) is a factor",
-                "Perform polynomial division: (x³ - 3x + 2) ÷ (x - 1) = x² + x - 2",
-                "Factor the quadratic: x² + x - 2 = (x + 2)(x - 1)",
-                "Therefore: (x - 1)(x + 2)(x - 1) = (x - 1)²(x + 2) = 0",
-                "Solutions: x = 1 (double root) and x = -2"
-            ],
-            "final_answer": "x = 1 (multiplicity 2), x = -2",
-            "difficulty": "JEE_Main",
-            "tags": ["polynomial", "cubic_equation", "factorization"],
-            "topic": "Algebra"
-        },
-        {
-            "problem_id": "calc_004",
-            "question": "Find the derivative of f(x) = x^x for x > 0",
-            "solution_steps": [
-                "Take natural logarithm of both sides: ln(f(x)) = ln(x^x) = x ln(x)",
-                "Differentiate both sides using implicit differentiation",
-                "Left side: (1/f(x)) · f'(x)",
-                "Right side: d/dx[x ln(x)] = ln(x) + x·(1/x) = ln(x) + 1",
-                "So: f'(x)/f(x) = ln(x) + 1",
-                "Therefore: f'(x) = f(x) · (ln(x) + 1) = x^x · (ln(x) + 1)"
-            ],
-            "final_answer": "f'(x) = x^x(ln(x) + 1)",
-            "difficulty": "JEE_Advanced",
-            "tags": ["differentiation", "logarithmic_differentiation", "exponential"],
-            "topic": "Calculus"
-        },
-        {
-            "problem_id": "prob_001",
-            "question": "A box contains 5 red balls and 3 blue balls. If 3 balls are drawn at random without replacement, what is the probability that exactly 2 are red?",
-            "solution_steps": [
-                "Total balls = 5 + 3 = 8",
-                "Need to find P(exactly 2 red in 3 draws)",
-                "This means 2 red and 1 blue",
-                "Number of ways to choose 2 red from 5: C(5,2) = 10",
-                "Number of ways to choose 1 blue from 3: C(3,1) = 3",
-                "Number of ways to choose 3 from 8: C(8,3) = 56",
-                "P(2 red, 1 blue) = [C(5,2) × C(3,1)] / C(8,3) = (10 × 3) / 56 = 30/56 = 15/28"
-            ],
-            "final_answer": "15/28 ≈ 0.536",
-            "difficulty": "JEE_Main",
-            "tags": ["probability", "combinations", "without_replacement"],
-            "topic": "Probability"
-        },
-        {
-            "problem_id": "trig_001",
-            "question": "Find the Maclaurin series for sin(x) up to the x⁵ term",
-            "solution_steps": [
-                "Recall the Maclaurin series: f(x) = Σ[f⁽ⁿ⁾(0)/n!]xⁿ",
-                "Find derivatives at x=0:",
-                "  f(x) = sin(x), f(0) = 0",
-                "  f'(x) = cos(x), f'(0) = 1",
-                "  f''(x) = -sin(x), f''(0) = 0",
-                "  f'''(x) = -cos(x), f'''(0) = -1",
-                "  f⁽⁴⁾(x) = sin(x), f⁽⁴⁾(0) = 0",
-                "  f⁽⁵⁾(x) = cos(x), f⁽⁵⁾(0) = 1",
-                "Substitute into formula:",
-                "sin(x) = 0 + x - 0 - x³/3! + 0 + x⁵/5! + ...",
-                "sin(x) = x - x³/6 + x⁵/120 + ..."
-            ],
-            "final_answer": "sin(x) ≈ x - x³/6 + x⁵/120",
-            "difficulty": "JEE_Advanced",
-            "tags": ["series", "maclaurin_series", "trigonometry"],
-            "topic": "Calculus"
-        }
-    ]
-    
-    for problem in sample_problems:
-        try:
-            kb.add_problem(**problem)
-            logger.info(f"Added problem: {problem['problem_id']}")
-        except Exception as e:
-            logger.error(f"Failed to add problem {problem['problem_id']}: {e}")
+    try:
+        # Import heavy modules only when needed
+        with _startup_phase("import"):
+            from app.vector_db import MathKnowledgeBase
+            from app.langgraph_workflow import MathRAGWorkflow
+        
+        # Initialize knowledge base first
+        with _startup_phase("load_model"):
+            logger.info("Initializing MathKnowledgeBase...")
+            new_kb = kb if kb is not None else MathKnowledgeBase()
+        
+        # Canonical seed problems: precomputed artifact, or the JSONL dataset if it is stale
+        with _startup_phase("seed_kb"):
+            from app.kb_artifact import seed_knowledge_base
+            # Before fork (PRELOAD_MODEL) a stale artifact is left to the workers: no forward pass in the master
+            startup_state["seed"] = seed_knowledge_base(new_kb, KB_DATASET_PATH, KB_ARTIFACT_PATH, embed=not _preloading)
+            total = new_kb.count_problems()
+            logger.info(f"Knowledge base initialized with {total} problems "
+                        f"(seeded from {startup_state['seed']['source']})")
+        
+        # Initialize LangGraph workflow (only with Perplexity now)
+        with _startup_phase("build_workflow"):
+            logger.info("Initializing LangGraph workflow...")
+            new_workflow = MathRAGWorkflow(new_kb, query_perplexity_api)
+            logger.info("✅ LangGraph workflow ready!")
+    except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        raise
     
-    total = kb.count_problems()
-    logger.info(f"Knowledge base initialized with {total} problems")
+    kb = new_kb
+    workflow = new_workflow
+    startup_state["status"] = "loaded"
+    startup_state["error"] = None
+    logger.info(f"✅ Knowledge base & workflow loaded in {(time.perf_counter() - init_start) * 1000:.0f} ms")
+
+def _warm_encoder():
+    """Dummy encode so the first real query doesn't pay for lazy model setup"""
+    try:
+        if (startup_state.get("seed") or {}).get("source") == "deferred":
+            # The gunicorn master found the artifact stale; this worker embeds the dataset
+            with _startup_phase("seed_kb"):
+                from app.kb_artifact import seed_knowledge_base
+                startup_state["seed"] = seed_knowledge_base(kb, KB_DATASET_PATH, KB_ARTIFACT_PATH)
+        with _startup_phase("warm_encode"):
+            kb.generate_embedding("Warm-up: solve x^2 - 1 = 0")
+            if kb.fingerprint_lookup:
+                # Per-worker fingerprint table (also imports sympy off the request path)
+                kb.fingerprint_index()
+    except Exception as e:
+        startup_state["status"] = "failed"
+        startup_state["error"] = str(e)
+        raise
     
-    # Initialize LangGraph workflow (only with Perplexity now)
-    logger.info("Initializing LangGraph workflow...")
-    workflow = MathRAGWorkflow(kb, query_perplexity_api)
-    logger.info("✅ LangGraph workflow ready!")
-    logger.info("✅ Lazy initialization complete!")
+    startup_state["status"] = "ready"
+    startup_state["total_ms"] = round(sum(startup_state["phases"].values()), 1)
+    logger.info(f"✅ Lazy initialization complete in {startup_state['total_ms']:.0f} ms!")
+
+# Guard each step so it runs exactly once, even under concurrent first requests.
+# They are separate so a gunicorn master can load weights without a forward pass
+# (see preload_components); each forked worker then warms its own encoder.
+kb_init = InitOnce(_initialize_components, name="knowledge_base")
+encoder_warm_up = InitOnce(_warm_encoder, name="encoder_warm_up")
+_preloading = False  # True while preload_components runs in the gunicorn master
+
+def preload_components():
+    """
+    Load the KB, model weights and workflow in the gunicorn master before workers fork
+    (PRELOAD_MODEL=true, see gunicorn.conf.py). Workers inherit them copy-on-write.
+    """
+    global _preloading
+    logger.info("📦 Preloading knowledge base & model before forking workers...")
+    _preloading = True
+    try:
+        kb_init.run()
+    finally:
+        _preloading = False
 
 @app.get("/")
 async def read_root():
@@ -312,10 +377,202 @@ async def read_root():
 @app.get("/kb/status")
 def get_kb_status():
     """Get knowledge base statistics"""
-    return {
+    status = {
         "total_problems": kb.count_problems(),
+        "generation": kb.generation,
+        "facets": kb.facet_counts(),
         "status": "ready"
     }
+    if kb.sharded:
+        status["shards"] = kb.index.shard_counts()
+    router = kb.current_topic_router()
+    if router is not None:
+        status["topic_router"] = {"generation": router.generation, "topics": router.counts()}
+    return status
+
+# ==================== KB Write API ====================
+
+# Bearer token for KB writes; the write endpoints are disabled when it is unset
+KB_ADMIN_TOKEN = os.getenv("KB_ADMIN_TOKEN")
+kb_ingest = None  # Background ingestion queue, created after the KB is loaded
+
+def require_kb_token(authorization: Optional[str] = Header(None)):
+    """Require 'Authorization: Bearer <KB_ADMIN_TOKEN>' for KB writes"""
+    if not KB_ADMIN_TOKEN:
+        raise HTTPException(status_code=503, detail="KB write API is disabled (KB_ADMIN_TOKEN not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), KB_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid or missing KB admin token")
+
+async def get_kb_ingest():
+    """Load the KB if needed and return the shared ingestion queue"""
+    global kb_ingest
+    await lazy_init()
+    if kb_ingest is None or kb_ingest.kb is not kb:
+        from app.kb_ingest import KBIngestQueue
+        kb_ingest = KBIngestQueue(
+            kb,
+            batch_size=int(os.getenv("KB_INGEST_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("KB_INGEST_WAIT_MS", "50"))
+        )
+    return kb_ingest
+
+class Problem(BaseModel):
+    """A knowledge base problem (same fields as MathKnowledgeBase.add_problem)"""
+    problem_id: str
+    question: str
+    solution_steps: List[str]
+    final_answer: str
+    difficulty: str
+    tags: List[str] = []
+    topic: str
+
+def _problem_exists(ingest, problem_id: str) -> bool:
+    pending = ingest.pending(problem_id)
+    if pending is not None:
+        return pending == "upsert"
+    return kb.has_problem(problem_id)
+
+@app.post("/kb/problems", status_code=202, dependencies=[Depends(require_kb_token)])
+async def add_kb_problem(problem: Problem):
+    """Add (or replace) one problem; it is embedded and indexed in the background"""
+    ingest = await get_kb_ingest()
+    ingest.submit_upserts([problem.model_dump()])
+    return ingest.status(problem.problem_id)
+
+@app.put("/kb/problems/{problem_id}", status_code=202, dependencies=[Depends(require_kb_token)])
+async def update_kb_problem(problem_id: str, problem: Problem):
+    """Replace an existing problem"""
+    ingest = await get_kb_ingest()
+    if problem.problem_id != problem_id:
+        raise HTTPException(status_code=400, detail="problem_id in the body does not match the URL")
+    if not _problem_exists(ingest, problem_id):
+        raise HTTPException(status_code=404, detail=f"Problem not found: {problem_id}")
+    ingest.submit_upserts([problem.model_dump()])
+    return ingest.status(problem_id)
+
+@app.delete("/kb/problems/{problem_id}", status_code=202, dependencies=[Depends(require_kb_token)])
+async def delete_kb_problem(problem_id: str):
+    """Delete a problem"""
+    ingest = await get_kb_ingest()
+    if not _problem_exists(ingest, problem_id):
+        raise HTTPException(status_code=404, detail=f"Problem not found: {problem_id}")
+    ingest.submit_deletes([problem_id])
+    return ingest.status(problem_id)
+
+@app.post("/kb/problems/bulk", status_code=202, dependencies=[Depends(require_kb_token)])
+async def bulk_kb_problems(request: Request):
+    """
+    Bulk upload as NDJSON: one problem per line, or {"op": "delete", "problem_id": ...}.
+    
+    Valid lines are queued in order; invalid lines (including wrong field types,
+    checked with the same Problem model as POST /kb/problems) are reported and skipped.
+    """
+    ingest = await get_kb_ingest()
+    body = (await request.body()).decode("utf-8")
+    accepted, rejected = 0, []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if record.get("op") == "delete":
+                ingest.submit_deletes([str(record["problem_id"])])
+            else:
+                ingest.submit_upserts([Problem.model_validate(record).model_dump()])
+            accepted += 1
+        except (ValueError, KeyError, AttributeError) as e:  # pydantic's ValidationError is a ValueError
+            rejected.append({"line": line_number, "error": str(e)})
+    return {"accepted": accepted, "rejected": rejected}
+
+@app.get("/kb/problems/{problem_id}/status")
+async def get_kb_problem_status(problem_id: str):
+    """Indexing status of a problem submitted through the write API"""
+    ingest = await get_kb_ingest()
+    status = ingest.status(problem_id)
+    if status is None:
+        if not kb.has_problem(problem_id):
+            raise HTTPException(status_code=404, detail=f"Problem not found: {problem_id}")
+        status = {"problem_id": problem_id, "op": None, "status": "indexed", "error": None, "updated_at": None}
+    return status
+
+@app.get("/kb/problems/{problem_id}")
+async def get_kb_problem(problem_id: str):
+    """Full stored problem"""
+    await lazy_init()
+    problem = kb.get_problem(problem_id)
+    if problem is None:
+        raise HTTPException(status_code=404, detail=f"Problem not found: {problem_id}")
+    return problem
+
+# Blue/green rebuild from the source dataset (KB_SOURCE_PATH, .json or .jsonl; defaults to the seed dataset)
+KB_SOURCE_PATH = os.getenv("KB_SOURCE_PATH") or KB_DATASET_PATH or DEFAULT_DATASET_PATH
+rebuild_state = {"status": "idle", "report": None, "error": None}
+rebuild_task = None  # Kept referenced so the background rebuild isn't garbage collected
+
+def _run_rebuild(topic: Optional[str] = None):
+    """Load the source dataset and rebuild the KB (or one topic shard) into a new version (blocking)"""
+    from app.kb_dataset import load_problems
+    
+    try:
+        report = kb.rebuild(load_problems(KB_SOURCE_PATH), topic=topic)
+    except Exception as e:
+        logger.error(f"❌ KB rebuild failed: {e}")
+        ERRORS.inc(component="kb_rebuild")
+        rebuild_state.update(status="failed", error=str(e))
+        return
+    rebuild_state.update(status="done", report=report, error=None)
+    logger.info(f"✅ KB rebuilt: {report['count']} problems (generation {report['generation']})")
+
+@app.post("/kb/rebuild", status_code=202, dependencies=[Depends(require_kb_token)])
+async def start_kb_rebuild(topic: Optional[str] = None):
+    """
+    Rebuild the KB from KB_SOURCE_PATH in the background; searches keep being served.
+    With KB_SHARD_BY_TOPIC, ?topic=Calculus rebuilds only that topic's shard.
+    """
+    global rebuild_task
+    if not KB_SOURCE_PATH:
+        raise HTTPException(status_code=400, detail="KB_SOURCE_PATH is not configured")
+    if rebuild_state["status"] == "running":
+        raise HTTPException(status_code=409, detail="A rebuild is already in progress")
+    # Claim the rebuild before the first await, so a concurrent request gets the 409
+    previous = dict(rebuild_state)
+    rebuild_state.update(status="running", report=None, error=None)
+    try:
+        await lazy_init()
+        if topic is not None and not kb.sharded:
+            raise HTTPException(status_code=400, detail="Rebuilding one topic needs KB_SHARD_BY_TOPIC=true")
+    except BaseException:
+        rebuild_state.update(previous)
+        raise
+    rebuild_task = asyncio.create_task(asyncio.to_thread(_run_rebuild, topic))
+    return rebuild_state
+
+@app.get("/kb/rebuild")
+def get_kb_rebuild_status():
+    """Progress and report of the last rebuild"""
+    return rebuild_state
+
+@app.post("/kb/sync", dependencies=[Depends(require_kb_token)])
+async def sync_kb(dry_run: bool = False, delete_missing: bool = True):
+    """
+    Apply KB_SOURCE_PATH changes to the live KB: only new or changed questions are
+    embedded, payload-only edits keep their vectors, removed problems are deleted.
+    """
+    from app.kb_dataset import load_problems
+    
+    if not KB_SOURCE_PATH:
+        raise HTTPException(status_code=400, detail="KB_SOURCE_PATH is not configured")
+    if rebuild_state["status"] == "running":
+        raise HTTPException(status_code=409, detail="A rebuild is in progress")
+    await lazy_init()
+    try:
+        problems = await asyncio.to_thread(load_problems, KB_SOURCE_PATH)
+        report = await asyncio.to_thread(kb.sync_problems, problems, delete_missing, dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"🔄 KB sync from {KB_SOURCE_PATH}: {report}")
+    return report
 
 
 @app.post("/guardrails/validate")
@@ -333,6 +590,29 @@ def validate_question(query: Query) -> Dict:
     report = AIGateway.get_full_report(query.question)
     return report
 
+def _record_query_metrics(source: str, start: float):
+    """Record /query count and latency labelled by answer source"""
+    QUERY_REQUESTS.inc(source=source)
+    QUERY_LATENCY.observe(time.perf_counter() - start, source=source)
+
+def _timed_response(content: Dict, timings: Dict[str, float], include_timings: bool = False, status_code: int = 200) -> JSONResponse:
+    """
+    Serialize a /query payload and attach its stage timings as a Server-Timing header.
+    
+    The optional "timings" body field (milliseconds) is rendered before serialization,
+    so only the header carries the "serialize" entry.
+    """
+    if include_timings:
+        content["timings"] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+    serialize_start = time.perf_counter()
+    response = JSONResponse(status_code=status_code, content=content)
+    timings["serialize"] = time.perf_counter() - serialize_start
+    for stage, seconds in timings.items():
+        QUERY_STAGE_LATENCY.observe(seconds, stage=stage)
+    response.headers["Server-Timing"] = format_server_timing(timings)
+    response.headers["Timing-Allow-Origin"] = ", ".join(origins)
+    return response
+
 @app.post("/query")
 async def query_rag_pipeline(query: Query, request: Request) -> Dict:
     """
@@ -351,6 +631,9 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
     5. Decision: Found on web? → END | Not found? → not_found
     6. not_found → Return "NOT FOUND" → END
     """
+    query_start = time.perf_counter()
+    timings: Dict[str, float] = {}
+
     # Identify user (for demo, use IP address; in production, use proper auth/session)
     user_id = request.client.host
     if user_id not in user_sessions:
@@ -361,20 +644,25 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
     # Check if login is required
     if session["count"] >= 10 and not session["logged_in"]:
         save_user_sessions()
-        return JSONResponse(status_code=401, content={"error": "Login required after 10 questions."})
+        _record_query_metrics("login_required", query_start)
+        return _timed_response({"error": "Login required after 10 questions."}, timings, status_code=401)
 
     logger.info(f"Received query: {query.question}")
     
     # ============================================
     # STEP 1: INPUT GUARDRAILS
     # ============================================
+    stage_start = time.perf_counter()
     input_validation = AIGateway.process_query(query.question)
+    timings["guardrail_in"] = time.perf_counter() - stage_start
+    GUARDRAIL_CHECKS.inc(stage="input", result=input_validation['result'])
 
     if not input_validation['approved']:
         logger.warning(f"Query rejected by input guardrails: {input_validation['message']}")
         session["count"] += 1
         save_user_sessions()
-        return {
+        _record_query_metrics("guardrails_rejected", query_start)
+        return _timed_response({
             "error": "Input validation failed",
             "message": input_validation['message'],
             "answer": "⛔ Your question was blocked by safety guardrails. Please ensure your question is math-related and appropriate.",
@@ -385,7 +673,7 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
                 "input_validation": input_validation['result'],
                 "input_message": input_validation['message']
             }
-        }
+        }, timings, query.include_timings)
     
     # Input approved with warning (borderline math question)
     if input_validation['result'] == 'warning':
@@ -405,25 +693,39 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
     # STEP 2: LANGGRAPH WORKFLOW
     # ============================================
     if workflow is None:
-        return {
+        _record_query_metrics("error", query_start)
+        return _timed_response({
             "error": "Workflow not initialized",
             "answer": "System is still initializing, please try again in a few seconds",
             "confidence": "none",
             "confidence_score": 0.0,
             "source": "error"
-        }
+        }, timings, query.include_timings)
     
     try:
-        # Run the LangGraph workflow
-        final_state = workflow.run(query.question, query.difficulty)
+        # Run the LangGraph workflow off the event loop, so concurrent requests reach
+        # the embedding batcher together instead of one at a time
+        final_state = await asyncio.to_thread(workflow.run, query.question, difficulty=query.difficulty, topic=query.topic)
+        timings.update(final_state.get('timings') or {})
         
         # ============================================
         # STEP 3: OUTPUT GUARDRAILS
         # ============================================
+        stage_start = time.perf_counter()
         output_validation = AIGateway.process_response(
             response=final_state['final_answer'],
             question=query.question
         )
+        timings["guardrail_out"] = time.perf_counter() - stage_start
+        GUARDRAIL_CHECKS.inc(stage="output", result=output_validation['result'])
+        
+        # kb_results are lightweight hits unless the client asks for the full problems
+        kb_results = final_state['kb_results']
+        if query.include_kb_results and kb_results:
+            best_match = final_state.get('best_match') or {}
+            if best_match.get('problem_id') == kb_results[0]['problem_id']:
+                kb_results = [best_match] + kb_results[1:]  # Already hydrated by the workflow
+            kb_results = await asyncio.to_thread(kb.hydrate, kb_results, timings=timings)
         
         # Build response from final state
         response = {
@@ -431,7 +733,7 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
             "confidence": final_state['confidence'],
             "confidence_score": final_state['confidence_score'],
             "source": final_state['source'],
-            "kb_results": final_state['kb_results'],
+            "kb_results": kb_results,
             "note": final_state['note'],
             "guardrails": {
                 "input_validation": input_validation['result'],
@@ -460,17 +762,20 @@ async def query_rag_pipeline(query: Query, request: Request) -> Dict:
             response['error'] = final_state['error']
         
         logger.info(f"✅ Query processed successfully with guardrails")
-        return response
+        _record_query_metrics(final_state['source'], query_start)
+        return _timed_response(response, timings, query.include_timings)
         
     except Exception as e:
         logger.error(f"Error in LangGraph workflow: {e}")
-        return {
+        ERRORS.inc(component="workflow")
+        _record_query_metrics("error", query_start)
+        return _timed_response({
             "error": str(e),
             "answer": "An error occurred processing your query",
             "confidence": "none",
             "confidence_score": 0.0,
             "source": "error"
-        }
+        }, timings, query.include_timings)
 
 
 # ==================== Authentication Endpoint ====================
@@ -0,0 +1,116 @@
+"""
+Math-aware Text Canonicalization
+
+The same question arrives in many spellings: "x³ - 3x + 2 = 0",
+"x^3-3x+2=0", "x**3 - 3*x + 2 = 0", "$x^{3} - 3x + 2 = 0$". Each spelling
+would otherwise get its own embedding and its own cache key. canonicalize()
+maps them to one form before embedding and before any cache lookup:
+
+    unicode   superscripts/subscripts -> ^n / _n, then NFKC, then operator symbols
+              (− × · ÷ ≤ ≥ ≠) and Greek letters -> ASCII
+    latex     $...$, \\(...\\), \\frac{a}{b}, \\sqrt{x}, \\cdot, \\le, \\left/\\right,
+              ^{...}/_{...} and other \\commands -> plain notation
+    operators ** -> ^, explicit multiplication before a letter or "(" dropped (3*x -> 3x),
+              signed exponents parenthesized (x^-1 -> x^(-1))
+    layout    lowercase, no spaces around operators, single spaces elsewhere,
+              no trailing punctuation
+
+Only the embedding input and cache keys use the canonical form; questions are
+stored and displayed as written. It runs on every query, so the common ASCII
+path is a handful of str methods and precompiled regexes (a few µs per query,
+see scripts/bench_canonicalize.py).
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Bumped whenever the output changes, so stored embeddings built with an older
+# version are recognised as stale (see app/kb_artifact.py)
+CANONICAL_VERSION = 2
+
+_SUPERSCRIPTS = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾ⁿⁱˣ", "0123456789+-=()nix")
+_SUBSCRIPTS = str.maketrans("₀₁₂₃₄₅₆₇₈₉₊₋₌₍₎ₐₑₒₓₕₖₗₘₙₚₛₜᵢⱼ", "0123456789+-=()aeoxhklmnpstij")
+_SUPERSCRIPT_RUN = re.compile("[⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼⁽⁾ⁿⁱˣ]+")
+_SUBSCRIPT_RUN = re.compile("[₀₁₂₃₄₅₆₇₈₉₊₋₌₍₎ₐₑₒₓₕₖₗₘₙₚₛₜᵢⱼ]+")
+
+_UNICODE_SYMBOLS = str.maketrans({
+    "−": "-", "–": "-", "—": "-", "‐": "-", "×": "*", "·": "*", "⋅": "*", "∗": "*",
+    "÷": "/", "⁄": "/", "∕": "/", "≤": "<=", "⩽": "<=", "≥": ">=", "⩾": ">=", "≠": "!=",
+    "√": "sqrt", "∞": "inf", "∫": "int", "∑": "sum", "±": "+-", "→": "->",
+    "α": "alpha", "β": "beta", "γ": "gamma", "δ": "delta", "θ": "theta", "λ": "lambda",
+    "μ": "mu", "π": "pi", "σ": "sigma", "φ": "phi", "ω": "omega", "Δ": "delta",
+})
+
+_LATEX_SYMBOLS = {
+    "cdot": "*", "times": "*", "ast": "*", "div": "/", "le": "<=", "leq": "<=", "ge": ">=", "geq": ">=",
+    "ne": "!=", "neq": "!=", "pm": "+-", "infty": "inf", "to": "->", "rightarrow": "->",
+}
+_LATEX_DELIMITERS = re.compile(r"\$|\\[()\[\]]|\\left\b|\\right\b|\\[,;:! ]")
+_LATEX_FRAC = re.compile(r"\\[dt]?frac\s*\{([^{}]*)\}\s*\{([^{}]*)\}")
+_LATEX_SQRT = re.compile(r"\\sqrt\s*\{([^{}]*)\}")
+_LATEX_SCRIPT = re.compile(r"([\^_])\s*\{([^{}]*)\}")
+_LATEX_COMMAND = re.compile(r"\\([a-z]+)")
+
+_SIMPLE = re.compile(r"[a-z0-9.]+")
+_PAREN_EXPONENT = re.compile(r"\^\(([a-z0-9.]+)\)")
+_SIGNED_EXPONENT = re.compile(r"\^([+-][a-z0-9.]+)")
+_EXPLICIT_PRODUCT = re.compile(r"(?<=[0-9a-z)])\*(?=[a-z(])")
+# Not after ")" or before "(", which would glue words onto parentheses ("f(x) for" -> "f(x)for")
+_OPERATOR_SPACE = re.compile(r" (?=[-+*/^=<>!),_])|(?<=[-+*/^=<>!(,_]) ")
+
+
+def _script(marker: str, body: str) -> str:
+    """x^23, x^(n+1): bare when the exponent/subscript is one simple token"""
+    return marker + body if _SIMPLE.fullmatch(body) else f"{marker}({body})"
+
+
+def _fraction(match: "re.Match") -> str:
+    numerator, denominator = match.group(1).strip(), match.group(2).strip()
+    numerator = numerator if _SIMPLE.fullmatch(numerator) else f"({numerator})"
+    denominator = denominator if _SIMPLE.fullmatch(denominator) else f"({denominator})"
+    return f"{numerator}/{denominator}"
+
+
+def _latex_to_plain(text: str) -> str:
+    text = _LATEX_DELIMITERS.sub(" ", text)
+    # Innermost-first, so nested \frac / \sqrt / ^{...} resolve over a few passes
+    previous = None
+    while previous != text:
+        previous = text
+        text = _LATEX_FRAC.sub(_fraction, text)
+        text = _LATEX_SQRT.sub(r"sqrt(\1)", text)
+        text = _LATEX_SCRIPT.sub(lambda m: _script(m.group(1), m.group(2).strip()), text)
+    text = _LATEX_COMMAND.sub(lambda m: _LATEX_SYMBOLS.get(m.group(1), m.group(1)), text)
+    return text.replace("{", "(").replace("}", ")")
+
+
+def _unicode_to_ascii(text: str) -> str:
+    text = _SUPERSCRIPT_RUN.sub(lambda m: _script("^", m.group().translate(_SUPERSCRIPTS)), text)
+    text = _SUBSCRIPT_RUN.sub(lambda m: _script("_", m.group().translate(_SUBSCRIPTS)), text)
+    return unicodedata.normalize("NFKC", text).translate(_UNICODE_SYMBOLS)
+
+
+@lru_cache(maxsize=4096)
+def canonicalize(text: str) -> str:
+    """
+    Canonical form of a math question, used for embedding and cache keys.
+
+    Args:
+        text: Question as typed (plain, Unicode or LaTeX notation)
+
+    Returns:
+        Lowercase plain-notation text; equivalent spellings give the same string
+    """
+    if not text.isascii():
+        text = _unicode_to_ascii(text)
+    text = text.lower()
+    if "\\" in text or "$" in text or "{" in text:
+        text = _latex_to_plain(text)
+    # Whitespace collapsed first, so operators only ever have single spaces to drop
+    text = _OPERATOR_SPACE.sub("", " ".join(text.split()))
+    if "*" in text:
+        text = _EXPLICIT_PRODUCT.sub("", text.replace("**", "^"))
+    if "^" in text:
+        text = _SIGNED_EXPONENT.sub(r"^(\1)", _PAREN_EXPONENT.sub(r"^\1", text))
+    return text.strip(" .?!")
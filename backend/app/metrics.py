@@ -0,0 +1,397 @@
+"""
+Prometheus Metrics for Agentic RAG Math Agent
+
+Small, dependency-free metrics registry that renders the Prometheus text
+exposition format (version 0.0.4) for the /metrics endpoint.
+
+Hot-path writes are lock-free: every thread records into its own shard
+(a plain dict reached through threading.local), so request threads never
+contend with each other. Shards are only merged when /metrics is scraped.
+Each gunicorn worker keeps its own registry (per-worker aggregation).
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) covering sub-millisecond embeddings up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value per the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a {name="value",...} label block"""
+    parts = [f'{n}="{_escape_label_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value (integers without a trailing .0)"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _ShardedMetric:
+    """
+    Base class holding one shard per thread.
+
+    Each shard maps a label-value tuple to a mutable list of numbers. Only the
+    owning thread mutates its shard, so no locking is required on writes; the
+    registry lock is taken once per thread when the shard is created.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], list]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple[str, ...], list]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if not self.labelnames:
+            return ()
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _new_cell(self) -> list:
+        raise NotImplementedError
+
+    def _merge_cells(self, target: list, cell: list):
+        for i, value in enumerate(cell):
+            target[i] += value
+
+    def _collect(self) -> Dict[Tuple[str, ...], list]:
+        """Merge all per-thread shards into one snapshot"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: Dict[Tuple[str, ...], list] = {}
+        for shard in shards:
+            # dict() and list() copies are atomic under the GIL
+            for key, cell in dict(shard).items():
+                cell = list(cell)
+                if key not in merged:
+                    merged[key] = cell
+                else:
+                    self._merge_cells(merged[key], cell)
+        return merged
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing counter"""
+
+    kind = "counter"
+
+    def _new_cell(self) -> list:
+        return [0.0]
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increment the counter for the given labels"""
+        shard = self._shard()
+        key = self._label_values(labels)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = self._new_cell()
+        cell[0] += amount
+
+    def value(self, **labels) -> float:
+        """Current merged value for the given labels (mainly for tests)"""
+        cell = self._collect().get(self._label_values(labels))
+        return cell[0] if cell else 0.0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, cell in sorted(self._collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(cell[0])}")
+        return lines
+
+
+class Gauge(_ShardedMetric):
+    """
+    Gauge that can go up and down.
+
+    inc()/dec() are recorded per thread and summed on scrape, which keeps
+    in-flight style gauges lock-free. Alternatively a callback can be set
+    with set_function() and is evaluated at scrape time.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_cell(self) -> list:
+        return [0.0]
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increase the gauge"""
+        shard = self._shard()
+        key = self._label_values(labels)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = self._new_cell()
+        cell[0] += amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        """Decrease the gauge"""
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Context manager counting in-progress operations"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def set_function(self, function: Callable[[], float]):
+        """Compute the gauge value from a callback at scrape time"""
+        self._function = function
+
+    def value(self, **labels) -> float:
+        """Current value (callback result or merged shards)"""
+        if self._function is not None:
+            return float(self._function())
+        cell = self._collect().get(self._label_values(labels))
+        return cell[0] if cell else 0.0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        if self._function is not None:
+            try:
+                lines.append(f"{self.name} {_format_value(float(self._function()))}")
+            except Exception as e:
+                logger.error(f"Error evaluating gauge {self.name}: {e}")
+            return lines
+        for key, cell in sorted(self._collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(cell[0])}")
+        return lines
+
+
+class Histogram(_ShardedMetric):
+    """Cumulative histogram with fixed upper bounds"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_cell(self) -> list:
+        # Per-bucket (non-cumulative) counts, then +Inf count, sum, count
+        return [0.0] * (len(self.buckets) + 3)
+
+    def observe(self, value: float, **labels):
+        """Record one observation"""
+        shard = self._shard()
+        key = self._label_values(labels)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = self._new_cell()
+        n = len(self.buckets)
+        index = n
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        cell[index] += 1
+        cell[n + 1] += value
+        cell[n + 2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager observing the elapsed wall time in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        """Number of observations for the given labels (mainly for tests)"""
+        cell = self._collect().get(self._label_values(labels))
+        return cell[len(self.buckets) + 2] if cell else 0.0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        n = len(self.buckets)
+        for key, cell in sorted(self._collect().items()):
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += cell[i]
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            cumulative += cell[n]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            plain = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{plain} {_format_value(cell[n + 1])}")
+            lines.append(f"{self.name}_count{plain} {_format_value(cell[n + 2])}")
+        return lines
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Render stage durations (seconds) as a Server-Timing header value.
+    
+    Example: {"embed": 0.0123} -> "embed;dur=12.3"
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on scrape"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _ShardedMetric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _ShardedMetric) -> _ShardedMetric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry used by the FastAPI app, the workflow and the knowledge base
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "math_http_requests_total",
+    "HTTP requests handled, by route template, method and status code",
+    ("route", "method", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "math_http_request_duration_seconds",
+    "HTTP request latency by route template and method",
+    ("route", "method")
+)
+QUERY_REQUESTS = REGISTRY.counter(
+    "math_query_requests_total",
+    "/query requests by answer source",
+    ("source",)
+)
+QUERY_LATENCY = REGISTRY.histogram(
+    "math_query_duration_seconds",
+    "End-to-end /query latency by answer source",
+    ("source",)
+)
+EMBEDDING_LATENCY = REGISTRY.histogram(
+    "math_embedding_duration_seconds",
+    "Time spent computing sentence embeddings"
+)
+EMBEDDING_CACHE = REGISTRY.counter(
+    "math_embedding_cache_total",
+    "Query embedding cache lookups (keyed by canonical question text), by result",
+    ("result",)
+)
+KB_NEAR_DUPLICATES = REGISTRY.counter(
+    "math_kb_near_duplicates_total",
+    "Incoming problems found to be near-duplicates of a KB problem, by dedupe action",
+    ("action",)
+)
+KB_TOPIC_ROUTES = REGISTRY.counter(
+    "math_kb_topic_routes_total",
+    "Searches without a topic by router outcome (routed, global = not confident, fallback = routed search was empty)",
+    ("result",)
+)
+KB_RERANKS = REGISTRY.counter(
+    "math_kb_reranks_total",
+    "Cross-encoder re-ranking passes by outcome (reranked, cached, timeout, busy, error)",
+    ("result",)
+)
+QUERY_STAGE_LATENCY = REGISTRY.histogram(
+    "math_query_stage_duration_seconds",
+    "/query latency per stage (guardrail_in, embed, kb_search, rerank, kb_hydrate, llm, guardrail_out, serialize)",
+    ("stage",)
+)
+KB_SIZE = REGISTRY.gauge(
+    "math_kb_problems",
+    "Number of problems in the knowledge base"
+)
+GUARDRAIL_CHECKS = REGISTRY.counter(
+    "math_guardrail_checks_total",
+    "Guardrail validations by stage (input/output) and result",
+    ("stage", "result")
+)
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "math_llm_requests_in_flight",
+    "Perplexity API calls currently in progress"
+)
+LLM_ERRORS = REGISTRY.counter(
+    "math_llm_errors_total",
+    "Perplexity API failures by kind",
+    ("kind",)
+)
+ERRORS = REGISTRY.counter(
+    "math_errors_total",
+    "Errors raised while processing requests, by component",
+    ("component",)
+)
@@ -0,0 +1,448 @@
+"""
+Shared-Memory Exact-Search Index
+
+Stores the normalized KB embedding matrix, payload offsets and payloads in one
+file that every process (gunicorn workers, mcp_server.py) maps read-only, so
+the vectors live once in the page cache instead of once per worker.
+
+File layout (little-endian):
+    header   64 bytes: magic, version, generation, count, dim, offsets_offset, blob_offset
+    matrix   float32[count, dim], L2-normalized rows
+    offsets  uint64[count + 1], byte offsets of each payload inside the blob
+    blob     UTF-8 JSON payloads (each includes "problem_id")
+
+Writers take an exclusive flock, read the current generation, apply their
+changes, write a new file next to it and os.replace() it into place. Readers
+keep using the old mapping until they notice the new inode (checked at most
+every refresh_interval seconds), so in-flight searches see a consistent
+snapshot and new generations are picked up without restarting.
+
+With quantization ("int8" or "binary", see app/quantization.py) each snapshot
+also keeps compact codes in process memory. Searches score the codes, then
+rescore only the best top_k * rescore_factor rows against the float32 matrix,
+so the mapped vectors are paged in for those rows instead of all of them.
+
+Filtered searches (where={"topic": {...}, ...}) select their rows from a
+payload index built with the snapshot's catalog (see app/payload_index.py)
+and score only those rows.
+
+Searches with hydrate=False return per-hit summaries ({"problem_id", "topic",
+"difficulty"}) from that catalog instead of decoding each hit's JSON payload;
+the caller fetches full payloads with get() for the hits it actually uses.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.payload_index import PayloadIndex, RowIndex, Where
+from app.quantization import build_codes
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MKBIDX01"
+VERSION = 1
+_HEADER = struct.Struct("<8sIQIIQQ")
+HEADER_SIZE = 64
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def write_index(path: str, vectors: np.ndarray, payloads: List[Dict], generation: int):
+    """Write a complete index file atomically (temp file + rename)"""
+    vectors = _normalize(vectors) if len(payloads) else np.zeros((0, vectors.shape[-1] if vectors.ndim > 1 else 0), dtype=np.float32)
+    count, dim = vectors.shape
+    encoded = [json.dumps(p, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for p in payloads]
+    offsets = np.zeros(count + 1, dtype="<u8")
+    if encoded:
+        offsets[1:] = np.cumsum([len(e) for e in encoded])
+
+    offsets_offset = HEADER_SIZE + vectors.nbytes
+    blob_offset = offsets_offset + offsets.nbytes
+    header = _HEADER.pack(MAGIC, VERSION, generation, count, dim, offsets_offset, blob_offset)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".kb-index-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+            f.write(vectors.astype("<f4", copy=False).tobytes())
+            f.write(offsets.tobytes())
+            for chunk in encoded:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_index(path: str) -> Tuple[np.ndarray, List[Dict]]:
+    """Copy the (normalized) vectors and payloads out of an index file"""
+    snapshot = _Snapshot(path)
+    return np.array(snapshot.matrix), snapshot.payloads()
+
+
+class _Snapshot:
+    """One mapped generation of the index file"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation, count, dim, offsets_offset, blob_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a KB index file (or unsupported version): {path}")
+        self.generation = generation
+        self.count = count
+        self.dim = dim
+        self.matrix = np.frombuffer(self._mmap, dtype="<f4", count=count * dim, offset=HEADER_SIZE).reshape(count, dim)
+        self.offsets = np.frombuffer(self._mmap, dtype="<u8", count=count + 1, offset=offsets_offset)
+        self.blob_offset = blob_offset
+        self._rows: Optional[Dict[str, int]] = None
+        self._ids: Optional[List[str]] = None
+        self._catalog: Optional[Dict[str, Tuple[Optional[str], Optional[str]]]] = None
+        self._row_index: Optional[RowIndex] = None
+        self._codes: Dict[str, object] = {}
+        self._codes_lock = threading.Lock()
+
+    def codes(self, mode: str):
+        """Quantized codes of this generation (built once on first use)"""
+        codes = self._codes.get(mode)
+        if codes is None:
+            with self._codes_lock:
+                codes = self._codes.get(mode)
+                if codes is None:
+                    codes = self._codes[mode] = build_codes(self.matrix, mode)
+        return codes
+
+    def payload(self, row: int) -> Dict:
+        start = self.blob_offset + int(self.offsets[row])
+        end = self.blob_offset + int(self.offsets[row + 1])
+        return json.loads(self._mmap[start:end])
+
+    def payloads(self) -> List[Dict]:
+        return [self.payload(row) for row in range(self.count)]
+
+    def summary(self, row: int) -> Dict:
+        """problem_id, topic and difficulty of a row, from the catalog (no payload decoding)"""
+        if self._ids is None:
+            self._load_catalog()
+        problem_id = self._ids[row]
+        topic, difficulty = self._catalog[problem_id]
+        return {"problem_id": problem_id, "topic": topic, "difficulty": difficulty}
+
+    def _load_catalog(self):
+        rows, ids, catalog, index = {}, [], {}, PayloadIndex()
+        for row in range(self.count):
+            payload = self.payload(row)
+            rows[payload["problem_id"]] = row
+            ids.append(payload["problem_id"])
+            catalog[payload["problem_id"]] = (payload.get("topic"), payload.get("difficulty"))
+            index.add(row, payload)
+        self._rows, self._ids, self._catalog, self._row_index = rows, ids, catalog, index.arrays()
+
+    def row_of(self, problem_id: str) -> Optional[int]:
+        """Row of a problem_id in this generation (lookup table built on first use)"""
+        if self._rows is None:
+            self._load_catalog()
+        return self._rows.get(problem_id)
+
+    def catalog(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """problem_id -> (topic, difficulty) for this generation"""
+        if self._catalog is None:
+            self._load_catalog()
+        return self._catalog
+
+    def rows_where(self, where: Where) -> np.ndarray:
+        """Sorted rows whose payloads pass a where filter (payload index built on first use)"""
+        if self._row_index is None:
+            self._load_catalog()
+        return self._row_index.select(where)
+
+
+def search_snapshot(
+    snap: _Snapshot,
+    vector,
+    top_k: int = 3,
+    score_threshold: float = 0.0,
+    payload_filter: Optional[Callable[[Dict], bool]] = None,
+    quantization: Optional[str] = None,
+    rescore_factor: int = 10,
+    where: Optional[Where] = None,
+    hydrate: bool = True
+) -> List[Tuple[float, Dict]]:
+    """
+    Top-k search over one mapped generation.
+
+    Exact by default. With quantization, the codes pick top_k * rescore_factor
+    candidates (widened while a payload_filter leaves fewer than top_k matches)
+    and only those rows are scored against the float32 vectors. A where filter
+    restricts both steps to the rows selected by the payload index. With
+    hydrate=False the hits carry catalog summaries instead of full payloads.
+    """
+    selected = snap.rows_where(where) if where else None
+    count = snap.count if selected is None else len(selected)
+    if count == 0:
+        return []
+    query = _normalize(vector)[0]
+    if quantization in (None, "none") or top_k * rescore_factor >= count:
+        if selected is None:
+            return _collect(snap, np.arange(count), snap.matrix @ query, top_k, score_threshold, payload_filter, hydrate)
+        return _collect(snap, selected, snap.matrix[selected] @ query, top_k, score_threshold, payload_filter, hydrate)
+
+    approximate = snap.codes(quantization).scores(query)
+    if selected is not None:
+        approximate = approximate[selected]
+    shortlist = top_k * rescore_factor
+    while True:
+        rows = np.sort(np.argpartition(-approximate, shortlist - 1)[:shortlist])  # sorted rows = sequential page reads
+        if selected is not None:
+            rows = selected[rows]
+        results = _collect(snap, rows, snap.matrix[rows] @ query, top_k, score_threshold, payload_filter, hydrate)
+        if len(results) >= top_k or payload_filter is None or shortlist >= count:
+            return results
+        shortlist = min(count, shortlist * 4)
+
+
+def _collect(snap, rows, scores, top_k, score_threshold, payload_filter, hydrate) -> List[Tuple[float, Dict]]:
+    """Best-first (score, payload or catalog summary) pairs for candidate rows and their exact scores"""
+    if payload_filter is None and top_k < len(rows):
+        order = np.argpartition(-scores, top_k - 1)[:top_k]
+        order = order[np.argsort(-scores[order])]
+    else:
+        order = np.argsort(-scores)
+
+    results = []
+    for i in order:
+        score = float(scores[i])
+        if score < score_threshold:
+            break
+        row = int(rows[i])
+        if payload_filter is not None and not payload_filter(snap.payload(row)):
+            continue
+        results.append((score, snap.payload(row) if hydrate else snap.summary(row)))
+        if len(results) >= top_k:
+            break
+    return results
+
+
+class MmapVectorIndex:
+    """Exact cosine-similarity index backed by a shared memory-mapped file"""
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        refresh_interval: float = 0.1,
+        quantization: Optional[str] = None,
+        rescore_factor: int = 10
+    ):
+        """
+        Args:
+            path: Index file shared by all processes
+            dim: Embedding dimension (used when creating an empty index)
+            refresh_interval: Minimum seconds between checks for a new generation
+            quantization: None/"none" (exact), "int8" or "binary" codes searched first
+            rescore_factor: Candidates rescored in full precision per requested result
+        """
+        build_codes(np.zeros((1, dim), dtype=np.float32), quantization)  # reject unknown modes early
+        self.path = path
+        self.quantization = None if quantization in (None, "", "none") else quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self.dim = dim
+        self.refresh_interval = refresh_interval
+        self._lock_path = path + ".lock"
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        if not os.path.exists(path):
+            with self._write_lock():
+                if not os.path.exists(path):
+                    write_index(path, np.zeros((0, dim), dtype=np.float32), [], generation=0)
+        self._reload(force=True)
+
+    # ------------------------------------------------------------------ reads
+
+    def _reload(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return
+        with self._reload_lock:
+            self._checked_at = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if self._snapshot is not None and self._snapshot.identity == identity:
+                return
+            snapshot = _Snapshot(self.path)
+            if self._snapshot is not None:
+                logger.info(f"KB index generation {self._snapshot.generation} → {snapshot.generation} ({snapshot.count} problems)")
+            # Old snapshot stays alive for any search still holding a reference
+            self._snapshot = snapshot
+
+    def snapshot(self) -> _Snapshot:
+        """Current generation (refreshed if the file was swapped)"""
+        self._reload()
+        return self._snapshot
+
+    @property
+    def generation(self) -> int:
+        return self.snapshot().generation
+
+    def count(self) -> int:
+        return self.snapshot().count
+
+    def search(
+        self,
+        vector,
+        top_k: int = 3,
+        score_threshold: float = 0.0,
+        payload_filter: Optional[Callable[[Dict], bool]] = None,
+        where: Optional[Where] = None,
+        hydrate: bool = True
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Return up to top_k (score, payload) pairs with score >= score_threshold (and passing where);
+        with hydrate=False each payload is only its catalog summary (problem_id, topic, difficulty)
+        """
+        return search_snapshot(
+            self.snapshot(), vector, top_k, score_threshold, payload_filter,
+            quantization=self.quantization, rescore_factor=self.rescore_factor, where=where, hydrate=hydrate
+        )
+
+    def get(self, problem_id: str) -> Optional[Dict]:
+        """Payload of one problem, or None"""
+        snap = self.snapshot()
+        row = snap.row_of(problem_id)
+        return snap.payload(row) if row is not None else None
+
+    def payloads(self) -> List[Dict]:
+        return self.snapshot().payloads()
+
+    def vectors(self, problem_ids: List[str]) -> np.ndarray:
+        """Stored (normalized) vectors of existing problems, in the given order"""
+        snap = self.snapshot()
+        return np.stack([snap.matrix[snap.row_of(pid)] for pid in problem_ids])
+
+    def catalog(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """problem_id -> (topic, difficulty) of the current generation"""
+        return self.snapshot().catalog()
+
+    # ----------------------------------------------------------------- writes
+
+    def _write_lock(self):
+        return _FileLock(self._lock_path)
+
+    def _rewrite(self, apply: Callable[[Dict[str, Tuple[np.ndarray, Dict]]], bool]):
+        """Read-modify-write the latest generation under the cross-process lock"""
+        with self._write_lock():
+            current = _Snapshot(self.path)
+            rows: Dict[str, Tuple[np.ndarray, Dict]] = {}
+            for row in range(current.count):
+                payload = current.payload(row)
+                rows[payload["problem_id"]] = (current.matrix[row], payload)
+            if not apply(rows):
+                return  # Nothing changed, keep the current generation
+            if rows:
+                vectors = np.stack([vector for vector, _ in rows.values()])
+            else:
+                vectors = np.zeros((0, self.dim), dtype=np.float32)
+            write_index(self.path, vectors, [payload for _, payload in rows.values()], current.generation + 1)
+        self._reload(force=True)
+
+    def upsert(self, points: List[Tuple[np.ndarray, Dict]]):
+        """Insert or replace problems (keyed by payload["problem_id"])"""
+        def apply(rows):
+            changed = False
+            for vector, payload in points:
+                vector = _normalize(vector)[0]
+                existing = rows.get(payload["problem_id"])
+                if existing is not None and existing[1] == payload and np.allclose(existing[0], vector, atol=1e-6):
+                    continue
+                rows[payload["problem_id"]] = (vector, payload)
+                changed = True
+            return changed
+        self._rewrite(apply)
+
+    def rebuild(
+        self,
+        vectors: np.ndarray,
+        payloads: List[Dict],
+        validate: Optional[Callable[[int, Callable], None]] = None
+    ) -> int:
+        """
+        Replace the whole index with a new generation (blue/green).
+        
+        The new file is staged next to the live one and, if given, validate(count, search)
+        runs against it before it is renamed into place; an exception from validate
+        discards the staged file and leaves the live generation untouched.
+        
+        Returns:
+            The new generation number
+        """
+        staging_path = self.path + ".staging"
+        with self._write_lock():
+            generation = _Snapshot(self.path).generation + 1
+            write_index(staging_path, vectors, payloads, generation)
+            try:
+                if validate is not None:
+                    staged = _Snapshot(staging_path)
+                    validate(staged.count, lambda vector, top_k: search_snapshot(
+                        staged, vector, top_k, quantization=self.quantization, rescore_factor=self.rescore_factor
+                    ))
+                os.replace(staging_path, self.path)
+            except BaseException:
+                os.unlink(staging_path)
+                raise
+        self._reload(force=True)
+        return generation
+
+    def delete(self, problem_ids: List[str]):
+        """Remove problems by problem_id"""
+        def apply(rows):
+            removed = [rows.pop(pid) for pid in problem_ids if pid in rows]
+            return bool(removed)
+        self._rewrite(apply)
+
+
+class _FileLock:
+    """Exclusive flock on a side file, serializing writers across processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,102 @@
+"""
+Payload Indexes for Filtered Search
+
+A /query with a topic or difficulty (and search_similar with tags) should
+search only the matching problems. Evaluating a Python predicate on every
+candidate payload does the opposite: the mmap backend decodes payloads of the
+best-scoring rows until top_k of them pass, which for a selective filter is
+most of the index, and HNSW calls the predicate for every graph node it visits.
+
+The in-process backends therefore keep an inverted index over the filtered
+fields (value -> ids: rows of an mmap snapshot, labels of an HNSW graph).
+A filter is a "where" dict of field -> accepted values; the ids matching it
+are the intersection over fields of the union over values, so a filtered
+search only scores (mmap) or admits (HNSW) the selected vectors. The Qdrant
+backend declares keyword payload indexes on the same fields.
+"""
+
+from typing import Collection, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+INDEXED_FIELDS = ("topic", "difficulty", "tags")
+
+Where = Mapping[str, Collection[str]]
+
+
+def field_values(payload: Dict, field: str) -> Tuple[str, ...]:
+    """Indexed values of one payload field (every tag for list fields)"""
+    value = payload.get(field)
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple)):
+        return tuple(str(v) for v in value)
+    return (str(value),)
+
+
+def matches(payload: Dict, where: Optional[Where]) -> bool:
+    """Whether a payload passes a where filter (no filter passes everything)"""
+    if not where:
+        return True
+    return all(any(v in values for v in field_values(payload, field)) for field, values in where.items())
+
+
+class PayloadIndex:
+    """field -> value -> ids, maintained incrementally"""
+
+    def __init__(self, fields: Iterable[str] = INDEXED_FIELDS):
+        self._ids: Dict[str, Dict[str, Set[int]]] = {field: {} for field in fields}
+
+    def add(self, key: int, payload: Dict):
+        for field, index in self._ids.items():
+            for value in field_values(payload, field):
+                index.setdefault(value, set()).add(key)
+
+    def remove(self, key: int, payload: Dict):
+        for field, index in self._ids.items():
+            for value in field_values(payload, field):
+                ids = index.get(value)
+                if ids is not None:
+                    ids.discard(key)
+                    if not ids:
+                        del index[value]
+
+    def select(self, where: Where) -> Set[int]:
+        """Ids of the payloads passing a where filter on indexed fields"""
+        selected: Optional[Set[int]] = None
+        for field, values in where.items():
+            index = self._ids[field]
+            ids = set().union(*(index.get(value, ()) for value in values))
+            selected = ids if selected is None else selected & ids
+            if not selected:
+                return set()
+        return selected if selected is not None else set()
+
+    def arrays(self) -> "RowIndex":
+        """Frozen copy with sorted id arrays (for an immutable mmap snapshot)"""
+        return RowIndex({
+            field: {value: np.fromiter(sorted(ids), dtype=np.int64, count=len(ids)) for value, ids in index.items()}
+            for field, index in self._ids.items()
+        })
+
+
+class RowIndex:
+    """Immutable field -> value -> sorted row array"""
+
+    def __init__(self, rows: Dict[str, Dict[str, np.ndarray]]):
+        self._rows = rows
+
+    def select(self, where: Where) -> np.ndarray:
+        """Sorted rows passing a where filter on indexed fields"""
+        selected: Optional[np.ndarray] = None
+        empty = np.zeros(0, dtype=np.int64)
+        for field, values in where.items():
+            index = self._rows[field]
+            parts = [index[value] for value in values if value in index]
+            if not parts:
+                return empty
+            rows = parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+            selected = rows if selected is None else np.intersect1d(selected, rows, assume_unique=True)
+            if not len(selected):
+                return empty
+        return selected if selected is not None else empty
@@ -0,0 +1,64 @@
+"""
+Pre-fork model preloading for gunicorn (PRELOAD_MODEL=true)
+
+The gunicorn master loads the SentenceTransformer weights, seeds the KB and
+builds the workflow once; forked workers inherit them copy-on-write instead
+of each loading their own copy.
+
+Torch is not fork-safe once its OpenMP/intra-op thread pool has started, so
+the master runs with a single torch thread and never does a forward pass.
+Each worker restores its own thread count after the fork and warms its
+encoder in the background (see encoder_warm_up in app/main.py).
+"""
+
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def preload_enabled() -> bool:
+    """True when PRELOAD_MODEL asks for loading in the gunicorn master"""
+    return os.getenv("PRELOAD_MODEL", "false").lower() in ("1", "true", "yes")
+
+
+def torch_threads_per_worker() -> int:
+    """Torch intra-op threads per worker (TORCH_NUM_THREADS or cores / workers)"""
+    configured = os.getenv("TORCH_NUM_THREADS")
+    if configured:
+        return max(1, int(configured))
+    workers = max(1, int(os.getenv("WORKERS", "1")))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _set_torch_threads(count: int):
+    try:
+        import torch
+        torch.set_num_threads(count)
+    except ImportError:
+        pass
+
+
+def load_before_fork():
+    """Called in the gunicorn master: load everything without running inference"""
+    # Fast tokenizers warn (and can deadlock) if their thread pool is used before fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # With one thread, torch runs ops inline and never starts its OpenMP pool
+    _set_torch_threads(1)
+
+    from app.main import preload_components
+    preload_components()
+
+    # Move everything loaded so far out of the GC's generations, so collections
+    # in workers don't write to (and un-share) the inherited pages
+    gc.collect()
+    gc.freeze()
+    logger.info("📦 Preload complete; objects frozen for copy-on-write sharing")
+
+
+def after_fork():
+    """Called in each worker right after fork"""
+    threads = torch_threads_per_worker()
+    _set_torch_threads(threads)
+    logger.info(f"👷 Worker {os.getpid()} using {threads} torch thread(s)")
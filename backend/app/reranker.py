@@ -0,0 +1,143 @@
+"""
+Latency-budgeted Cross-encoder Re-ranking
+
+The best KB match drives the whole answer prompt, and with cosine similarity
+alone the top hit is often a neighbouring variant of the asked problem (same
+words, other bounds or exponents). A cross-encoder reads the question and a
+candidate together and scores their match directly, which orders such
+variants much better, at the cost of one transformer pass per pair.
+
+With KB_RERANK=true, search_similar fetches the top KB_RERANK_TOP_N
+candidates, scores all (query, candidate) pairs in one batched predict()
+call on a worker thread and returns them in cross-encoder order (the cosine
+"score" is kept; each result gets a "rerank_score"). The request waits at
+most KB_RERANK_BUDGET_MS for the scores; past the budget, while the worker is
+busy with another request, or on an error it keeps the cosine order, so the
+stage never adds more than the budget to a request.
+
+Scores are cached per (canonical query, problem_id, question) in an LRU
+(app/lru.py). A pass that overruns the budget still finishes in the
+background and fills the cache, so the same question asked again is
+re-ranked without a model call.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, List, Optional
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+
+from app.lru import LRUCache
+from app.metrics import KB_RERANKS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Re-orders KB search results by cross-encoder score within a time budget"""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        top_n: int = 10,
+        budget_ms: float = 150.0,
+        cache_size: int = 4096,
+        workers: int = 1
+    ):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder model (loaded on first use, in the worker)
+            top_n: Candidates scored per query
+            budget_ms: Longest a request waits for the scores before keeping the cosine order
+            cache_size: (query, problem_id) scores kept in the LRU (0 disables it)
+            workers: Concurrent scoring passes; requests beyond that skip re-ranking
+        """
+        self.model_name = model_name
+        self.top_n = max(1, top_n)
+        self.budget = budget_ms / 1000.0
+        self.cache = LRUCache(cache_size)
+        self._model: Optional[CrossEncoder] = None
+        self._model_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="kb-rerank")
+
+    def _load(self) -> CrossEncoder:
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = CrossEncoder(self.model_name)
+                    logger.info(f"Loaded cross-encoder {self.model_name} in {time.perf_counter() - start:.1f}s")
+        return self._model
+
+    def _score(self, pairs: List[List[str]]) -> np.ndarray:
+        """One batched forward pass over all pairs (runs in the worker)"""
+        try:
+            scores = self._load().predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            return np.asarray(scores, dtype=np.float32).reshape(-1)
+        finally:
+            self._slots.release()
+
+    def rerank(self, query_key: str, query: str, results: List[Dict], timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Re-order the first top_n results by cross-encoder score.
+
+        Args:
+            query_key: Canonical query text (the cache key, see app/math_canonical.py)
+            query: Query as asked (what the cross-encoder reads)
+            results: search_similar results, best cosine first
+            timings: Optional dict that receives the "rerank" duration (seconds)
+
+        Returns:
+            The results with the first top_n in cross-encoder order (each with a
+            "rerank_score"), or unchanged if the scores weren't ready in time.
+        """
+        start = time.perf_counter()
+        try:
+            candidates, rest = results[:self.top_n], results[self.top_n:]
+            keys = [(query_key, r["problem_id"], r["question"]) for r in candidates]
+            scores = [self.cache.get(key) for key in keys]
+            missing = [i for i, score in enumerate(scores) if score is None]
+            if not missing:
+                outcome = "cached"
+            else:
+                if not self._slots.acquire(blocking=False):
+                    KB_RERANKS.inc(result="busy")
+                    return results
+                future = self._pool.submit(self._score, [[query, candidates[i]["question"]] for i in missing])
+                future.add_done_callback(lambda done: self._store(done, [keys[i] for i in missing]))
+                try:
+                    fresh = future.result(timeout=max(0.0, self.budget - (time.perf_counter() - start)))
+                except FutureTimeout:
+                    KB_RERANKS.inc(result="timeout")
+                    logger.info(f"Re-ranking skipped: over the {self.budget * 1000:.0f} ms budget")
+                    return results
+                except Exception as e:
+                    KB_RERANKS.inc(result="error")
+                    logger.error(f"Re-ranking failed: {e}")
+                    return results
+                for i, score in zip(missing, fresh):
+                    scores[i] = float(score)
+                outcome = "reranked"
+            KB_RERANKS.inc(result=outcome)
+            for result, score in zip(candidates, scores):
+                result["rerank_score"] = score
+            return sorted(candidates, key=lambda r: r["rerank_score"], reverse=True) + rest
+        finally:
+            if timings is not None:
+                timings["rerank"] = time.perf_counter() - start
+
+    def _store(self, future, keys):
+        """Cache a finished pass's scores (also when its request stopped waiting)"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        for key, score in zip(keys, future.result()):
+            self.cache.put(key, float(score))
+
+    def close(self):
+        self._pool.shutdown(wait=False)
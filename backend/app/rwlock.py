@@ -0,0 +1,57 @@
+"""
+Readers/writer lock for the in-process knowledge base.
+
+Many search threads may hold the lock at once; a writer gets it exclusively.
+Waiting writers block new readers (writer preference), so a steady stream of
+searches cannot starve ingestion. Writers are expected to hold the lock only
+for short, bounded steps (see MathKnowledgeBase.upsert_problems), which keeps
+the worst-case reader wait small even during a bulk ingest.
+
+The lock is not reentrant: do not take it again on a thread that holds it.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    """Shared (read) / exclusive (write) lock with writer preference"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read_locked(self):
+        """Hold the lock shared for the duration of the block"""
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_locked(self):
+        """Hold the lock exclusively for the duration of the block"""
+        with self._cond:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
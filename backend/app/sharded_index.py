@@ -0,0 +1,294 @@
+"""
+Topic-sharded Vector Index
+
+KB_SHARD_BY_TOPIC=true splits the mmap or HNSW backend into one index per
+top-level topic ("Calculus - Integration" -> shard "calculus"). A search
+with a topic (given by the client, or predicted) reads that one shard, as
+does a where filter whose topics all fall in one shard; a search without one
+fans out over all shards on a thread pool and merges the
+per-shard top-k lists by score. numpy and hnswlib release the GIL while
+scoring, so shards are searched in parallel.
+
+Every shard is a complete index of its own (one file per topic next to
+KB_INDEX_PATH for mmap, e.g. kb_index.calculus.bin), so one topic can be
+rebuilt (rebuild_shard) while the others keep serving. Shard files written
+by other workers are discovered on the next refresh.
+
+The wrapper implements the same interface as MmapVectorIndex and
+HnswVectorIndex; writes are routed by payload["topic"], and a problem whose
+topic changes moves to its new shard.
+"""
+
+import glob
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.payload_index import Where
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD = "general"
+
+
+def shard_name(topic: Optional[str]) -> str:
+    """Shard of a topic: its top-level part as a slug ("Complex Numbers - Basic" -> "complex_numbers")"""
+    top = (topic or "").split(" - ")[0]
+    return re.sub(r"[^a-z0-9]+", "_", top.lower()).strip("_") or DEFAULT_SHARD
+
+
+def mmap_shard_path(base_path: str, shard: str) -> str:
+    """kb/kb_index.bin -> kb/kb_index.<shard>.bin"""
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{shard}{ext or '.bin'}"
+
+
+def discover_mmap_shards(base_path: str) -> List[str]:
+    """Shard names with an index file next to base_path"""
+    root, ext = os.path.splitext(base_path)
+    prefix, suffix = root + ".", ext or ".bin"
+    return sorted(path[len(prefix):-len(suffix)] for path in glob.glob(glob.escape(prefix) + "*" + suffix))
+
+
+class ShardedVectorIndex:
+    """One vector index per top-level topic behind the common index interface"""
+
+    def __init__(
+        self,
+        make_shard: Callable[[str], object],
+        discover: Optional[Callable[[], Iterable[str]]] = None,
+        workers: int = 4,
+        refresh_interval: float = 1.0
+    ):
+        """
+        Args:
+            make_shard: Opens (or creates) the index of one shard by name
+            discover: Lists shards that exist outside this process (mmap files); None for in-process indexes
+            workers: Threads for fan-out searches (1 searches shards sequentially)
+            refresh_interval: Minimum seconds between discover() calls
+        """
+        self.make_shard = make_shard
+        self.discover = discover
+        self.workers = max(1, workers)
+        self.refresh_interval = refresh_interval
+        self._shards: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._discovered_at = 0.0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kb-shard") if self.workers > 1 else None
+        self._catalog_cache: Optional[Tuple[int, Dict]] = None
+        self._refresh(force=True)
+
+    # ----------------------------------------------------------------- shards
+
+    def _refresh(self, force: bool = False):
+        if self.discover is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._discovered_at < self.refresh_interval:
+            return
+        self._discovered_at = now
+        for name in self.discover():
+            if name not in self._shards:
+                self.shard(name)
+
+    def shard(self, name: str):
+        """Index of one shard, created on first use"""
+        index = self._shards.get(name)
+        if index is None:
+            with self._lock:
+                index = self._shards.get(name)
+                if index is None:
+                    index = self.make_shard(name)
+                    # Copy-on-write so readers iterate a stable dict
+                    self._shards = {**self._shards, name: index}
+                    logger.info(f"Opened KB shard {name!r}")
+        return index
+
+    def shards(self) -> Dict[str, object]:
+        """Shard name -> index"""
+        self._refresh()
+        return self._shards
+
+    def shard_counts(self) -> Dict[str, int]:
+        return {name: index.count() for name, index in sorted(self.shards().items())}
+
+    # ------------------------------------------------------------------ reads
+
+    @property
+    def generation(self) -> int:
+        """Sum of the shard generations (each only grows, so the sum changes on every write)"""
+        return sum(index.generation for index in self.shards().values())
+
+    def count(self) -> int:
+        return sum(index.count() for index in self.shards().values())
+
+    def search(
+        self,
+        vector,
+        top_k: int = 3,
+        score_threshold: float = 0.0,
+        payload_filter: Optional[Callable[[Dict], bool]] = None,
+        shard: Optional[str] = None,
+        where: Optional[Where] = None,
+        hydrate: bool = True
+    ) -> List[Tuple[float, Dict]]:
+        """
+        Return up to top_k (score, payload) pairs with score >= score_threshold,
+        from one shard when given, otherwise merged from all shards (only the
+        shards of the where filter's topics, when it has any).
+        """
+        if shard is not None:
+            index = self.shards().get(shard)
+            return index.search(vector, top_k, score_threshold, payload_filter, where=where, hydrate=hydrate) if index is not None else []
+        shards = self.shards()
+        if where and "topic" in where:
+            indexes = [shards[name] for name in sorted({shard_name(topic) for topic in where["topic"]}) if name in shards]
+        else:
+            indexes = list(shards.values())
+
+        def search_one(index):
+            return index.search(vector, top_k, score_threshold, payload_filter, where=where, hydrate=hydrate)
+
+        if self._pool is None or len(indexes) < 2:
+            hits = [hit for index in indexes for hit in search_one(index)]
+        else:
+            hits = [hit for found in self._pool.map(search_one, indexes) for hit in found]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return hits[:top_k]
+
+    def _shard_of(self, problem_id: str) -> Optional[object]:
+        entry = self.catalog().get(problem_id)
+        return self.shards().get(shard_name(entry[0])) if entry is not None else None
+
+    def get(self, problem_id: str) -> Optional[Dict]:
+        """Payload of one problem, or None"""
+        index = self._shard_of(problem_id)
+        return index.get(problem_id) if index is not None else None
+
+    def payloads(self) -> List[Dict]:
+        return [payload for index in self.shards().values() for payload in index.payloads()]
+
+    def vectors(self, problem_ids: List[str]) -> np.ndarray:
+        """Stored (normalized) vectors of existing problems, in the given order"""
+        catalog = self.catalog()
+        by_shard: Dict[str, List[str]] = {}
+        for problem_id in problem_ids:
+            by_shard.setdefault(shard_name(catalog[problem_id][0]), []).append(problem_id)
+        found = {}
+        for name, ids in by_shard.items():
+            found.update(zip(ids, self.shards()[name].vectors(ids)))
+        return np.stack([found[pid] for pid in problem_ids])
+
+    def catalog(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """problem_id -> (topic, difficulty) over all shards (cached per generation)"""
+        generation = self.generation
+        cached = self._catalog_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        catalog = {}
+        for index in self.shards().values():
+            catalog.update(index.catalog())
+        self._catalog_cache = (generation, catalog)
+        return catalog
+
+    # ----------------------------------------------------------------- writes
+
+    def upsert(self, points: List[Tuple[np.ndarray, Dict]]):
+        """Insert or replace problems, each in the shard of its topic"""
+        catalog = self.catalog()
+        by_shard: Dict[str, List[Tuple[np.ndarray, Dict]]] = {}
+        moved: Dict[str, List[str]] = {}
+        for vector, payload in points:
+            name = shard_name(payload.get("topic"))
+            by_shard.setdefault(name, []).append((vector, payload))
+            previous = catalog.get(payload["problem_id"])
+            if previous is not None and shard_name(previous[0]) != name:
+                moved.setdefault(shard_name(previous[0]), []).append(payload["problem_id"])
+        for name, shard_points in by_shard.items():
+            self.shard(name).upsert(shard_points)
+        for name, ids in moved.items():
+            self.shard(name).delete(ids)
+
+    def delete(self, problem_ids: List[str]):
+        """Remove problems by problem_id"""
+        catalog = self.catalog()
+        by_shard: Dict[str, List[str]] = {}
+        for problem_id in problem_ids:
+            if problem_id in catalog:
+                by_shard.setdefault(shard_name(catalog[problem_id][0]), []).append(problem_id)
+        for name, ids in by_shard.items():
+            self.shard(name).delete(ids)
+
+    def rebuild_shard(
+        self,
+        shard: str,
+        vectors: np.ndarray,
+        payloads: List[Dict],
+        validate: Optional[Callable[[int, Callable], None]] = None
+    ) -> int:
+        """
+        Blue/green rebuild of one shard; the other shards keep serving untouched.
+
+        Args:
+            shard: Shard name (see shard_name)
+            vectors: Embeddings of the shard's complete new contents
+            payloads: Payloads, all with a topic that maps to this shard
+            validate: Optional validate(count, search) run against the staged shard
+
+        Returns:
+            The new generation of the whole index
+        """
+        stray = [p["problem_id"] for p in payloads if shard_name(p.get("topic")) != shard]
+        if stray:
+            raise ValueError(f"{len(stray)} problems do not belong to shard {shard!r} (e.g. {stray[0]})")
+        index = self.shard(shard)
+        index.rebuild(np.asarray(vectors, dtype=np.float32).reshape(-1, index.dim), payloads, validate=validate)
+        logger.info(f"KB shard {shard!r} rebuilt: {len(payloads)} problems")
+        return self.generation
+
+    def rebuild(
+        self,
+        vectors: np.ndarray,
+        payloads: List[Dict],
+        validate: Optional[Callable[[int, Callable], None]] = None
+    ) -> int:
+        """
+        Rebuild every shard (each blue/green), then run validate(count, search)
+        against the sharded whole. Shards are swapped one at a time; if the final
+        validation fails, every shard is rebuilt back to its previous contents
+        and the error is re-raised.
+
+        Returns:
+            The new generation of the whole index
+        """
+        groups: Dict[str, List[int]] = {name: [] for name in self.shards()}
+        for row, payload in enumerate(payloads):
+            groups.setdefault(shard_name(payload.get("topic")), []).append(row)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        # Previous contents, to roll back to if the sharded whole fails validation
+        previous = {}
+        for name in groups:
+            index = self.shard(name)
+            old_payloads = index.payloads()
+            old_vectors = index.vectors([p["problem_id"] for p in old_payloads]) if old_payloads else np.zeros((0, index.dim), dtype=np.float32)
+            previous[name] = (old_vectors, old_payloads)
+        try:
+            for name, rows in groups.items():
+                self.shard(name).rebuild(vectors[rows], [payloads[row] for row in rows])
+            if validate is not None:
+                validate(self.count(), lambda vector, top_k: self.search(vector, top_k))
+        except BaseException:
+            for name, (old_vectors, old_payloads) in previous.items():
+                self.shard(name).rebuild(old_vectors, old_payloads)
+            raise
+        return self.generation
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
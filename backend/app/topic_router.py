@@ -0,0 +1,175 @@
+"""
+Embedding-centroid Topic Router
+
+A search without a topic scores every problem in the KB (or fans out over
+every shard). Most questions clearly belong to one top-level topic, and their
+embedding is closer to that topic's centroid (the normalized mean of its
+problems' embeddings) than to any other. With KB_TOPIC_ROUTER=true,
+search_similar compares the query embedding with the per-topic centroids (one
+[topics x dim] @ [dim] product) and, when one topic wins clearly, searches
+only that topic: one shard with KB_SHARD_BY_TOPIC, a topic prefilter
+otherwise (see app/payload_index.py).
+
+A prediction is confident when the best centroid similarity is at least
+min_similarity and beats the runner-up by at least min_margin. Unconfident
+queries, and routed searches that find nothing above the score threshold,
+search the whole KB as before.
+
+The router keeps a float64 vector sum and a count per topic, so writes update
+the centroids incrementally (add the new vectors, subtract the replaced or
+deleted ones) without rescanning the KB. The mmap backend saves them next to
+the index file (kb_index.bin.centroids.npz), tagged with the index generation,
+so a worker that sees another worker's write loads the writer's centroids;
+a rebuild or an unknown generation recomputes them from the stored vectors.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TopicPrediction(NamedTuple):
+    topic: Optional[str]  # Top-level topic with the most similar centroid
+    similarity: float     # Cosine similarity to that centroid
+    margin: float         # Lead over the runner-up topic
+    confident: bool
+
+
+def top_level(topic: Optional[str]) -> str:
+    """Top-level part of a topic ("Calculus - Integration" -> "Calculus")"""
+    return (topic or "").split(" - ")[0].strip()
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float64)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class TopicRouter:
+    """Per-topic embedding centroids, updated incrementally"""
+
+    def __init__(self, dim: int, min_similarity: float = 0.2, min_margin: float = 0.05):
+        """
+        Args:
+            dim: Embedding dimension
+            min_similarity: Minimum cosine similarity to the best centroid for a confident prediction
+            min_margin: Minimum lead of the best centroid over the runner-up
+        """
+        self.dim = dim
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.generation = -1  # KB generation the centroids describe (-1: never computed)
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self._centroids: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    # ----------------------------------------------------------------- writes
+
+    def _apply(self, points: Iterable[Tuple[Optional[str], np.ndarray]], sign: int):
+        points = list(points)
+        if not points:
+            return
+        topics = [top_level(topic) for topic, _ in points]
+        vectors = _normalize(np.stack([np.asarray(vector) for _, vector in points]))
+        with self._lock:
+            for topic in set(topics):
+                rows = [i for i, t in enumerate(topics) if t == topic]
+                total = self._sums.get(topic, np.zeros(self.dim, dtype=np.float64)) + sign * vectors[rows].sum(axis=0)
+                count = self._counts.get(topic, 0) + sign * len(rows)
+                if count > 0:
+                    self._sums[topic], self._counts[topic] = total, count
+                else:
+                    self._sums.pop(topic, None)
+                    self._counts.pop(topic, None)
+            self._centroids = None
+
+    def add(self, points: Iterable[Tuple[Optional[str], np.ndarray]]):
+        """Account for new problems, as (topic, embedding) pairs"""
+        self._apply(points, 1)
+
+    def remove(self, points: Iterable[Tuple[Optional[str], np.ndarray]]):
+        """Account for replaced or deleted problems, as (topic, stored embedding) pairs"""
+        self._apply(points, -1)
+
+    def reset(self, points: Iterable[Tuple[Optional[str], np.ndarray]], generation: int):
+        """Recompute every centroid from the complete KB contents"""
+        with self._lock:
+            self._sums, self._counts, self._centroids = {}, {}, None
+        self.add(points)
+        self.generation = generation
+
+    # ------------------------------------------------------------------ reads
+
+    def counts(self) -> Dict[str, int]:
+        """Problems per top-level topic"""
+        return dict(sorted(self._counts.items()))
+
+    def centroids(self) -> Tuple[List[str], np.ndarray]:
+        """Topic names and their unit-length centroids ([topics x dim], float32)"""
+        centroids = self._centroids
+        if centroids is None:
+            with self._lock:
+                topics = sorted(self._sums)
+                matrix = _normalize(np.stack([self._sums[t] for t in topics])) if topics else np.zeros((0, self.dim))
+                centroids = self._centroids = (topics, matrix.astype(np.float32))
+        return centroids
+
+    def predict(self, vector) -> TopicPrediction:
+        """Most similar topic centroid; confident only if it wins clearly"""
+        topics, matrix = self.centroids()
+        if len(topics) < 2:
+            return TopicPrediction(topics[0] if topics else None, 1.0 if topics else 0.0, 0.0, False)
+        scores = matrix @ _normalize(vector)[0].astype(np.float32)
+        second, best = np.argpartition(scores, -2)[-2:]
+        if scores[second] > scores[best]:
+            best, second = second, best
+        similarity, margin = float(scores[best]), float(scores[best] - scores[second])
+        confident = similarity >= self.min_similarity and margin >= self.min_margin
+        return TopicPrediction(topics[best], similarity, margin, confident)
+
+    # ------------------------------------------------------------ persistence
+
+    def save(self, path: str):
+        """Write the centroid sums next to the index (temp file + rename)"""
+        with self._lock:
+            topics = sorted(self._sums)
+            sums = np.stack([self._sums[t] for t in topics]) if topics else np.zeros((0, self.dim))
+            counts = np.array([self._counts[t] for t in topics], dtype=np.int64)
+            generation = self.generation
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".kb-centroids-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, topics=np.array(topics, dtype=str), sums=sums, counts=counts, generation=generation)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def load(self, path: str, generation: int) -> bool:
+        """Load saved centroids if they describe the given KB generation"""
+        try:
+            with np.load(path) as saved:
+                if int(saved["generation"]) != generation or saved["sums"].shape[1:] != (self.dim,):
+                    return False
+                topics, sums, counts = [str(t) for t in saved["topics"]], saved["sums"], saved["counts"]
+        except (OSError, ValueError, KeyError):
+            return False
+        with self._lock:
+            self._sums = {topic: sums[i].astype(np.float64) for i, topic in enumerate(topics)}
+            self._counts = {topic: int(counts[i]) for i, topic in enumerate(topics)}
+            self._centroids = None
+        self.generation = generation
+        return True
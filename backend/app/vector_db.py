@@ -3,69 +3,344 @@ Vector Database module using Qdrant for storing and retrieving math problems.
 Uses sentence-transformers for local embeddings (no API key needed).
 """
 
+import hashlib
 import logging
-from typing import List, Dict, Optional
+import threading
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, List, Dict, Optional, Set, Tuple
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchAny, PayloadSchemaType
 from sentence_transformers import SentenceTransformer
+import numpy as np
 import os
+import time
+
+from app.expr_fingerprint import FingerprintTable, expression_fingerprint
+from app.lru import LRUCache
+from app.math_canonical import canonicalize
+from app.metrics import EMBEDDING_CACHE, EMBEDDING_LATENCY, KB_NEAR_DUPLICATES, KB_TOPIC_ROUTES
+from app.payload_index import INDEXED_FIELDS, matches
+from app.rwlock import RWLock
+from app.sharded_index import shard_name
 
 logger = logging.getLogger(__name__)
 
+# Payload fields a lightweight search hit needs, and the fields it carries
+SUMMARY_FIELDS = ("problem_id", "topic", "difficulty")
+HIT_FIELDS = ("id", "problem_id", "score", "topic", "difficulty", "match", "rerank_score")
+# Written problems queued for the near-duplicate index before a full re-index is cheaper
+DEDUPE_PENDING_MAX = 10000
+
+
+class KBRebuildError(RuntimeError):
+    """A blue/green rebuild failed validation (the live index is left untouched)"""
+
 
 class MathKnowledgeBase:
     """Knowledge Base for math problems using Qdrant vector database."""
     
-    def __init__(self, collection_name: str = "math_problems"):
-        """Initialize Qdrant client and create collection if needed."""
+    def __init__(self, collection_name: str = "math_problems", embedding_model=None):
+        """
+        Initialize Qdrant client and create collection if needed.
+        
+        Args:
+            collection_name: Qdrant collection name
+            embedding_model: Optional encoder with a SentenceTransformer-style encode().
+                Defaults to the shared embedding service when EMBEDDING_SOCKET is set,
+                otherwise a local SentenceTransformer.
+        """
         self.collection_name = collection_name
+        self.base_collection_name = collection_name
+        self.collection_generation = 0
+        self._rebuild_lock = threading.Lock()
+        # The in-memory Qdrant client is not safe for searches during upserts: reads hold
+        # _rw shared, writers hold it exclusively for one bounded chunk at a time
+        self._rw = RWLock()
+        self.write_chunk_size = int(os.getenv("KB_WRITE_CHUNK_SIZE", "64"))
+        # Writers are serialized; the id layer (problem_id -> (topic, difficulty)) is
+        # replaced copy-on-write, so lock-free readers always see a complete version
+        self._write_lock = threading.Lock()
+        self._catalog: Dict[str, Tuple[str, str]] = {}
+        self._generation = 0
+        self._facets_cache: Optional[Tuple[int, Dict]] = None
+        self._hashes_cache: Optional[Tuple[int, Dict]] = None
+        # Structural expression fingerprints answer cosmetic variants of a stored
+        # question without embedding (see app/expr_fingerprint.py)
+        self.fingerprint_lookup = os.getenv("KB_FINGERPRINT_LOOKUP", "true").lower() in ("1", "true", "yes")
+        self._fingerprints = FingerprintTable()
+        self._fingerprints_rebuilding = threading.Lock()
+        # Near-duplicate check on upsert_problems: off, report, skip or merge (see app/kb_dedupe.py)
+        self.dedupe_action = os.getenv("KB_DEDUPE", "report").lower()
+        if self.dedupe_action not in ("off", "report", "skip", "merge"):
+            raise ValueError(f"Unknown KB_DEDUPE: {self.dedupe_action!r} (expected 'off', 'report', 'skip' or 'merge')")
+        self._dedupe = None
+        self._dedupe_lock = threading.Lock()
+        # Writes queue (generation before, after, written payloads, removed ids) for the
+        # detector; None after an overflow (the detector then re-indexes)
+        self._dedupe_pending: Optional[List[Tuple[int, int, List[Dict], List[str]]]] = []
+        self._dedupe_pending_lock = threading.Lock()
+        # "qdrant" (in-memory client, default), "mmap" (shared exact-search index file)
+        # or "hnsw" (in-process approximate search for very large KBs)
+        self.backend = os.getenv("KB_BACKEND", "qdrant").lower()
+        self.client = None
+        self.index = None
         
-        # Initialize Qdrant client (in-memory for development)
-        self.client = QdrantClient(":memory:")
-        logger.info("Initialized Qdrant client (in-memory mode)")
+        if self.backend == "qdrant":
+            # Initialize Qdrant client (in-memory for development)
+            self.client = QdrantClient(":memory:")
+            logger.info("Initialized Qdrant client (in-memory mode)")
+        elif self.backend not in ("mmap", "hnsw"):
+            raise ValueError(f"Unknown KB_BACKEND: {self.backend!r} (expected 'qdrant', 'mmap' or 'hnsw')")
         
-        # Initialize sentence-transformers for local embeddings (no API key needed!)
-        logger.info("Loading sentence-transformers model (this may take a moment on first run)...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Recorded in compiled KB artifacts (see app/kb_artifact.py)
+        self.embedding_model_name = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+        if embedding_model is not None:
+            self.embedding_model = embedding_model
+            self.embedding_model_name = type(embedding_model).__name__
+        elif os.getenv("EMBEDDING_SOCKET"):
+            # One model instance shared by all local processes (see app/embedding_service.py)
+            from app.embedding_service import RemoteEmbedder
+            self.embedding_model = RemoteEmbedder(os.getenv("EMBEDDING_SOCKET"))
+            logger.info(f"Using embedding service at {self.embedding_model.socket_path}")
+        else:
+            # Initialize sentence-transformers for local embeddings (no API key needed!)
+            logger.info("Loading sentence-transformers model (this may take a moment on first run)...")
+            # EMBEDDING_MODEL can point at a local copy (e.g. baked into the Docker image)
+            self.embedding_model = SentenceTransformer(os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+            if os.getenv("EMBEDDING_BATCHING", "false").lower() in ("1", "true", "yes"):
+                # Coalesce concurrent single-question encodes (see app/embedding_batcher.py)
+                from app.embedding_batcher import EmbeddingBatcher
+                self.embedding_model = EmbeddingBatcher(
+                    self.embedding_model,
+                    max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+                    max_wait_ms=float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "3"))
+                )
+                logger.info("Embedding micro-batching enabled")
         self.embedding_dim = 384  # Dimension for all-MiniLM-L6-v2
+        # Questions are embedded in canonical math notation (see app/math_canonical.py);
+        # query embeddings are cached by that canonical text
+        self.canonicalize = os.getenv("EMBED_CANONICALIZE", "true").lower() in ("1", "true", "yes")
+        self.query_cache = LRUCache(int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")))
+
+        # Cross-encoder re-ranking of the top candidates (see app/reranker.py)
+        self.reranker = None
+        if os.getenv("KB_RERANK", "false").lower() in ("1", "true", "yes"):
+            from app.reranker import DEFAULT_MODEL, CrossEncoderReranker
+            self.reranker = CrossEncoderReranker(
+                os.getenv("KB_RERANK_MODEL", DEFAULT_MODEL),
+                top_n=int(os.getenv("KB_RERANK_TOP_N", "10")),
+                budget_ms=float(os.getenv("KB_RERANK_BUDGET_MS", "150")),
+                cache_size=int(os.getenv("KB_RERANK_CACHE_SIZE", "4096"))
+            )
+            logger.info(f"Re-ranking the top {self.reranker.top_n} with {self.reranker.model_name}")
+        
+        # Quantized codes + full-precision rescoring (see app/quantization.py)
+        quantization = os.getenv("KB_QUANTIZATION", "none").lower()
+        if quantization != "none" and self.backend != "mmap":
+            logger.warning(f"KB_QUANTIZATION is ignored with KB_BACKEND={self.backend} (only the mmap backend keeps codes)")
+        
+        # One index per top-level topic, searched alone or in parallel (see app/sharded_index.py)
+        self.sharded = os.getenv("KB_SHARD_BY_TOPIC", "false").lower() in ("1", "true", "yes")
+        if self.sharded and self.backend == "qdrant":
+            logger.warning("KB_SHARD_BY_TOPIC is ignored with KB_BACKEND=qdrant (only the mmap and hnsw backends shard)")
+            self.sharded = False
+        
+        # Routes searches without a topic to the topic with the nearest centroid (see app/topic_router.py)
+        self.topic_router = None
+        self._router_lock = threading.Lock()
+        if os.getenv("KB_TOPIC_ROUTER", "false").lower() in ("1", "true", "yes"):
+            from app.topic_router import TopicRouter
+            self.topic_router = TopicRouter(
+                self.embedding_dim,
+                min_similarity=float(os.getenv("KB_TOPIC_ROUTER_MIN_SIMILARITY", "0.2")),
+                min_margin=float(os.getenv("KB_TOPIC_ROUTER_MARGIN", "0.05"))
+            )
+            logger.info("Topic router enabled")
+        
+        if self.backend == "mmap":
+            # Every worker maps the same file read-only (see app/mmap_index.py)
+            from app.mmap_index import MmapVectorIndex
+            index_path = os.getenv("KB_INDEX_PATH", os.path.join(os.path.dirname(__file__), "..", "kb", "kb_index.bin"))
+            
+            def make_index(path):
+                return MmapVectorIndex(
+                    path,
+                    dim=self.embedding_dim,
+                    refresh_interval=float(os.getenv("KB_INDEX_REFRESH_MS", "100")) / 1000.0,
+                    quantization=quantization,
+                    rescore_factor=int(os.getenv("KB_RESCORE_FACTOR", "10"))
+                )
+            
+            if self.sharded:
+                from app.sharded_index import ShardedVectorIndex, discover_mmap_shards, mmap_shard_path
+                self.index = ShardedVectorIndex(
+                    lambda shard: make_index(mmap_shard_path(index_path, shard)),
+                    discover=lambda: discover_mmap_shards(index_path),
+                    workers=int(os.getenv("KB_SHARD_WORKERS", "4"))
+                )
+                self.index.path = index_path
+                logger.info(f"Using topic-sharded mmap index next to {index_path} ({len(self.index.shards())} shards)")
+            else:
+                self.index = make_index(index_path)
+                logger.info(f"Using shared mmap index at {self.index.path} (generation {self.index.generation})")
+            if quantization != "none":
+                logger.info(f"Searching {quantization} codes, rescoring top_k x {os.getenv('KB_RESCORE_FACTOR', '10')} in full precision")
+        elif self.backend == "hnsw":
+            # Approximate nearest-neighbour graph (see app/hnsw_index.py)
+            from app.hnsw_index import HnswVectorIndex
+            
+            def make_index(_shard=None):
+                return HnswVectorIndex(
+                    self.embedding_dim,
+                    m=int(os.getenv("KB_HNSW_M", "16")),
+                    ef_construction=int(os.getenv("KB_HNSW_EF_CONSTRUCTION", "200")),
+                    ef=int(os.getenv("KB_HNSW_EF", "64")),
+                    write_chunk_size=self.write_chunk_size,
+                    exact_filter_limit=int(os.getenv("KB_HNSW_EXACT_FILTER_LIMIT", "500"))
+                )
+            
+            if self.sharded:
+                from app.sharded_index import ShardedVectorIndex
+                self.index = ShardedVectorIndex(make_index, workers=int(os.getenv("KB_SHARD_WORKERS", "4")))
+                logger.info("Using topic-sharded HNSW indexes")
+            else:
+                self.index = make_index()
+                logger.info(f"Using HNSW index (M={self.index.m}, ef_construction={self.index.ef_construction}, ef={self.index.ef})")
+        else:
+            # Create collection if it doesn't exist
+            self._create_collection()
         
-        # Create collection if it doesn't exist
-        self._create_collection()
+        # Optional store shared by all workers (see app/kb_store.py)
+        self.store = None
+        self.store_sync_interval = float(os.getenv("KB_SYNC_INTERVAL_MS", "500")) / 1000.0
+        self._store_generation = 0
+        self._store_checked_at = 0.0
+        self.last_sync: Optional[Dict] = None
+        store_path = os.getenv("KB_STORE_PATH")
+        if store_path and self.index is not None:
+            logger.warning(f"KB_STORE_PATH is ignored with KB_BACKEND={self.backend} (only the qdrant backend syncs through the store)")
+        elif store_path:
+            from app.kb_store import KBStore
+            self.store = KBStore(store_path)
+            with self._write_lock:
+                self._sync_locked()
+            self._store_checked_at = time.monotonic()
+            logger.info(f"Using shared KB store at {store_path} ({len(self._catalog)} problems, generation {self._store_generation})")
         
-    def _create_collection(self):
+    def _create_collection(self, collection_name: Optional[str] = None):
         """Create Qdrant collection with proper schema."""
+        collection_name = collection_name or self.collection_name
         try:
             collections = self.client.get_collections().collections
             collection_names = [col.name for col in collections]
             
-            if self.collection_name not in collection_names:
+            if collection_name not in collection_names:
                 self.client.create_collection(
-                    collection_name=self.collection_name,
+                    collection_name=collection_name,
                     vectors_config=VectorParams(
                         size=self.embedding_dim,
                         distance=Distance.COSINE
                     )
                 )
-                logger.info(f"Created collection: {self.collection_name}")
+                # Keyword indexes for filtered search; local (in-memory) mode ignores them
+                # with a warning, a Qdrant server uses them to plan filtered searches
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", UserWarning)
+                    for field in INDEXED_FIELDS:
+                        self.client.create_payload_index(
+                            collection_name=collection_name,
+                            field_name=field,
+                            field_schema=PayloadSchemaType.KEYWORD
+                        )
+                logger.info(f"Created collection: {collection_name}")
             else:
-                logger.info(f"Collection already exists: {self.collection_name}")
+                logger.info(f"Collection already exists: {collection_name}")
         except Exception as e:
             logger.error(f"Error creating collection: {e}")
             raise
     
-    def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using sentence-transformers (local, no API needed)."""
+    @contextmanager
+    def _reading(self):
+        """Read the live collection; writes and a rebuild's switch wait until the read is done"""
+        with self._rw.read_locked():
+            yield self.collection_name
+    
+    def _drop_collection(self, name: str):
         try:
+            with self._rw.write_locked():
+                self.client.delete_collection(collection_name=name)
+            logger.info(f"Dropped retired collection: {name}")
+        except Exception as e:
+            logger.error(f"Error dropping collection {name}: {e}")
+    
+    @staticmethod
+    def point_id(problem_id: str) -> int:
+        """Convert a string problem ID to an integer point ID (Qdrant accepts int or UUID)"""
+        return int(hashlib.md5(problem_id.encode()).hexdigest()[:8], 16)
+    
+    def embedding_text(self, text: str) -> str:
+        """Text actually fed to the encoder (and used as the cache key) for a question"""
+        return canonicalize(text) if self.canonicalize else text
+
+    def generate_embedding(self, text: str, timings: Optional[Dict[str, float]] = None) -> List[float]:
+        """
+        Generate embedding for text using sentence-transformers (local, no API needed).
+        
+        The text is canonicalized first and repeated questions (in any equivalent
+        notation) are served from the query embedding cache.
+        If a timings dict is passed, the encode time (seconds) is stored under "embed".
+        """
+        try:
+            start = time.perf_counter()
+            key = self.embedding_text(text)
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                EMBEDDING_CACHE.inc(result="hit")
+                if timings is not None:
+                    timings["embed"] = time.perf_counter() - start
+                return list(cached)
+            EMBEDDING_CACHE.inc(result="miss")
             # Generate embedding locally
-            embedding = self.embedding_model.encode(text, convert_to_tensor=False)
+            embedding = self.embedding_model.encode(key, convert_to_tensor=False)
+            elapsed = time.perf_counter() - start
+            EMBEDDING_LATENCY.observe(elapsed)
+            if timings is not None:
+                timings["embed"] = elapsed
             # Convert numpy array to list
             embedding_list = embedding.tolist()
+            self.query_cache.put(key, tuple(embedding_list))
             logger.debug(f"Generated embedding for text: {text[:50]}...")
             return embedding_list
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
     
+    def generate_embeddings(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Encode many texts in batched forward passes (returns a (len(texts), dim) array)"""
+        if not texts:
+            return np.zeros((0, self.embedding_dim), dtype=np.float32)
+        start = time.perf_counter()
+        embeddings = np.asarray(
+            self.embedding_model.encode([self.embedding_text(t) for t in texts], convert_to_tensor=False, batch_size=batch_size),
+            dtype=np.float32
+        )
+        EMBEDDING_LATENCY.observe(time.perf_counter() - start)
+        return embeddings
+    
+    @staticmethod
+    def _payload(problem: Dict) -> Dict:
+        return {
+            "problem_id": problem["problem_id"],  # Store original ID in payload
+            "question": problem["question"],
+            "solution_steps": problem["solution_steps"],
+            "final_answer": problem["final_answer"],
+            "difficulty": problem["difficulty"],
+            "tags": problem["tags"],
+            "topic": problem["topic"]
+        }
+    
     def add_problem(
         self,
         problem_id: str,
@@ -77,46 +352,712 @@ class MathKnowledgeBase:
         topic: str
     ):
         """Add a math problem to the knowledge base."""
+        self.upsert_problems([{
+            "problem_id": problem_id,
+            "question": question,
+            "solution_steps": solution_steps,
+            "final_answer": final_answer,
+            "difficulty": difficulty,
+            "tags": tags,
+            "topic": topic
+        }])
+        logger.info(f"Added problem: {problem_id}")
+    
+    def upsert_problems(self, problems: List[Dict], batch_size: int = 64, dedupe_report: Optional[Dict] = None) -> int:
+        """
+        Add or replace many problems, embedding their questions in batched forward passes.
+        
+        Embedding runs without any lock. The Qdrant upsert is applied in chunks of
+        write_chunk_size points, each under a short exclusive lock together with its
+        id-layer update and a generation bump, so searches are never blocked for more
+        than one chunk and generation-keyed caches never see a torn update.
+        
+        With a shared store (KB_STORE_PATH), problems whose stored payload is identical
+        are skipped before embedding, and the write goes through the store so every
+        worker applies it.
+        
+        Near-duplicates of stored problems (and of earlier problems in the batch) are
+        reported, skipped or merged per KB_DEDUPE.
+        
+        Args:
+            problems: Problems (add_problem fields)
+            batch_size: Texts per embedding forward pass
+            dedupe_report: Optional dict that receives this call's dedupe outcome (action,
+                checked, duplicates, dropped, merged, seconds); left empty when nothing
+                was checked (KB_DEDUPE=off, or every problem unchanged)
+        
+        Returns:
+            Number of problems written
+        """
+        payloads = list({p["problem_id"]: self._payload(p) for p in problems}.values())
         try:
-            # Generate embedding for the question
-            embedding = self.generate_embedding(question)
-            
-            # Convert string ID to integer hash (Qdrant accepts int or UUID)
-            import hashlib
-            point_id = int(hashlib.md5(problem_id.encode()).hexdigest()[:8], 16)
-            
-            # Create point with metadata
-            point = PointStruct(
-                id=point_id,
-                vector=embedding,
-                payload={
-                    "problem_id": problem_id,  # Store original ID in payload
-                    "question": question,
-                    "solution_steps": solution_steps,
-                    "final_answer": final_answer,
-                    "difficulty": difficulty,
-                    "tags": tags,
-                    "topic": topic
-                }
+            if self.store is not None:
+                unchanged = self.store.unchanged(payloads)
+                payloads = [p for p in payloads if p["problem_id"] not in unchanged]
+            if not payloads:
+                return 0
+            embeddings = self.generate_embeddings([p["question"] for p in payloads], batch_size=batch_size)
+            if self.dedupe_action == "off":
+                self._write_embedded(payloads, embeddings)
+                return len(payloads)
+            # Check, write and index under one lock so concurrent batches see each other
+            with self._dedupe_lock:
+                detector = self._dedupe_detector()
+                written, embeddings = self._deduplicate(
+                    detector, payloads, embeddings, dedupe_report if dedupe_report is not None else {}
+                )
+                if written:
+                    self._write_embedded(written, embeddings)  # Queues the detector update (_derived_update)
+            return len(written)
+        except Exception as e:
+            logger.error(f"Error adding problems: {e}")
+            raise
+    
+    def _dedupe_detector(self):
+        """
+        Near-duplicate index of the stored problems (caller holds _dedupe_lock).
+        
+        Writes through any path (upserts, deletes, sync, store deltas) are applied
+        incrementally from the queue _derived_update fills. Only writes this process
+        didn't see (another worker's write to the mmap index, a rebuild) re-index
+        the stored payloads.
+        """
+        from app.kb_dedupe import NearDuplicateDetector
+        
+        if self._dedupe is None:
+            self._dedupe = NearDuplicateDetector(
+                self.dedupe_action,
+                jaccard_threshold=float(os.getenv("KB_DEDUPE_JACCARD", "0.5")),
+                cosine_threshold=float(os.getenv("KB_DEDUPE_COSINE", "0.85"))
             )
-            
-            # Upsert to Qdrant
-            self.client.upsert(
+        detector = self._dedupe
+        self.sync()
+        with self._dedupe_pending_lock:
+            pending, self._dedupe_pending = self._dedupe_pending, []
+        if pending is None:
+            detector.generation = None
+        for before, after, payloads, removed in pending or ():
+            if detector.generation == before:
+                detector.remove(removed)
+                detector.add(payloads)
+                detector.generation = after
+        generation = self.generation
+        if detector.generation != generation:
+            # Signatures of unchanged questions are reused, so this is a dict pass, not a re-hash
+            detector.load(self._stored_payloads(), generation)
+        return detector
+    
+    def _deduplicate(
+        self, detector, payloads: List[Dict], embeddings: np.ndarray, report: Dict
+    ) -> Tuple[List[Dict], np.ndarray]:
+        """Apply KB_DEDUPE to an embedded batch, filling report; returns the payloads and embeddings to write"""
+        start = time.perf_counter()
+        duplicates = detector.check(payloads, embeddings, self._stored_vector_map)
+        report.update(action=self.dedupe_action, checked=len(payloads), duplicates=duplicates, dropped=0, merged=[])
+        if duplicates:
+            KB_NEAR_DUPLICATES.inc(len(duplicates), action=self.dedupe_action)
+            pairs = ", ".join(f"{d['problem_id']} ~ {d['duplicate_of']}" for d in duplicates[:10])
+            logger.info(f"Near-duplicates ({self.dedupe_action}): {pairs}{' ...' if len(duplicates) > 10 else ''}")
+        if self.dedupe_action == "report" or not duplicates:
+            report["seconds"] = round(time.perf_counter() - start, 4)
+            return payloads, embeddings
+        
+        dropped = {d["problem_id"]: d["duplicate_of"] for d in duplicates}
+        rows = [row for row, payload in enumerate(payloads) if payload["problem_id"] not in dropped]
+        kept = [payloads[row] for row in rows]
+        embeddings = embeddings[rows]
+        report["dropped"] = len(dropped)
+        if self.dedupe_action == "merge":
+            # Tags of a dropped problem move to the problem it duplicates (kept in this batch or stored)
+            batch = {payload["problem_id"]: payload for payload in kept}
+            sources = {payload["problem_id"]: payload for payload in payloads}
+            updated: Dict[str, Dict] = {}
+            for problem_id, target_id in dropped.items():
+                target = batch.get(target_id) or updated.get(target_id)
+                if target is None:
+                    stored = self.get_problem(target_id)
+                    if stored is None:
+                        continue
+                    target = dict(stored)
+                new_tags = [tag for tag in sources[problem_id]["tags"] if tag not in target["tags"]]
+                if new_tags:
+                    target["tags"] = list(target["tags"]) + new_tags
+                    if target_id not in batch:
+                        updated[target_id] = target
+            if updated:
+                vectors = self._stored_vector_map(list(updated))
+                updated = {pid: payload for pid, payload in updated.items() if pid in vectors}
+                kept = kept + list(updated.values())
+                embeddings = np.vstack([embeddings] + [vectors[pid][None, :] for pid in updated]).astype(np.float32)
+            report["merged"] = sorted(updated)
+        report["seconds"] = round(time.perf_counter() - start, 4)
+        return kept, embeddings
+    
+    def upsert_embedded(self, problems: List[Dict], embeddings: np.ndarray) -> int:
+        """
+        Add or replace problems whose question embeddings are already computed
+        (e.g. loaded from a compiled KB artifact), skipping the encoder entirely.
+        
+        Returns:
+            Number of problems written
+        """
+        if len(problems) != len(embeddings):
+            raise ValueError(f"{len(problems)} problems but {len(embeddings)} embeddings")
+        rows = {p["problem_id"]: (self._payload(p), vector) for p, vector in zip(problems, embeddings)}
+        if self.store is not None:
+            unchanged = self.store.unchanged(payload for payload, _ in rows.values())
+            rows = {pid: row for pid, row in rows.items() if pid not in unchanged}
+        if not rows:
+            return 0
+        payloads = [payload for payload, _ in rows.values()]
+        self._write_embedded(payloads, np.stack([np.asarray(vector, dtype=np.float32) for _, vector in rows.values()]))
+        return len(payloads)
+    
+    def _write_embedded(self, payloads: List[Dict], embeddings: np.ndarray):
+        """Route embedded points to the active backend (mmap index, shared store or live collection)"""
+        with self._write_lock:
+            if self.index is not None:
+                # The mmap index publishes a whole new generation atomically; HNSW inserts in locked chunks
+                with self._derived_update(payloads, embeddings):
+                    self.index.upsert(list(zip(embeddings, payloads)))
+            elif self.store is not None:
+                self.store.upsert(payloads, embeddings)
+                self._sync_locked()
+            else:
+                self._apply_upserts(payloads, embeddings)
+    
+    def _apply_upserts(self, payloads: List[Dict], embeddings: np.ndarray):
+        """Write points to the live collection in short exclusive chunks (caller holds _write_lock)"""
+        with self._derived_update(payloads, embeddings):
+            self._upsert_chunks(payloads, embeddings)
+    
+    def _upsert_chunks(self, payloads: List[Dict], embeddings: np.ndarray):
+        chunk = max(1, self.write_chunk_size)
+        for offset in range(0, len(payloads), chunk):
+            chunk_payloads = payloads[offset:offset + chunk]
+            points = [
+                PointStruct(id=self.point_id(payload["problem_id"]), vector=np.asarray(vector).tolist(), payload=payload)
+                for payload, vector in zip(chunk_payloads, embeddings[offset:offset + chunk])
+            ]
+            catalog = dict(self._catalog)
+            catalog.update((p["problem_id"], (p["topic"], p["difficulty"])) for p in chunk_payloads)
+            with self._rw.write_locked():
+                self.client.upsert(collection_name=self.collection_name, points=points)
+                self._catalog = catalog
+                self._generation += 1
+    
+    def _apply_deletes(self, problem_ids: List[str]):
+        """Remove points from the live collection (caller holds _write_lock)"""
+        present = [pid for pid in problem_ids if pid in self._catalog]
+        if not present:
+            return
+        catalog = dict(self._catalog)
+        for pid in present:
+            catalog.pop(pid, None)
+        with self._derived_update(deleted=present), self._rw.write_locked():
+            self.client.delete(
                 collection_name=self.collection_name,
-                points=[point]
+                points_selector=[self.point_id(pid) for pid in present]
             )
-            logger.info(f"Added problem: {problem_id}")
-            
+            self._catalog = catalog
+            self._generation += 1
+    
+    def delete_problems(self, problem_ids: List[str]) -> int:
+        """
+        Remove problems by problem_id (unknown ids are ignored).
+        
+        Returns:
+            Number of problems that were present
+        """
+        try:
+            with self._write_lock:
+                present = [pid for pid in dict.fromkeys(problem_ids) if self.has_problem(pid)]
+                if not present:
+                    return 0
+                if self.index is not None:
+                    with self._derived_update(deleted=present):
+                        self.index.delete(present)
+                elif self.store is not None:
+                    self.store.delete(present)
+                    self._sync_locked()
+                else:
+                    self._apply_deletes(present)
+            logger.info(f"Deleted {len(present)} problems")
+            return len(present)
         except Exception as e:
-            logger.error(f"Error adding problem: {e}")
+            logger.error(f"Error deleting problems: {e}")
             raise
     
+    def sync(self, force: bool = False) -> bool:
+        """
+        Apply writes made by other workers through the shared store.
+        
+        Checks the store's generation at most every store_sync_interval seconds
+        (unless forced) and fetches only the rows written since the last sync.
+        If another thread is already writing or syncing, unforced calls return
+        immediately instead of waiting.
+        
+        Returns:
+            True if a delta was applied
+        """
+        if self.store is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._store_checked_at < self.store_sync_interval:
+            return False
+        self._store_checked_at = now
+        if self.store.generation() == self._store_generation:
+            return False
+        if not self._write_lock.acquire(blocking=force):
+            return False
+        try:
+            return self._sync_locked()
+        finally:
+            self._write_lock.release()
+    
+    def _sync_locked(self) -> bool:
+        """Fetch and apply the store delta (caller holds _write_lock)"""
+        upserts, deleted, generation = self.store.changes_since(self._store_generation)
+        if upserts:
+            self._apply_upserts([payload for payload, _ in upserts], np.stack([vector for _, vector in upserts]))
+        if deleted:
+            self._apply_deletes(deleted)
+        changed = generation != self._store_generation
+        self.last_sync = {"from": self._store_generation, "to": generation, "upserts": len(upserts), "deletes": len(deleted)}
+        self._store_generation = generation
+        if changed:
+            logger.info(f"Synced KB store generation {self.last_sync['from']} → {generation} "
+                        f"({len(upserts)} upserts, {len(deleted)} deletes)")
+        return changed
+    
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every write (and by writes from other processes for the mmap backend)"""
+        if self.index is not None:
+            return self.index.generation
+        return self._generation
+    
+    def _current_catalog(self) -> Dict[str, Tuple[str, str]]:
+        self.sync()
+        if self.index is not None:
+            return self.index.catalog()
+        return self._catalog
+    
+    def has_problem(self, problem_id: str) -> bool:
+        """Whether a problem_id is in the KB (id layer, no vector search)"""
+        return problem_id in self._current_catalog()
+    
+    def get_problem(self, problem_id: str) -> Optional[Dict]:
+        """Full payload of one problem, or None"""
+        if self.index is not None:
+            return self.index.get(problem_id)
+        if not self.has_problem(problem_id):
+            return None
+        with self._reading() as collection_name:
+            points = self.client.retrieve(collection_name=collection_name, ids=[self.point_id(problem_id)], with_payload=True)
+        return points[0].payload if points else None
+    
+    def get_problems(self, problem_ids: List[str]) -> Dict[str, Dict]:
+        """Full payloads of several problems (one retrieve call on Qdrant); missing ids are left out"""
+        if self.index is not None:
+            payloads = {problem_id: self.index.get(problem_id) for problem_id in problem_ids}
+            return {problem_id: payload for problem_id, payload in payloads.items() if payload is not None}
+        if not problem_ids:
+            return {}
+        with self._reading() as collection_name:
+            points = self.client.retrieve(
+                collection_name=collection_name, ids=[self.point_id(pid) for pid in problem_ids], with_payload=True
+            )
+        return {point.payload["problem_id"]: point.payload for point in points}
+    
+    def facet_counts(self) -> Dict[str, Dict[str, int]]:
+        """Problem counts per topic and per difficulty (cached per KB generation)"""
+        generation = self.generation
+        cached = self._facets_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        values = list(self._current_catalog().values())
+        facets = {
+            "topic": dict(Counter(topic for topic, _ in values)),
+            "difficulty": dict(Counter(difficulty for _, difficulty in values))
+        }
+        self._facets_cache = (generation, facets)
+        return facets
+    
+    def _stored_payloads(self) -> Iterable[Dict]:
+        """Every stored payload (no vectors)"""
+        if self.index is not None:
+            return self.index.payloads()
+        payloads, offset = [], None
+        with self._reading() as collection_name:
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=collection_name, limit=1024, offset=offset, with_payload=True, with_vectors=False
+                )
+                payloads.extend(point.payload for point in points)
+                if offset is None:
+                    return payloads
+    
+    def content_hashes(self) -> Dict[str, Tuple[str, str]]:
+        """problem_id -> (question hash, payload hash) of the stored problems (cached per KB generation)"""
+        from app.kb_dataset import content_hashes
+        
+        self.sync()
+        generation = self.generation
+        cached = self._hashes_cache
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+        hashes = {payload["problem_id"]: content_hashes(payload) for payload in self._stored_payloads()}
+        self._hashes_cache = (generation, hashes)
+        return hashes
+    
+    def fingerprint_index(self) -> Dict[str, str]:
+        """Expression fingerprint -> problem_id of the stored problems"""
+        return self._fingerprint_table().index()
+    
+    def _fingerprint_table(self) -> FingerprintTable:
+        """
+        The fingerprint table, built on first use (the worker's warm-up). Writes made
+        here, or applied from the shared store, update it in place. After a write it
+        didn't see (another worker's write to the mmap index, a rebuild) it is
+        re-indexed on a background thread while searches keep using it.
+        """
+        table = self._fingerprints
+        self.sync()
+        generation = self.generation
+        if table.generation == generation:
+            return table
+        if table.generation is None:
+            with self._fingerprints_rebuilding:
+                if table.generation is None:
+                    self._reindex_fingerprints()
+        elif self._fingerprints_rebuilding.acquire(blocking=False):
+            def reindex():
+                try:
+                    self._reindex_fingerprints()
+                except Exception as e:
+                    logger.error(f"Fingerprint table re-index failed: {e}")
+                finally:
+                    self._fingerprints_rebuilding.release()
+            threading.Thread(target=reindex, name="fingerprint-reindex", daemon=True).start()
+        return table
+    
+    def _reindex_fingerprints(self):
+        start = time.perf_counter()
+        generation = self.generation
+        self._fingerprints.reset(self._stored_payloads(), generation)
+        logger.info(f"Indexed expression fingerprints in {(time.perf_counter() - start) * 1000:.0f} ms (generation {generation})")
+    
+    def _fingerprint_match(self, query: str, where: Optional[Dict[str, Set[str]]]) -> Optional[Dict]:
+        """Payload of the stored problem with the query's expression fingerprint, if any (and passing where)"""
+        fingerprint = expression_fingerprint(query)
+        if fingerprint is None:
+            return None
+        problem_id = self._fingerprint_table().get(fingerprint)
+        payload = self.get_problem(problem_id) if problem_id is not None else None
+        if payload is None or not matches(payload, where):
+            return None
+        if expression_fingerprint(payload["question"]) != fingerprint:
+            return None  # Changed by a write the table is still catching up with
+        return payload
+    
+    def search_filter(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> Optional[Dict[str, Set[str]]]:
+        """
+        Payload filter ("where": field -> accepted values) for a search, or None.
+        
+        A topic also matches its subtopics ("Calculus" matches "Calculus - Integration");
+        topics and difficulties match case-insensitively against the stored values.
+        A problem passes tags if it has any of them.
+        """
+        where = {}
+        if topic or difficulty:
+            facets = self.facet_counts()
+        if topic:
+            wanted = topic.strip().lower()
+            where["topic"] = {
+                stored for stored in facets["topic"]
+                if stored and (stored.lower() == wanted or stored.lower().startswith(wanted + " - "))
+            }
+        if difficulty:
+            wanted = difficulty.strip().lower()
+            where["difficulty"] = {stored for stored in facets["difficulty"] if stored and stored.lower() == wanted}
+        if tags:
+            where["tags"] = set(tags)
+        return where or None
+    
+    def _router_path(self) -> Optional[str]:
+        """Centroid file saved next to the mmap index (other backends keep centroids in memory)"""
+        path = getattr(self.index, "path", None) if self.backend == "mmap" else None
+        return path + ".centroids.npz" if path else None
+    
+    @contextmanager
+    def _derived_update(self, payloads: List[Dict] = (), embeddings: Optional[np.ndarray] = None, deleted: List[str] = ()):
+        """Move the indexes derived from the stored problems along with a write (caller holds _write_lock)"""
+        before = self.generation
+        with self._routing_update(payloads, embeddings, deleted):
+            yield
+        after = self.generation
+        if self.backend == "mmap" and after not in (before, before + 1):
+            return  # Another worker wrote in between: the tables are re-indexed on next use
+        table = self._fingerprints
+        if table.generation == before:
+            table.remove(deleted)
+            table.add(payloads)
+            table.generation = after
+        if self._dedupe is not None:
+            removed = list(deleted) + [payload["problem_id"] for payload in payloads]
+            with self._dedupe_pending_lock:
+                pending = self._dedupe_pending
+                if pending is not None and sum(len(entry[2]) for entry in pending) + len(payloads) > DEDUPE_PENDING_MAX:
+                    pending = self._dedupe_pending = None  # Re-index on the next ingest instead
+                if pending is not None:
+                    pending.append((before, after, list(payloads), removed))
+    
+    @contextmanager
+    def _routing_update(self, payloads: List[Dict] = (), embeddings: Optional[np.ndarray] = None, deleted: List[str] = ()):
+        """Move the topic centroids along with a write (caller holds _write_lock)"""
+        router = self.topic_router
+        if router is None or router.generation != self.generation:
+            # Stale centroids are recomputed (or loaded) on the next routed search anyway
+            yield
+            return
+        catalog = self.index.catalog() if self.index is not None else self._catalog
+        old_ids = [pid for pid in [p["problem_id"] for p in payloads] + list(deleted) if pid in catalog]
+        old = self._stored_vector_map(old_ids)
+        yield
+        router.remove((catalog[pid][0], vector) for pid, vector in old.items())
+        router.add((payload.get("topic"), vector) for payload, vector in zip(payloads, embeddings if embeddings is not None else []))
+        router.generation = self.generation
+        path = self._router_path()
+        if path:
+            router.save(path)
+    
+    def current_topic_router(self):
+        """The topic router with centroids for the current KB generation (None when disabled)"""
+        router = self.topic_router
+        if router is None:
+            return None
+        self.sync()
+        if router.generation == self.generation:
+            return router
+        with self._router_lock:
+            generation = self.generation
+            if router.generation == generation:
+                return router
+            path = self._router_path()
+            if path and router.load(path, generation):
+                logger.info(f"Loaded topic centroids for generation {generation}")
+                return router
+            start = time.perf_counter()
+            catalog = self._current_catalog()
+            problem_ids = list(catalog)
+            vectors = self._stored_vectors(problem_ids) if problem_ids else []
+            router.reset(((catalog[pid][0], vector) for pid, vector in zip(problem_ids, vectors)), generation)
+            if path:
+                router.save(path)
+            logger.info(f"Computed {len(router.counts())} topic centroids from {len(problem_ids)} problems "
+                        f"in {(time.perf_counter() - start) * 1000:.0f} ms (generation {generation})")
+        return router
+    
+    def _stored_vectors(self, problem_ids: List[str]) -> np.ndarray:
+        """Stored embeddings of existing problems, in the given order"""
+        if self.index is not None:
+            return self.index.vectors(problem_ids)
+        with self._reading() as collection_name:
+            points = self.client.retrieve(
+                collection_name=collection_name,
+                ids=[self.point_id(pid) for pid in problem_ids],
+                with_payload=False,
+                with_vectors=True
+            )
+        vectors = {point.id: point.vector for point in points}
+        return np.asarray([vectors[self.point_id(pid)] for pid in problem_ids], dtype=np.float32)
+    
+    def _stored_vector_map(self, problem_ids: List[str]) -> Dict[str, np.ndarray]:
+        """problem_id -> stored embedding for the ids still in the KB"""
+        catalog = self._current_catalog()
+        present = [pid for pid in problem_ids if pid in catalog]
+        if not present:
+            return {}
+        return dict(zip(present, np.asarray(self._stored_vectors(present), dtype=np.float32)))
+    
+    def sync_problems(
+        self,
+        problems: Iterable[Dict],
+        delete_missing: bool = True,
+        dry_run: bool = False,
+        batch_size: int = 64
+    ) -> Dict:
+        """
+        Make the KB match a source dataset, embedding only what changed.
+        
+        Each source problem is compared with the stored content hashes of its problem_id:
+        new problems and changed questions are embedded and upserted, problems whose
+        question is unchanged but whose other fields changed are rewritten with their
+        stored embedding, and identical problems are left alone.
+        
+        Args:
+            problems: Source dataset (add_problem fields)
+            delete_missing: Also delete stored problems that are not in the source
+            dry_run: Only compute the diff
+            batch_size: Texts per embedding forward pass
+            
+        Returns:
+            Report with added, reembedded, payload_only, unchanged and deleted counts
+        """
+        from app.kb_dataset import content_hashes
+        
+        start = time.perf_counter()
+        source = {p["problem_id"]: self._payload(p) for p in problems}
+        stored = self.content_hashes()
+        added, reembedded, payload_only, unchanged = [], [], [], 0
+        for problem_id, payload in source.items():
+            current = stored.get(problem_id)
+            if current is None:
+                added.append(payload)
+                continue
+            question_hash, payload_hash = content_hashes(payload)
+            if question_hash != current[0]:
+                reembedded.append(payload)
+            elif payload_hash != current[1]:
+                payload_only.append(payload)
+            else:
+                unchanged += 1
+        removed = [pid for pid in stored if pid not in source] if delete_missing else []
+        
+        if not dry_run:
+            to_embed = added + reembedded
+            if to_embed:
+                embeddings = self.generate_embeddings([p["question"] for p in to_embed], batch_size=batch_size)
+                self._write_embedded(to_embed, embeddings)
+            if payload_only:
+                vectors = self._stored_vectors([p["problem_id"] for p in payload_only])
+                self._write_embedded(payload_only, vectors)
+            if removed:
+                self.delete_problems(removed)
+        
+        report = {
+            "added": len(added),
+            "reembedded": len(reembedded),
+            "payload_only": len(payload_only),
+            "unchanged": unchanged,
+            "deleted": len(removed),
+            "embedded": 0 if dry_run else len(added) + len(reembedded),
+            "dry_run": dry_run,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        logger.info(f"KB sync: {report}")
+        return report
+    
+    @staticmethod
+    def _result(point_id, score: float, payload: Dict, match: str = "dense") -> Dict:
+        return {
+            "id": point_id,
+            "problem_id": payload.get("problem_id"),
+            "score": score,
+            "question": payload.get("question"),
+            "solution_steps": payload.get("solution_steps"),
+            "final_answer": payload.get("final_answer"),
+            "difficulty": payload.get("difficulty"),
+            "tags": payload.get("tags"),
+            "topic": payload.get("topic"),
+            "match": match
+        }
+    
+    @staticmethod
+    def _hit(result: Dict) -> Dict:
+        """Lightweight copy of a search result: ids, scores and facets, no question or solution"""
+        return {field: result[field] for field in HIT_FIELDS if field in result}
+    
+    def hydrate(self, hits: List[Dict], timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Full results for lightweight search hits (search_similar(..., hydrate=False)).
+        
+        Args:
+            hits: Hits to hydrate, e.g. only the best one
+            timings: Optional dict whose "kb_hydrate" duration (seconds) this call adds to
+            
+        Returns:
+            The hits in the same order with question, solution_steps, final_answer and
+            tags added. Hits that are already full are kept as they are; a hit whose
+            problem was deleted since the search stays lightweight.
+        """
+        start = time.perf_counter()
+        missing = [hit["problem_id"] for hit in hits if "question" not in hit]
+        payloads = self.get_problems(missing) if missing else {}
+        results = []
+        for hit in hits:
+            payload = payloads.get(hit["problem_id"])
+            if payload is None:
+                results.append(hit)
+                continue
+            result = self._result(hit["id"], hit["score"], payload, match=hit.get("match", "dense"))
+            if "rerank_score" in hit:
+                result["rerank_score"] = hit["rerank_score"]
+            results.append(result)
+        if timings is not None:
+            # The workflow hydrates the best match, /query the rest on request
+            timings["kb_hydrate"] = timings.get("kb_hydrate", 0.0) + time.perf_counter() - start
+        return results
+    
+    def _vector_search(
+        self,
+        query_embedding: List[float],
+        top_k: int,
+        score_threshold: float,
+        where: Optional[Dict[str, Set[str]]],
+        hydrate: bool = True
+    ) -> List[Tuple[object, float, Dict]]:
+        """(point id, score, payload) hits of one search on the active backend (payload summaries without hydrate)"""
+        if self.index is not None:
+            # Filtered searches score only the rows picked by the payload index; a topic
+            # reads only its shard, otherwise all shards are searched in parallel
+            hits = [
+                (self.point_id(payload["problem_id"]), score, payload)
+                for score, payload in self.index.search(query_embedding, top_k, score_threshold, where=where, hydrate=hydrate)
+            ]
+        else:
+            # Build filter if topic/difficulty/tags specified
+            search_filter = None
+            if where:
+                search_filter = Filter(
+                    must=[
+                        FieldCondition(
+                            key=field,
+                            match=MatchAny(any=sorted(values))
+                        )
+                        for field, values in where.items()
+                    ]
+                )
+            
+            # Search in Qdrant (the collection stays pinned even if a rebuild swaps it)
+            with self._reading() as collection_name:
+                search_results = self.client.search(
+                    collection_name=collection_name,
+                    query_vector=query_embedding,
+                    limit=top_k,
+                    score_threshold=score_threshold,
+                    query_filter=search_filter,
+                    with_payload=True if hydrate else list(SUMMARY_FIELDS)
+                )
+            hits = [(result.id, result.score, result.payload) for result in search_results]
+        return hits
+    
     def search_similar(
         self,
         query: str,
         top_k: int = 3,
         score_threshold: float = 0.7,
-        topic_filter: Optional[str] = None
+        topic_filter: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None,
+        difficulty_filter: Optional[str] = None,
+        tags_filter: Optional[List[str]] = None,
+        hydrate: bool = True
     ) -> List[Dict]:
         """
         Search for similar problems in the knowledge base.
@@ -125,50 +1066,74 @@ class MathKnowledgeBase:
             query: The question to search for
             top_k: Number of results to return
             score_threshold: Minimum similarity score (0-1)
-            topic_filter: Optional topic filter
+            topic_filter: Optional topic prefilter (subtopics included)
+            timings: Optional dict that receives "embed" and "kb_search" durations (seconds)
+            difficulty_filter: Optional difficulty prefilter (e.g. "JEE_Main")
+            tags_filter: Optional tags prefilter (problems with any of them)
+            hydrate: Return full results; False returns lightweight hits (id, problem_id,
+                score, topic, difficulty, match) to pass to hydrate() as needed
             
         Returns:
-            List of search results with metadata and confidence scores
+            List of search results with metadata and confidence scores. A query whose
+            expression fingerprint matches a stored problem returns just that problem
+            (score 1.0, match "fingerprint") without computing an embedding. Without a
+            topic_filter, the topic router (KB_TOPIC_ROUTER) may restrict the search to
+            the predicted topic; an empty routed search is retried over the whole KB.
+            With KB_RERANK, the results are in cross-encoder order when it finished
+            within its budget (its candidates are always fetched in full, since the
+            cross-encoder reads their questions).
         """
         try:
-            # Generate embedding for query
-            query_embedding = self.generate_embedding(query)
+            where = self.search_filter(topic_filter, difficulty_filter, tags_filter)
+            if where and not all(where.values()):
+                # A filter value no stored problem has: nothing to search
+                if timings is not None:
+                    timings["embed"] = timings["kb_search"] = 0.0
+                logger.info(f"No problems match filter {where} for query: {query[:50]}...")
+                return []
             
-            # Build filter if topic specified
-            search_filter = None
-            if topic_filter:
-                search_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="topic",
-                            match=MatchValue(value=topic_filter)
-                        )
-                    ]
-                )
+            if self.fingerprint_lookup:
+                lookup_start = time.perf_counter()
+                payload = self._fingerprint_match(query, where)
+                if payload is not None:
+                    if timings is not None:
+                        timings["embed"] = 0.0
+                        timings["kb_search"] = time.perf_counter() - lookup_start
+                    logger.info(f"Fingerprint match {payload['problem_id']} for query: {query[:50]}...")
+                    result = self._result(self.point_id(payload["problem_id"]), 1.0, payload, match="fingerprint")
+                    return [result if hydrate else self._hit(result)]
             
-            # Search in Qdrant
-            search_results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                limit=top_k,
-                score_threshold=score_threshold,
-                query_filter=search_filter
-            )
+            # Generate embedding for query
+            query_embedding = self.generate_embedding(query, timings=timings)
+            self.sync()
+            search_start = time.perf_counter()
+            # The re-ranker picks the top_k from a longer candidate list, reading their questions
+            fetch_k = max(top_k, self.reranker.top_n) if self.reranker is not None else top_k
+            fetch_payloads = hydrate or self.reranker is not None
+            
+            hits = None
+            if topic_filter is None and self.topic_router is not None:
+                # No topic given: search the predicted topic if the router is confident
+                prediction = self.current_topic_router().predict(query_embedding)
+                if prediction.confident:
+                    routed = {**(where or {}), **self.search_filter(prediction.topic)}
+                    hits = self._vector_search(query_embedding, fetch_k, score_threshold, routed, fetch_payloads)
+                    KB_TOPIC_ROUTES.inc(result="routed" if hits else "fallback")
+                    logger.info(f"Routed to topic {prediction.topic!r} (similarity {prediction.similarity:.2f}, "
+                                f"margin {prediction.margin:.2f}): {len(hits)} hits")
+                else:
+                    KB_TOPIC_ROUTES.inc(result="global")
+            if not hits:
+                hits = self._vector_search(query_embedding, fetch_k, score_threshold, where, fetch_payloads)
             
             # Format results
-            results = []
-            for result in search_results:
-                results.append({
-                    "id": result.id,
-                    "problem_id": result.payload.get("problem_id"),
-                    "score": result.score,
-                    "question": result.payload.get("question"),
-                    "solution_steps": result.payload.get("solution_steps"),
-                    "final_answer": result.payload.get("final_answer"),
-                    "difficulty": result.payload.get("difficulty"),
-                    "tags": result.payload.get("tags"),
-                    "topic": result.payload.get("topic")
-                })
+            results = [self._result(point_id, score, payload) for point_id, score, payload in hits]
+            
+            if timings is not None:
+                timings["kb_search"] = time.perf_counter() - search_start
+            if self.reranker is not None and len(results) > 1:
+                results = self.reranker.rerank(self.embedding_text(query), query, results, timings=timings)
+            results = results[:top_k] if hydrate else [self._hit(result) for result in results[:top_k]]
             
             logger.info(f"Found {len(results)} similar problems for query: {query[:50]}...")
             return results
@@ -213,8 +1178,132 @@ class MathKnowledgeBase:
     def count_problems(self) -> int:
         """Count total number of problems in KB."""
         try:
-            collection_info = self.client.get_collection(self.collection_name)
-            return collection_info.points_count
+            if self.index is not None:
+                return self.index.count()
+            self.sync()
+            with self._reading() as collection_name:
+                return self.client.get_collection(collection_name).points_count
         except Exception as e:
             logger.error(f"Error counting problems: {e}")
             return 0
+    
+    def rebuild(
+        self,
+        problems: Iterable[Dict],
+        validation_queries: Optional[List[Tuple[str, str]]] = None,
+        top_k: int = 3,
+        batch_size: int = 64,
+        topic: Optional[str] = None
+    ) -> Dict:
+        """
+        Blue/green rebuild: index the full dataset into a new collection (or index
+        generation), validate it, then atomically switch to it and drop the old one.
+        
+        Searches keep running against the live version during the build; a search
+        already in flight when the switch happens finishes on the old version.
+        
+        Args:
+            problems: Complete source dataset (add_problem fields)
+            validation_queries: (question, expected problem_id) pairs that must appear
+                in the new index's top_k; defaults to a sample of the dataset's own questions
+            top_k: Rank within which each expected problem must be found
+            batch_size: Texts per embedding forward pass
+            topic: With KB_SHARD_BY_TOPIC, rebuild only this topic's shard from the
+                dataset's problems of that shard; the other shards keep serving untouched
+            
+        Returns:
+            Report with count, generation, collection and timing
+            
+        Raises:
+            KBRebuildError: If another rebuild is running or validation fails
+            ValueError: If topic is given without a sharded index
+        """
+        if topic is not None and not self.sharded:
+            raise ValueError("Rebuilding one topic needs KB_SHARD_BY_TOPIC=true")
+        if not self._rebuild_lock.acquire(blocking=False):
+            raise KBRebuildError("A rebuild is already in progress")
+        try:
+            start = time.perf_counter()
+            # Later duplicates of a problem_id win, as they would with add_problem
+            payloads = list({p["problem_id"]: self._payload(p) for p in problems}.values())
+            shard = shard_name(topic) if topic is not None else None
+            if shard is not None:
+                payloads = [p for p in payloads if shard_name(p["topic"]) == shard]
+            if validation_queries is None:
+                step = max(1, len(payloads) // 5)
+                validation_queries = [(p["question"], p["problem_id"]) for p in payloads[::step][:5]]
+            
+            embeddings = self.generate_embeddings([p["question"] for p in payloads], batch_size=batch_size)
+            query_embeddings = self.generate_embeddings([q for q, _ in validation_queries], batch_size=batch_size)
+            embed_seconds = time.perf_counter() - start
+            
+            def check(count: int, search_ids):
+                if count != len(payloads):
+                    raise KBRebuildError(f"New index has {count} problems, expected {len(payloads)}")
+                for (question, expected_id), vector in zip(validation_queries, query_embeddings):
+                    found = search_ids(vector)
+                    if expected_id not in found:
+                        raise KBRebuildError(
+                            f"Validation query {question[:50]!r} did not return {expected_id} in the top {top_k} (got {found})"
+                        )
+            
+            if self.index is not None:
+                def validate(count, search):
+                    check(count, lambda v: [p["problem_id"] for _, p in search(v, top_k)])
+                if shard is not None:
+                    generation = self.index.rebuild_shard(shard, embeddings, payloads, validate=validate)
+                else:
+                    generation = self.index.rebuild(embeddings, payloads, validate=validate)
+                collection_name = getattr(self.index, "path", self.backend)
+            else:
+                generation = self.collection_generation + 1
+                collection_name = f"{self.base_collection_name}_v{generation}"
+                # Creating and filling another collection doesn't touch the one being searched
+                self._create_collection(collection_name)
+                try:
+                    for offset in range(0, len(payloads), batch_size):
+                        self.client.upsert(
+                            collection_name=collection_name,
+                            points=[
+                                PointStruct(id=self.point_id(payload["problem_id"]), vector=vector.tolist(), payload=payload)
+                                for payload, vector in zip(payloads[offset:offset + batch_size], embeddings[offset:offset + batch_size])
+                            ]
+                        )
+                    check(
+                        self.client.get_collection(collection_name).points_count,
+                        lambda v: [
+                            hit.payload["problem_id"]
+                            for hit in self.client.search(collection_name=collection_name, query_vector=v.tolist(), limit=top_k)
+                        ]
+                    )
+                except BaseException:
+                    self._drop_collection(collection_name)
+                    raise
+                
+                # Atomic switch: searches already running finish on the old collection first
+                catalog = {p["problem_id"]: (p["topic"], p["difficulty"]) for p in payloads}
+                with self._write_lock:
+                    if self.store is not None:
+                        # Other workers pick the new dataset up as one delta
+                        self._store_generation = self.store.replace_all(payloads, embeddings)
+                    with self._rw.write_locked():
+                        old_name = self.collection_name
+                        self.collection_name = collection_name
+                        self.collection_generation = generation
+                        self._catalog = catalog
+                        self._generation += 1
+                    self._drop_collection(old_name)
+            
+            report = {
+                "count": len(payloads),
+                "generation": generation,
+                "collection": collection_name,
+                "shard": shard,
+                "validation_queries": len(validation_queries),
+                "embed_seconds": round(embed_seconds, 3),
+                "total_seconds": round(time.perf_counter() - start, 3)
+            }
+            logger.info(f"KB rebuild complete: {report}")
+            return report
+        finally:
+            self._rebuild_lock.release()
@@ -0,0 +1,19 @@
+# Gunicorn configuration for the Math Agent backend
+#
+# PRELOAD_MODEL=true loads the embedding model and KB once in the master
+# process; workers inherit them copy-on-write (see app/preload.py).
+
+from app.preload import preload_enabled, load_before_fork, after_fork
+
+preload_app = preload_enabled()
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported, before any worker is forked"""
+    if preload_enabled():
+        load_before_fork()
+
+
+def post_fork(server, worker):
+    if preload_enabled():
+        after_fork()
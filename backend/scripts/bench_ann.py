@@ -0,0 +1,134 @@
+"""
+Benchmark: HNSW (KB_BACKEND=hnsw) recall, latency and memory vs exact search.
+
+Generates a synthetic clustered set of unit vectors (embedding-like: many
+near-duplicates within a topic), computes exact top-k with numpy as ground
+truth (the same brute-force scoring as the mmap backend), then builds an
+HnswVectorIndex for each M and sweeps ef at query time.
+
+Reported per configuration:
+    recall@k   mean |ANN top-k ∩ exact top-k| / k
+    p50/p99    single-query search latency (ms)
+    build      graph build time (s)
+    memory     RSS growth while building the index, payloads included (MiB);
+               for exact search, the size of the float32 matrix
+
+Usage (from backend/):
+    python scripts/bench_ann.py --n 100000 --m 8,16,32 --ef 16,32,64,128,256
+    python scripts/bench_ann.py --n 1000000 --m 16 --ef 64,128 --queries 200
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.hnsw_index import HnswVectorIndex
+
+
+def rss_mib() -> float:
+    """Resident set size of this process (Linux /proc)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_data(n: int, dim: int, clusters: int, queries: int, seed: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(n, start + 100_000)
+        assign = rng.integers(0, clusters, end - start)
+        vectors[start:end] = centers[assign] + 0.6 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    # Queries are paraphrase-like perturbations of stored vectors
+    picks = rng.integers(0, n, queries)
+    query_vectors = vectors[picks] + 0.05 * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors
+
+
+def percentiles(latencies):
+    quantiles = statistics.quantiles(latencies, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def exact_search(vectors: np.ndarray, query_vectors: np.ndarray, k: int):
+    truth, latencies = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        scores = vectors @ query
+        top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top])]
+        latencies.append((time.perf_counter() - start) * 1000)
+        truth.append(set(int(i) for i in top))
+    return truth, latencies
+
+
+def run_hnsw(args, m, vectors, payloads, query_vectors, truth, results):
+    before = rss_mib()
+    start = time.perf_counter()
+    index = HnswVectorIndex(args.dim, m=m, ef_construction=args.ef_construction, initial_capacity=args.n,
+                            write_chunk_size=10_000)
+    index.upsert(list(zip(vectors, payloads)))
+    build = time.perf_counter() - start
+    memory = rss_mib() - before
+
+    for ef in [int(x) for x in args.ef.split(",")]:
+        index.set_ef(ef)
+        latencies, hits = [], 0
+        for query, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            found = index.search(query, top_k=args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected & {int(p["problem_id"][1:]) for _, p in found})
+        p50, p99 = percentiles(latencies)
+        recall = hits / (args.k * len(truth))
+        results.put(f"{'hnsw':<8}{m:>4}{ef:>6}{recall:>11.4f}{p50:>9.3f}{p99:>9.3f}{build:>9.1f}{memory:>12.1f}")
+    results.put(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="stored vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", default="8,16,32", help="comma-separated M values")
+    parser.add_argument("--ef", default="16,32,64,128,256", help="comma-separated query-time ef values")
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.n:,} x {args.dim} vectors ({args.clusters} clusters)...")
+    vectors, query_vectors = make_data(args.n, args.dim, args.clusters, args.queries, args.seed)
+    payloads = [{"problem_id": f"p{i}", "topic": "bench"} for i in range(args.n)]
+
+    truth, exact_latencies = exact_search(vectors, query_vectors, args.k)
+    p50, p99 = percentiles(exact_latencies)
+    print(f"\n{'mode':<8}{'M':>4}{'ef':>6}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}{'memory MiB':>12}")
+    print(f"{'exact':<8}{'-':>4}{'-':>6}{1.0:>11.4f}{p50:>9.3f}{p99:>9.3f}{'-':>9}{vectors.nbytes / 2**20:>12.1f}")
+
+    # Each M is built in a forked child so its RSS growth isn't hidden by freed memory of the previous graph
+    ctx = multiprocessing.get_context("fork")
+    for m in [int(x) for x in args.m.split(",")]:
+        results = ctx.Queue()
+        child = ctx.Process(target=run_hnsw, args=(args, m, vectors, payloads, query_vectors, truth, results))
+        child.start()
+        for row in iter(results.get, None):
+            print(row)
+        child.join()
+
+
+if __name__ == "__main__":
+    main()
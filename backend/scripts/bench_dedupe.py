@@ -0,0 +1,95 @@
+"""
+Benchmark: ingestion-time near-duplicate detection (app/kb_dedupe.py) on bulk imports.
+
+Generates synthetic problems from templates with random coefficients, then
+injects lightly reworded copies of a fraction of them (same math, other
+notation or phrasing, like calc_002 / calc_004 in the dataset)
+and "near misses" (same prose, different coefficients). Each size is
+imported in one check() + add() pass, as upsert_problems does, with the
+text and math checks only (the embedding check needs the real encoder).
+
+Reported per size:
+    seconds     check + add wall time, and µs per problem (flat = linear)
+    recall      injected paraphrases that were flagged
+    precision   flagged pairs that are injected paraphrases (or identical
+                questions: at 50k+ the generator repeats some draws)
+    near misses near misses that were (wrongly) flagged
+
+Usage (from backend/):
+    python scripts/bench_dedupe.py --sizes 10000,50000,100000 --dup-rate 0.05
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.kb_dedupe import NearDuplicateDetector
+
+TEMPLATES = [
+    ("Find the derivative of f(x) = {a}x^{p} + {b}x", "Find the derivative of f(x) = {a}x^{p} + {b}x with respect to x"),
+    ("Evaluate the integral of {a}x^{p} from 0 to {b}", "Evaluate the definite integral of {a}x^{p} from x = 0 to x = {b}."),
+    ("Solve for x: {a}x^2 - {b}x + {c} = 0", "Solve the equation {a}x² − {b}x + {c} = 0 for x"),
+    ("Find the limit of ({a}x^{p} + {b})/(x^{p} + {c}) as x approaches infinity",
+     "Find the limit of ({a}x^{p} + {b}) / (x^{p} + {c}) as x tends to infinity"),
+    ("A ball is thrown upward at {a} m/s from a height of {b} m. When does it land?",
+     "A ball is thrown upward at {a} m/s from a height of {b} m. When does it hit the ground?"),
+    ("Find the sum of the first {a} terms of the arithmetic sequence with first term {b} and difference {c}",
+     "Find the sum of the first {a} terms of an arithmetic sequence with first term {b} and common difference {c}"),
+]
+
+
+def make_problems(n: int, dup_rate: float, seed: int):
+    rng = random.Random(seed)
+    problems, pairs, misses = [], set(), set()
+    while len(problems) < n:
+        template, paraphrase = rng.choice(TEMPLATES)
+        values = {"a": rng.randint(2, 999), "b": rng.randint(2, 999), "c": rng.randint(2, 999), "p": rng.randint(2, 9)}
+        problem_id = f"p{len(problems)}"
+        problems.append({"problem_id": problem_id, "question": template.format(**values), "tags": []})
+        roll = rng.random()
+        if roll < dup_rate:
+            copy_id = f"p{len(problems)}"
+            problems.append({"problem_id": copy_id, "question": paraphrase.format(**values), "tags": []})
+            pairs.add((copy_id, problem_id))
+        elif roll < 2 * dup_rate:
+            values["a"] += 1
+            miss_id = f"p{len(problems)}"
+            problems.append({"problem_id": miss_id, "question": template.format(**values), "tags": []})
+            misses.add(miss_id)
+    rng.shuffle(problems)
+    return problems, pairs, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,50000,100000")
+    parser.add_argument("--dup-rate", type=float, default=0.05, help="fraction of problems that get a paraphrased copy")
+    parser.add_argument("--jaccard", type=float, default=0.5)
+    parser.add_argument("--bands", type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{'problems':>9}{'seconds':>9}{'µs/problem':>12}{'flagged':>9}{'recall':>8}{'precision':>11}{'near misses':>13}")
+    for n in (int(size) for size in args.sizes.split(",")):
+        problems, pairs, misses = make_problems(n, args.dup_rate, seed=n)
+        detector = NearDuplicateDetector("report", jaccard_threshold=args.jaccard, bands=args.bands)
+        start = time.perf_counter()
+        duplicates = detector.check(problems)
+        detector.add(problems)
+        seconds = time.perf_counter() - start
+        # Shuffled order: either copy of a pair may be the one flagged
+        found = {tuple(sorted((d["problem_id"], d["duplicate_of"]))) for d in duplicates}
+        truth = {tuple(sorted(pair)) for pair in pairs}
+        hits = len(found & truth)
+        questions = {p["problem_id"]: p["question"] for p in problems}
+        correct = hits + sum(1 for pair in found - truth if questions[pair[0]] == questions[pair[1]])
+        wrong_misses = sum(1 for d in duplicates if d["problem_id"] in misses or d["duplicate_of"] in misses)
+        print(f"{len(problems):>9,}{seconds:>9.1f}{seconds / len(problems) * 1e6:>12.0f}{len(found):>9,}"
+              f"{hits / max(1, len(truth)):>8.3f}{correct / max(1, len(found)):>11.3f}{wrong_misses:>13,}")
+
+
+if __name__ == "__main__":
+    main()
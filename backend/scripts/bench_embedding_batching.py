@@ -0,0 +1,76 @@
+"""
+Benchmark: embedding throughput vs micro-batching window.
+
+Simulates concurrent /query threads that each encode one question, first
+calling model.encode directly ("off"), then through EmbeddingBatcher with
+different max-wait windows.
+
+Usage (from backend/):
+    python scripts/bench_embedding_batching.py --threads 8 --requests 800 --windows 0,1,2,5,10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embedding_batcher import EmbeddingBatcher
+
+QUESTIONS = [
+    "Evaluate the integral of x^2 ln(x) from 0 to 1",
+    "Solve for x: x^3 - 3x + 2 = 0",
+    "Find the derivative of f(x) = x^x for x > 0",
+    "What is the probability that exactly 2 of 3 balls drawn are red?",
+    "Find the Maclaurin series for sin(x) up to the x^5 term",
+    "Find the radius of convergence of the power series sum n! x^n",
+]
+
+
+def run(encoder, threads: int, requests: int) -> dict:
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        encoder.encode(f"{QUESTIONS[i % len(QUESTIONS)]} (variant {i})", convert_to_tensor=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"throughput": requests / elapsed, "p50": quantiles[49], "p99": quantiles[98]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2"))
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--windows", default="0,1,2,5,10", help="comma-separated max-wait values in ms")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(args.model)
+    model.encode(QUESTIONS)  # warm-up
+
+    print(f"{'window':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+    result = run(model, args.threads, args.requests)
+    print(f"{'off':<8} {result['throughput']:>8.0f} {result['p50']:>8.1f} {result['p99']:>8.1f} {1:>10.1f}")
+
+    for window in [float(w) for w in args.windows.split(",")]:
+        batcher = EmbeddingBatcher(model, max_batch_size=args.batch_size, max_wait_ms=window)
+        run(batcher, args.threads, 50)  # start the thread and warm up
+        served, batches = batcher.requests_served, batcher.batches_run
+        result = run(batcher, args.threads, args.requests)
+        avg_batch = (batcher.requests_served - served) / max(1, batcher.batches_run - batches)
+        print(f"{window:<5.1f} ms {result['throughput']:>8.0f} {result['p50']:>8.1f} {result['p99']:>8.1f} {avg_batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
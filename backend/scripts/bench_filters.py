@@ -0,0 +1,96 @@
+"""
+Benchmark: filtered search with payload indexes vs a payload predicate.
+
+Writes a synthetic KB (see bench_ann.make_data) with uneven topics and two
+difficulties as one mmap index, then times top-k searches restricted to one
+topic + difficulty (and to a rare topic):
+
+    predicate   payload_filter=lambda p: ... (decodes candidate payloads best-first)
+    where       where={"topic": ..., "difficulty": ...} (payload index picks the rows)
+    hnsw        the same where filter on an HNSW graph (exact below exact_filter_limit)
+
+Reported: p50/p99 latency and agreement of the top-k with the predicate
+search (which is exact).
+
+Usage (from backend/):
+    python scripts/bench_filters.py --n 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mmap_index import MmapVectorIndex
+from bench_ann import make_data, percentiles
+
+
+def timed(search, query_vectors):
+    latencies, results = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        hits = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([p["problem_id"] for _, p in hits])
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--hnsw", action="store_true", help="also time an HNSW index (needs hnswlib)")
+    args = parser.parse_args()
+
+    vectors, query_vectors = make_data(args.n, args.dim, clusters=70, queries=args.queries, seed=0)
+    rng = np.random.default_rng(1)
+    weights = np.array([30, 20, 15, 15, 10, 8, 2], dtype=np.float64)
+    topics = rng.choice([f"Topic{i}" for i in range(len(weights))], args.n, p=weights / weights.sum())
+    difficulties = rng.choice(["JEE_Main", "JEE_Advanced"], args.n, p=[0.7, 0.3])
+    payloads = [
+        {"problem_id": f"p{i}", "topic": str(topics[i]), "difficulty": str(difficulties[i]), "tags": []}
+        for i in range(args.n)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = MmapVectorIndex(os.path.join(tmp, "kb_index.bin"), args.dim, refresh_interval=60)
+        index.rebuild(vectors, payloads)
+        index.catalog()  # payload index is built with the catalog, once per generation
+        hnsw = None
+        if args.hnsw:
+            from app.hnsw_index import HnswVectorIndex
+            hnsw = HnswVectorIndex(args.dim, initial_capacity=args.n, write_chunk_size=args.n)
+            hnsw.upsert(list(zip(vectors, payloads)))
+
+        print(f"{args.n:,} x {args.dim} vectors")
+        print(f"\n{'filter':<30}{'selected':>9}{'mode':>11}{'p50 ms':>9}{'p99 ms':>9}{'top-k agree':>13}")
+        for topic, difficulty in (("Topic0", "JEE_Advanced"), ("Topic6", "JEE_Main")):
+            where = {"topic": {topic}, "difficulty": {difficulty}}
+            selected = sum(1 for p in payloads if p["topic"] == topic and p["difficulty"] == difficulty)
+            label = f"{topic} + {difficulty}"
+
+            def predicate(p, topic=topic, difficulty=difficulty):
+                return p["topic"] == topic and p["difficulty"] == difficulty
+
+            truth, latencies = timed(lambda q: index.search(q, args.k, -1.0, payload_filter=predicate), query_vectors)
+            p50, p99 = percentiles(latencies)
+            print(f"{label:<30}{selected:>9,}{'predicate':>11}{p50:>9.2f}{p99:>9.2f}{1.0:>13.3f}")
+            modes = [("where", lambda q: index.search(q, args.k, -1.0, where=where))]
+            if hnsw is not None:
+                modes.append(("hnsw", lambda q: hnsw.search(q, args.k, -1.0, where=where)))
+            for mode, search in modes:
+                results, latencies = timed(search, query_vectors)
+                p50, p99 = percentiles(latencies)
+                agree = np.mean([len(set(a) & set(b)) / max(1, len(b)) for a, b in zip(results, truth)])
+                print(f"{'':<30}{'':>9}{mode:>11}{p50:>9.2f}{p99:>9.2f}{agree:>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: lightweight search hits vs fully hydrated results on the mmap index.
+
+Writes a synthetic KB (see bench_ann.make_data) whose payloads are copies of
+the canonical dataset's problems (real question / solution_steps sizes), then
+runs top-k searches formatted the way search_similar formats them:
+
+    full        hydrate=True, every hit's JSON payload decoded (the old default)
+    hits        hydrate=False, hits from the catalog (id, score, topic, difficulty)
+    hits+best   hits, then the best one hydrated (what the /query workflow does)
+
+Reported per k: p50/p99 latency, memory held by the returned results
+(tracemalloc, what lives through the request: kb_results, best_match) and
+the size of the serialized kb_results.
+
+Usage (from backend/):
+    python scripts/bench_hydration.py --n 100000 --k 3,10
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.kb_artifact import DEFAULT_DATASET_PATH
+from app.kb_dataset import load_problems
+from app.mmap_index import MmapVectorIndex
+from app.vector_db import MathKnowledgeBase
+from bench_ann import make_data, percentiles
+
+_result, _hit = MathKnowledgeBase._result, MathKnowledgeBase._hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", default="3,10")
+    args = parser.parse_args()
+
+    vectors, query_vectors = make_data(args.n, args.dim, clusters=70, queries=args.queries, seed=0)
+    problems = load_problems(DEFAULT_DATASET_PATH)
+    payloads = [{**problems[i % len(problems)], "problem_id": f"p{i}"} for i in range(args.n)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = MmapVectorIndex(os.path.join(tmp, "kb_index.bin"), args.dim, refresh_interval=60)
+        index.rebuild(vectors, payloads)
+        index.catalog()  # built once per generation, also by filtered searches
+
+        def full(query, k):
+            return [_result(0, score, p) for score, p in index.search(query, k, -1.0)]
+
+        def hits(query, k):
+            return [_hit(_result(0, score, p)) for score, p in index.search(query, k, -1.0, hydrate=False)]
+
+        def hits_best(query, k):
+            found = hits(query, k)
+            best = found[0]
+            return found, _result(best["id"], best["score"], index.get(best["problem_id"]))
+
+        print(f"{args.n:,} x {args.dim} vectors, payloads from {len(problems)} dataset problems")
+        print(f"\n{'k':>3}{'mode':>11}{'p50 ms':>9}{'p99 ms':>9}{'held KiB':>10}{'kb_results B':>14}")
+        for k in (int(k) for k in args.k.split(",")):
+            for mode, search in (("full", full), ("hits", hits), ("hits+best", hits_best)):
+                latencies = []
+                for query in query_vectors:
+                    start = time.perf_counter()
+                    search(query, k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                held = []
+                for query in query_vectors[:50]:
+                    tracemalloc.start()
+                    found = search(query, k)
+                    held.append(tracemalloc.get_traced_memory()[0])  # search temporaries are freed by now
+                    tracemalloc.stop()
+                kb_results = found[0] if mode == "hits+best" else found
+                size = len(json.dumps(kb_results, ensure_ascii=False))
+                p50, p99 = percentiles(latencies)
+                print(f"{k:>3}{mode:>11}{p50:>9.2f}{p99:>9.2f}{sum(held) / len(held) / 1024:>10.1f}{size:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: quantized codes + full-precision rescoring (KB_QUANTIZATION) vs exact search.
+
+Writes a synthetic clustered set of unit vectors (see bench_ann.py) to an mmap
+index file, computes exact top-k as ground truth, then searches the same file
+with MmapVectorIndex for each quantization mode and rescore factor.
+
+Reported per configuration:
+    recall@k   mean |top-k ∩ exact top-k| / k (the recall lost to quantization)
+    p50/p99    single-query search latency (ms)
+    codes      in-memory size of the codes (MiB) -- what has to stay resident
+    read/q     float32 vector bytes read per query (KiB): the whole matrix for
+               exact search, only top_k * rescore rows from the mapped file otherwise
+
+Each configuration runs in a forked child with its own mapping and codes.
+
+Usage (from backend/):
+    python scripts/bench_quantization.py --n 100000 --rescore 1,4,10,30
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mmap_index import MmapVectorIndex, write_index
+from bench_ann import exact_search, make_data, percentiles
+
+
+def run(args, path, mode, rescore, query_vectors, truth, results):
+    index = MmapVectorIndex(path, args.dim, refresh_interval=3600, quantization=mode, rescore_factor=rescore)
+    snap = index.snapshot()
+    codes_mib = snap.codes(mode).nbytes / 2**20 if mode != "none" else 0.0
+    rows_read = snap.count if mode == "none" else min(snap.count, args.k * rescore)
+
+    latencies, hits = [], 0
+    for query, expected in zip(query_vectors, truth):
+        start = time.perf_counter()
+        found = index.search(query, top_k=args.k, score_threshold=-1.0)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len(expected & {int(p["problem_id"][1:]) for _, p in found})
+    p50, p99 = percentiles(latencies)
+    recall = hits / (args.k * len(truth))
+    label = "-" if mode == "none" else str(rescore)
+    results.put(f"{mode:<8}{label:>8}{recall:>11.4f}{p50:>9.3f}{p99:>9.3f}{codes_mib:>10.1f}{rows_read * args.dim * 4 / 1024:>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000, help="stored vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--modes", default="int8,binary", help="comma-separated quantization modes")
+    parser.add_argument("--rescore", default="1,4,10,30", help="comma-separated rescore factors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Generating {args.n:,} x {args.dim} vectors ({args.clusters} clusters)...")
+    vectors, query_vectors = make_data(args.n, args.dim, args.clusters, args.queries, args.seed)
+    truth, _ = exact_search(vectors, query_vectors, args.k)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.bin")
+        write_index(path, vectors, [{"problem_id": f"p{i}"} for i in range(args.n)], generation=1)
+        print(f"float32 matrix: {vectors.nbytes / 2**20:.1f} MiB")
+        del vectors
+
+        print(f"\n{'mode':<8}{'rescore':>8}{'recall@' + str(args.k):>11}{'p50 ms':>9}{'p99 ms':>9}{'codes MiB':>10}{'read/q KiB':>11}")
+        configs = [("none", 1)] + [(mode, int(r)) for mode in args.modes.split(",") for r in args.rescore.split(",")]
+        ctx = multiprocessing.get_context("fork")
+        for mode, rescore in configs:
+            results = ctx.Queue()
+            child = ctx.Process(target=run, args=(args, path, mode, rescore, query_vectors, truth, results))
+            child.start()
+            print(results.get())
+            child.join()
+
+
+if __name__ == "__main__":
+    main()
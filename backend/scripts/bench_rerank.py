@@ -0,0 +1,100 @@
+"""
+Benchmark: cost of the cross-encoder re-ranking stage (app/reranker.py).
+
+Times one re-ranking of the top-N KB candidates per query:
+
+    per-pair    N separate predict() calls (what a naive loop would do)
+    batched     one predict() call over all N pairs (what the re-ranker does)
+    cached      the same question again, scores from the LRU
+
+With --random-weights the model is a randomly initialised network with the
+architecture of cross-encoder/ms-marco-MiniLM-L-6-v2 (6 layers, 384 hidden),
+for machines that cannot download the weights: the latency is the same,
+the scores are meaningless.
+
+Usage (from backend/):
+    python scripts/bench_rerank.py --top-n 5,10,20 [--random-weights]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.reranker
+from app.kb_artifact import DEFAULT_DATASET_PATH
+from app.kb_dataset import load_problems
+from app.reranker import DEFAULT_MODEL, CrossEncoderReranker
+from bench_ann import percentiles
+
+
+class RandomMiniLMCrossEncoder:
+    """CrossEncoder stand-in: MiniLM-L6-sized BERT with random weights"""
+
+    def __init__(self, *args, **kwargs):
+        import torch
+        from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+        from tokenizers import Tokenizer, models, pre_tokenizers
+
+        self.torch = torch
+        words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + [chr(c) for c in range(33, 127)] + [f"w{i}" for i in range(2000)]
+        tokenizer = Tokenizer(models.WordLevel({w: i for i, w in enumerate(words)}, unk_token="[UNK]"))
+        tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+        self.tokenizer = BertTokenizerFast(tokenizer_object=tokenizer, unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]", sep_token="[SEP]")
+        config = BertConfig(vocab_size=len(words), hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                            intermediate_size=1536, num_labels=1)
+        self.model = BertForSequenceClassification(config).eval()
+
+    def predict(self, pairs, batch_size=32, **kwargs):
+        scores = []
+        for offset in range(0, len(pairs), batch_size):
+            batch = pairs[offset:offset + batch_size]
+            features = self.tokenizer([q for q, _ in batch], [c for _, c in batch], padding=True, truncation=True,
+                                      max_length=512, return_tensors="pt")
+            with self.torch.no_grad():
+                scores.extend(self.model(**features).logits.reshape(-1).tolist())
+        return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-n", default="5,10,20")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--random-weights", action="store_true")
+    args = parser.parse_args()
+
+    if args.random_weights:
+        app.reranker.CrossEncoder = RandomMiniLMCrossEncoder
+    problems = load_problems(DEFAULT_DATASET_PATH)
+    questions = [p["question"] for p in problems]
+    reranker = CrossEncoderReranker(args.model, budget_ms=60_000, cache_size=100_000)
+    model = reranker._load()
+    model.predict([["warm up", "warm up"]])
+
+    print(f"{'top-n':>6}{'mode':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for top_n in (int(n) for n in args.top_n.split(",")):
+        reranker.top_n = top_n
+        reranker.cache.clear()
+        candidates = [[{"problem_id": f"p{(q + i) % len(problems)}", "question": questions[(q + i) % len(questions)]}
+                       for i in range(top_n)] for q in range(args.queries)]
+        modes = {"per-pair": [], "batched": [], "cached": []}
+        for q, results in enumerate(candidates):
+            query = questions[q % len(questions)]
+            start = time.perf_counter()
+            for r in results:
+                model.predict([[query, r["question"]]])
+            modes["per-pair"].append((time.perf_counter() - start) * 1000)
+            for mode in ("batched", "cached"):
+                start = time.perf_counter()
+                reranker.rerank(f"{top_n}:{q}", query, [dict(r) for r in results])
+                modes[mode].append((time.perf_counter() - start) * 1000)
+        for mode, latencies in modes.items():
+            p50, p99 = percentiles(latencies)
+            print(f"{top_n:>6}{mode:>10}{p50:>9.2f}{p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
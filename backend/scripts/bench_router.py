@@ -0,0 +1,125 @@
+"""
+Benchmark: embedding-centroid topic router (KB_TOPIC_ROUTER) on a sharded index.
+
+Writes a synthetic hierarchical KB split into topic shards of uneven size:
+each topic has a centre direction, its subtopics are clusters spread around
+it (--spread) and problems are spread around their subtopic. Computes the
+per-topic centroids, then runs top-k searches without a topic:
+
+    global     fan-out over every shard (what a topic-less search does)
+    router     centroid prediction, then the predicted shard only if confident
+               (global search otherwise, or when the routed search is empty)
+
+Queries are perturbed copies of stored vectors (--noise); larger --spread
+and --noise make topics harder to tell apart. Reported per min_margin:
+the share of queries routed, routing accuracy (predicted topic = topic of the
+global top-1), top-k overlap with the global search, and p50/p99 latency
+including the prediction.
+
+Usage (from backend/):
+    python scripts/bench_router.py --n 100000 --spread 6 --margins 0,0.01,0.02,0.05
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mmap_index import MmapVectorIndex
+from app.sharded_index import ShardedVectorIndex, mmap_shard_path, shard_name
+from app.topic_router import TopicRouter
+from bench_ann import percentiles
+
+
+def make_topic_data(n: int, dim: int, topics: int, subtopics: int, spread: float, noise: float, queries: int, seed: int):
+    """Unit vectors around subtopic clusters around topic centres, uneven topic sizes, and queries"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    clusters = np.repeat(centres, subtopics, axis=0) + spread * rng.standard_normal((topics * subtopics, dim)).astype(np.float32)
+    weights = np.repeat(np.arange(topics, 0, -1, dtype=np.float64), subtopics)
+    assign = rng.choice(topics * subtopics, n, p=weights / weights.sum())
+    vectors = clusters[assign] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, n, queries)
+    query_vectors = vectors[picks] + noise * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, [f"Topic{a // subtopics}" for a in assign], query_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--subtopics", type=int, default=10)
+    parser.add_argument("--spread", type=float, default=6.0, help="subtopic distance from the topic centre")
+    parser.add_argument("--noise", type=float, default=0.1, help="query perturbation per dimension")
+    parser.add_argument("--margins", default="0,0.01,0.02,0.05")
+    # Synthetic similarities sit on another scale than MiniLM's; the margin does the work here
+    parser.add_argument("--min-similarity", type=float, default=0.0)
+    args = parser.parse_args()
+
+    vectors, topics, query_vectors = make_topic_data(
+        args.n, args.dim, args.shards, args.subtopics, args.spread, args.noise, args.queries, seed=0
+    )
+    payloads = [{"problem_id": f"p{i}", "topic": topics[i]} for i in range(args.n)]
+    topic_of = {p["problem_id"]: p["topic"] for p in payloads}
+
+    start = time.perf_counter()
+    router = TopicRouter(args.dim, min_similarity=args.min_similarity)
+    router.reset(zip(topics, vectors), generation=0)
+    print(f"{args.n:,} x {args.dim} vectors, {len(router.counts())} topics, centroids computed in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    predictions = [router.predict(q) for q in query_vectors]
+    start = time.perf_counter()
+    for q in query_vectors:
+        router.predict(q)
+    print(f"prediction: {(time.perf_counter() - start) / len(query_vectors) * 1e6:.0f} µs per query")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "kb_index.bin")
+        index = ShardedVectorIndex(lambda s: MmapVectorIndex(mmap_shard_path(base, s), args.dim, refresh_interval=60), workers=1)
+        index.rebuild(vectors, payloads)
+
+        truth, latencies = [], []
+        for q in query_vectors:
+            t = time.perf_counter()
+            hits = index.search(q, args.k)
+            latencies.append((time.perf_counter() - t) * 1000)
+            truth.append([p["problem_id"] for _, p in hits])
+        p50, p99 = percentiles(latencies)
+        print(f"\n{'mode':<18}{'routed':>8}{'accuracy':>10}{'top-k overlap':>15}{'p50 ms':>9}{'p99 ms':>9}")
+        print(f"{'global':<18}{0.0:>8.2f}{'-':>10}{1.0:>15.3f}{p50:>9.2f}{p99:>9.2f}")
+
+        for margin in (float(m) for m in args.margins.split(",")):
+            router.min_margin = margin
+            routed, correct, overlap, latencies = 0, 0, [], []
+            for q, ids in zip(query_vectors, truth):
+                t = time.perf_counter()
+                prediction = router.predict(q)
+                hits = index.search(q, args.k, shard=shard_name(prediction.topic)) if prediction.confident else None
+                if not hits:
+                    hits = index.search(q, args.k)
+                latencies.append((time.perf_counter() - t) * 1000)
+                if prediction.confident:
+                    routed += 1
+                    correct += prediction.topic == topic_of[ids[0]]
+                found = [p["problem_id"] for _, p in hits]
+                overlap.append(len(set(found) & set(ids)) / len(ids))
+            p50, p99 = percentiles(latencies)
+            accuracy = f"{correct / routed:.3f}" if routed else "-"
+            label = f"router m={margin:g}"
+            print(f"{label:<18}{routed / len(truth):>8.2f}{accuracy:>10}{np.mean(overlap):>15.3f}{p50:>9.2f}{p99:>9.2f}")
+        # Unconditional accuracy of the top prediction, for reference
+        print(f"\ntop prediction = topic of global top-1 for {np.mean([p.topic == topic_of[ids[0]] for p, ids in zip(predictions, truth)]):.3f} of queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: topic-sharded mmap index (KB_SHARD_BY_TOPIC) vs one index.
+
+Writes a synthetic clustered KB (see bench_ann.make_data) once as a single
+mmap index and once split into topic shards of uneven size, then times
+exact top-k search:
+
+    single       one index, every query scores every vector
+    fan-out xN   all shards searched on N threads, top-k lists merged
+    one shard    the query's own topic shard only (topic given or predicted)
+
+Reported: p50/p99 latency, top-1 agreement and top-k overlap with the
+single index. Fan-out returns the same top-k; a one-shard search (routed by
+the topic of the single index's top hit) only misses results in other topics.
+
+Usage (from backend/):
+    python scripts/bench_shards.py --n 100000 --shards 7 --workers 1,4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.mmap_index import MmapVectorIndex
+from app.sharded_index import ShardedVectorIndex, discover_mmap_shards, mmap_shard_path, shard_name
+from bench_ann import make_data, percentiles
+
+
+def timed(search, query_vectors, k):
+    latencies, results = [], []
+    for query in query_vectors:
+        start = time.perf_counter()
+        hits = search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([p["problem_id"] for _, p in hits])
+    return results, latencies
+
+
+def agreement(results, truth) -> str:
+    top1 = np.mean([a[:1] == b[:1] for a, b in zip(results, truth)])
+    overlap = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(results, truth)])
+    return f"{top1:>8.3f}{overlap:>15.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--shards", type=int, default=7)
+    parser.add_argument("--workers", default="1,4")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors, query_vectors = make_data(args.n, args.dim, clusters=args.shards * 10, queries=args.queries, seed=0)
+    # Uneven topics, like the seed set (calculus is the largest): each vector takes the topic
+    # of its nearest sample vector's group, so neighbouring problems mostly share a topic
+    weights = np.arange(args.shards, 0, -1, dtype=np.float64)
+    topic_of_cluster = np.random.default_rng(1).choice(args.shards, args.shards * 10, p=weights / weights.sum())
+    cluster = np.argmax(vectors @ (vectors[:args.shards * 10 * 50:50]).T, axis=1) % (args.shards * 10)
+    topics = [f"Topic{topic_of_cluster[c]}" for c in cluster]
+    payloads = [{"problem_id": f"p{i}", "topic": topics[i]} for i in range(args.n)]
+    topic_of = {p["problem_id"]: p["topic"] for p in payloads}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single = MmapVectorIndex(os.path.join(tmp, "single.bin"), args.dim, refresh_interval=60)
+        single.rebuild(vectors, payloads)
+        base = os.path.join(tmp, "kb_index.bin")
+        build = ShardedVectorIndex(lambda s: MmapVectorIndex(mmap_shard_path(base, s), args.dim, refresh_interval=60), workers=1)
+        build.rebuild(vectors, payloads)
+        print(f"{args.n:,} x {args.dim} vectors, shard sizes {sorted(build.shard_counts().values(), reverse=True)}")
+
+        truth, latencies = timed(lambda q, k: single.search(q, k), query_vectors, args.k)
+        p50, p99 = percentiles(latencies)
+        print(f"\n{'mode':<14}{'p50 ms':>9}{'p99 ms':>9}{'top-1':>8}{'top-k overlap':>15}")
+        print(f"{'single':<14}{p50:>9.2f}{p99:>9.2f}{1.0:>8.3f}{1.0:>15.3f}")
+        for workers in (int(w) for w in args.workers.split(",")):
+            sharded = ShardedVectorIndex(
+                lambda s: MmapVectorIndex(mmap_shard_path(base, s), args.dim, refresh_interval=60),
+                discover=lambda: discover_mmap_shards(base), workers=workers
+            )
+            results, latencies = timed(lambda q, k: sharded.search(q, k), query_vectors, args.k)
+            p50, p99 = percentiles(latencies)
+            print(f"{'fan-out x' + str(workers):<14}{p50:>9.2f}{p99:>9.2f}{agreement(results, truth)}")
+            sharded.close()
+
+        own = [sharded.shards()[shard_name(topic_of[ids[0]])] for ids in truth]
+        results, latencies = [], []
+        for query, index in zip(query_vectors, own):
+            start = time.perf_counter()
+            hits = index.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            results.append([p["problem_id"] for _, p in hits])
+        p50, p99 = percentiles(latencies)
+        print(f"{'one shard':<14}{p50:>9.2f}{p99:>9.2f}{agreement(results, truth)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,30 @@ Adds 45+ problems to the running backend
 
 import requests
 import json
+import os
 
 BASE_URL = "http://localhost:8000"
+KB_ADMIN_TOKEN = os.getenv("KB_ADMIN_TOKEN", "")
 
 def add_problem_via_api(problem_data):
-    """Add a single problem via the backend API"""
-    # Note: This would require a POST /kb/add endpoint
-    # For now, we'll show what needs to be done
-    pass
+    """Add a single problem via the backend API (POST /kb/problems, indexed in the background)"""
+    response = requests.post(
+        f"{BASE_URL}/kb/problems",
+        json=problem_data,
+        headers={"Authorization": f"Bearer {KB_ADMIN_TOKEN}"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+def add_problems_via_api(problems):
+    """Bulk-add problems as NDJSON (POST /kb/problems/bulk)"""
+    response = requests.post(
+        f"{BASE_URL}/kb/problems/bulk",
+        data="\n".join(json.dumps(p) for p in problems),
+        headers={"Authorization": f"Bearer {KB_ADMIN_TOKEN}", "Content-Type": "application/x-ndjson"}
+    )
+    response.raise_for_status()
+    return response.json()
 
 def get_kb_status():
     """Get current KB status"""
@@ -29,23 +45,13 @@ print(f"Status: {status['status']}")
 
 print("\n" + "="*70)
 print("ℹ️  NOTE: Since Qdrant is in-memory, the KB exists in the running backend.")
-print("   We created 45 new problems in expand_kb.py")
-print("   To add them permanently:")
-print("   1. Restart the backend server")
-print("   2. Run populate_kb.py with all 50+ problems")
+print("   The full problem set is the seed dataset kb/dataset/math_problems.v1.jsonl")
+print("   To add them to the running backend (requires KB_ADMIN_TOKEN):")
+print("   1. add_problems_via_api(problems)  →  POST /kb/problems/bulk (NDJSON)")
+print("   2. Poll GET /kb/problems/<problem_id>/status until 'indexed'")
 print("   OR")
 print("   3. Switch to persistent Qdrant (file-based or server)")
 print("="*70)
 
-print("\n📊 Planned KB Distribution (50 problems):")
-print("  • Calculus: 16 problems (differentiation, integration, limits, series)")
-print("  • Algebra: 11 problems (equations, inequalities, sequences, logarithms)")
-print("  • Trigonometry: 6 problems (identities, equations, special values)")
-print("  • Geometry: 5 problems (triangles, circles, coordinate geometry)")
-print("  • Probability: 6 problems (basic, conditional, combinatorics)")
-print("  • Vectors: 3 problems (dot product, cross product, magnitude)")
-print("  • Complex Numbers: 2 problems (modulus, operations)")
-print("  •  TOTAL: 50 problems ✅")
-
-print("\n✨ The expansion script (expand_kb.py) contains all 45 new problems ready to add!")
+print("\n✨ load_problems() from app.kb_dataset reads it for add_problems_via_api()")
 print("="*70)
@@ -15,15 +15,15 @@ print("=" * 70)
 kb = MathKnowledgeBase()
 
 # Check current size
-count = kb.client.count(collection_name=kb.collection_name).count
+count = kb.count_problems()
 print(f"\n📚 Total problems in Knowledge Base: {count}")
 
 # Add sample problems if empty
 if count == 0:
     print("\nℹ️  Knowledge Base is empty. Adding sample problems...")
-    from scripts.populate_kb import populate_kb
-    populate_kb()
-    count = kb.client.count(collection_name=kb.collection_name).count
+    from app.kb_artifact import seed_knowledge_base
+    seed_knowledge_base(kb)
+    count = kb.count_problems()
     print(f"✅ Added problems. New total: {count}")
 
 print("\n" + "=" * 70)
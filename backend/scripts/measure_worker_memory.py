@@ -0,0 +1,98 @@
+"""
+Measure per-worker memory of the gunicorn deployment with and without
+PRELOAD_MODEL, using /proc/<pid>/smaps_rollup (Linux only).
+
+RSS counts shared pages in every process; PSS splits them between the
+processes sharing them, and USS (private) is what each worker costs on its own.
+
+Usage (from backend/):
+    python scripts/measure_worker_memory.py --workers 4
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def read_rollup(pid: int) -> dict:
+    """Return Rss/Pss/Private memory (MiB) for one process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": values.get("Rss", 0.0),
+        "pss": values.get("Pss", 0.0),
+        "uss": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+    }
+
+
+def child_pids(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def wait_until_ready(port: int, workers: int, timeout: float):
+    """Poll /ready until enough consecutive 200s that every worker has answered"""
+    deadline = time.time() + timeout
+    streak = 0
+    while time.time() < deadline and streak < workers * 5:
+        try:
+            ok = requests.get(f"http://127.0.0.1:{port}/ready", timeout=2).status_code == 200
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        time.sleep(0.1)
+    if streak < workers * 5:
+        raise TimeoutError("workers did not become ready")
+
+
+def measure(workers: int, preload: bool, port: int, timeout: float) -> dict:
+    env = dict(os.environ, WORKERS=str(workers), PRELOAD_MODEL=str(preload).lower(), WARMUP_ON_STARTUP="true")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}",
+         "--workers", str(workers), "--worker-class", "uvicorn.workers.UvicornWorker", "app.main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        start = time.time()
+        wait_until_ready(port, workers, timeout)
+        ready_seconds = time.time() - start
+        time.sleep(1)
+        master = read_rollup(proc.pid)
+        per_worker = [read_rollup(pid) for pid in child_pids(proc.pid)]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    return {"master": master, "workers": per_worker, "ready_seconds": ready_seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'ready s':>8} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} {'total PSS':>10}")
+    for preload in (False, True):
+        result = measure(args.workers, preload, args.port, args.timeout)
+        workers = result["workers"]
+        avg = {k: sum(w[k] for w in workers) / len(workers) for k in ("rss", "pss", "uss")}
+        total_pss = result["master"]["pss"] + sum(w["pss"] for w in workers)
+        mode = "preload" if preload else "per-worker"
+        print(
+            f"{mode:<10} {result['ready_seconds']:>8.1f} {avg['rss']:>9.0f}Mi {avg['pss']:>9.0f}Mi "
+            f"{avg['uss']:>9.0f}Mi {total_pss:>8.0f}Mi"
+        )
+
+
+if __name__ == "__main__":
+    main()
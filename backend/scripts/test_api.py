@@ -7,6 +7,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from app.vector_db import MathKnowledgeBase
+from app.kb_artifact import seed_knowledge_base
 import requests
 import json
 import time
@@ -18,100 +19,9 @@ print("=" * 90)
 # Initialize and populate KB
 kb = MathKnowledgeBase()
 
-# Full set of 10 problems from populate_kb.py
-problems = [
-    {
-        "problem_id": "calc_001",
-        "question": "Evaluate the integral ∫₀¹ x² ln(x) dx using integration by parts",
-        "solution_steps": [
-            "Use integration by parts with u = ln(x) and dv = x² dx",
-            "Then du = (1/x)dx and v = x³/3",
-            "Apply the formula: ∫u dv = uv - ∫v du",
-            "This gives: [x³ln(x)/3]₀¹ - ∫₀¹ (x³/3)(1/x) dx",
-            "Simplify: [x³ln(x)/3]₀¹ - ∫₀¹ x²/3 dx",
-            "Evaluate limits and integral: 0 - [x³/9]₀¹ = -1/9"
-        ],
-        "final_answer": "-1/9",
-        "difficulty": "JEE_Advanced",
-        "tags": ["integration", "integration_by_parts", "logarithm"],
-        "topic": "Calculus"
-    },
-    {
-        "problem_id": "alg_001",
-        "question": "Solve for x: x³ - 3x + 2 = 0",
-        "solution_steps": [
-            "Try to factor the cubic equation",
-            "Test x = 1: 1³ - 3(1) + 2 = 0 ✓",
-            "So (x - 1) is a factor",
-            "Perform polynomial division: (x³ - 3x + 2) ÷ (x - 1) = x² + x - 2",
-            "Factor the quadratic: x² + x - 2 = (x + 2)(x - 1)",
-            "Therefore: (x - 1)(x + 2)(x - 1) = (x - 1)²(x + 2) = 0",
-            "Solutions: x = 1 (double root) and x = -2"
-        ],
-        "final_answer": "x = 1 (multiplicity 2), x = -2",
-        "difficulty": "JEE_Main",
-        "tags": ["polynomial", "cubic_equation", "factorization"],
-        "topic": "Algebra"
-    },
-    {
-        "problem_id": "calc_004",
-        "question": "Find the derivative of f(x) = x^x for x > 0",
-        "solution_steps": [
-            "Take natural logarithm of both sides: ln(f(x)) = ln(x^x) = x ln(x)",
-            "Differentiate both sides using implicit differentiation",
-            "Left side: (1/f(x)) · f'(x)",
-            "Right side: d/dx[x ln(x)] = ln(x) + x·(1/x) = ln(x) + 1",
-            "So: f'(x)/f(x) = ln(x) + 1",
-            "Therefore: f'(x) = f(x) · (ln(x) + 1) = x^x · (ln(x) + 1)"
-        ],
-        "final_answer": "f'(x) = x^x(ln(x) + 1)",
-        "difficulty": "JEE_Advanced",
-        "tags": ["differentiation", "logarithmic_differentiation", "exponential"],
-        "topic": "Calculus"
-    },
-    {
-        "problem_id": "prob_001",
-        "question": "A box contains 5 red balls and 3 blue balls. If 3 balls are drawn at random without replacement, what is the probability that exactly 2 are red?",
-        "solution_steps": [
-            "Total balls = 5 + 3 = 8",
-            "Need to find P(exactly 2 red in 3 draws)",
-            "This means 2 red and 1 blue",
-            "Number of ways to choose 2 red from 5: C(5,2) = 10",
-            "Number of ways to choose 1 blue from 3: C(3,1) = 3",
-            "Number of ways to choose 3 from 8: C(8,3) = 56",
-            "P(2 red, 1 blue) = [C(5,2) × C(3,1)] / C(8,3) = (10 × 3) / 56 = 30/56 = 15/28"
-        ],
-        "final_answer": "15/28 ≈ 0.536",
-        "difficulty": "JEE_Main",
-        "tags": ["probability", "combinations", "without_replacement"],
-        "topic": "Probability"
-    },
-    {
-        "problem_id": "trig_001",
-        "question": "Find the Maclaurin series for sin(x) up to the x⁵ term",
-        "solution_steps": [
-            "Recall the Maclaurin series: f(x) = Σ[f⁽ⁿ⁾(0)/n!]xⁿ",
-            "Find derivatives at x=0:",
-            "  f(x) = sin(x), f(0) = 0",
-            "  f'(x) = cos(x), f'(0) = 1",
-            "  f''(x) = -sin(x), f''(0) = 0",
-            "  f'''(x) = -cos(x), f'''(0) = -1",
-            "  f⁽⁴⁾(x) = sin(x), f⁽⁴⁾(0) = 0",
-            "  f⁽⁵⁾(x) = cos(x), f⁽⁵⁾(0) = 1",
-            "Substitute into formula:",
-            "sin(x) = 0 + x - 0 - x³/3! + 0 + x⁵/5! + ...",
-            "sin(x) = x - x³/6 + x⁵/120 + ..."
-        ],
-        "final_answer": "sin(x) ≈ x - x³/6 + x⁵/120",
-        "difficulty": "JEE_Advanced",
-        "tags": ["series", "maclaurin_series", "trigonometry"],
-        "topic": "Calculus"
-    }
-]
-
-for problem in problems:
-    kb.add_problem(**problem)
-    print(f"✓ {problem['problem_id']}")
+# Canonical seed problems (see app/kb_artifact.py)
+report = seed_knowledge_base(kb)
+print(f"✓ Seeded from {report['source']}: {report['path']}")
 
 print(f"\n✓ Total problems loaded: {kb.count_problems()}\n")
 
@@ -0,0 +1,111 @@
+# Shared fixtures for backend tests
+
+import hashlib
+
+import numpy as np
+import pytest
+
+
+class FakeSentenceTransformer:
+    """
+    Deterministic stand-in for SentenceTransformer('all-MiniLM-L6-v2').
+
+    Hashes character trigrams into a 384-dim unit vector so that similar
+    strings get similar embeddings, without downloading model weights.
+    """
+
+    dim = 384
+    load_count = 0
+
+    def __init__(self, *args, **kwargs):
+        type(self).load_count += 1
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = f"  {text.lower()}  "
+        for i in range(len(text) - 2):
+            digest = hashlib.md5(text[i:i + 3].encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        if isinstance(sentences, str):
+            return self._encode_one(sentences)
+        return np.stack([self._encode_one(s) for s in sentences]) if sentences else np.zeros((0, self.dim), dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    """Patch the knowledge base to use FakeSentenceTransformer"""
+    import app.vector_db
+
+    FakeSentenceTransformer.load_count = 0
+    monkeypatch.setattr(app.vector_db, "SentenceTransformer", FakeSentenceTransformer)
+    return FakeSentenceTransformer
+
+
+@pytest.fixture
+def sample_problems():
+    """A handful of knowledge base problems across topics"""
+    return [
+        {
+            "problem_id": "calc_001",
+            "question": "Evaluate the integral of x^2 ln(x) from 0 to 1 using integration by parts",
+            "solution_steps": ["Use u = ln(x), dv = x^2 dx", "Result is -1/9"],
+            "final_answer": "-1/9",
+            "difficulty": "JEE_Advanced",
+            "tags": ["integration", "integration_by_parts"],
+            "topic": "Calculus"
+        },
+        {
+            "problem_id": "alg_001",
+            "question": "Solve for x: x^3 - 3x + 2 = 0",
+            "solution_steps": ["Test x = 1", "Factor as (x - 1)^2 (x + 2)"],
+            "final_answer": "x = 1 (multiplicity 2), x = -2",
+            "difficulty": "JEE_Main",
+            "tags": ["polynomial", "cubic_equation"],
+            "topic": "Algebra"
+        },
+        {
+            "problem_id": "prob_001",
+            "question": "A box contains 5 red balls and 3 blue balls. What is the probability that exactly 2 of 3 drawn are red?",
+            "solution_steps": ["C(5,2) * C(3,1) / C(8,3)", "= 15/28"],
+            "final_answer": "15/28",
+            "difficulty": "JEE_Main",
+            "tags": ["probability", "combinations"],
+            "topic": "Probability"
+        }
+    ]
+
+
+@pytest.fixture
+def isolated_app(monkeypatch, tmp_path, fake_encoder):
+    """
+    app.main with a fresh (uninitialized) KB/workflow, in-memory user
+    sessions and a stubbed Perplexity call. The KB is seeded with the first
+    five problems of the canonical dataset (no compiled artifact).
+    """
+    import app.main
+    from app.kb_artifact import DEFAULT_DATASET_PATH
+
+    seed = tmp_path / "seed.jsonl"
+    with open(DEFAULT_DATASET_PATH, encoding="utf-8") as f:
+        seed.write_text("".join(f.readlines()[:5]), encoding="utf-8")
+    monkeypatch.setattr(app.main, "KB_DATASET_PATH", str(seed))
+    monkeypatch.setattr(app.main, "KB_ARTIFACT_PATH", str(tmp_path / "artifact"))
+    monkeypatch.setattr(app.main, "kb", None)
+    monkeypatch.setattr(app.main, "workflow", None)
+    monkeypatch.setattr(app.main, "kb_init", app.main.InitOnce(app.main._initialize_components))
+    monkeypatch.setattr(app.main, "encoder_warm_up", app.main.InitOnce(app.main._warm_encoder))
+    monkeypatch.setattr(app.main, "user_sessions", {})
+    monkeypatch.setattr(app.main, "save_user_sessions", lambda: None)
+    monkeypatch.setattr(
+        app.main,
+        "query_perplexity_api",
+        lambda question: "Step 1: solve the equation. The answer is x = 1."
+    )
+    return app.main
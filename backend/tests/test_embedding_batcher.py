@@ -0,0 +1,119 @@
+# Tests for in-process embedding micro-batching
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.embedding_batcher import EmbeddingBatcher
+from conftest import FakeSentenceTransformer
+
+
+class RecordingModel(FakeSentenceTransformer):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def encode(self, sentences, convert_to_tensor=False, **kwargs):
+        with self.lock:
+            self.batch_sizes.append(1 if isinstance(sentences, str) else len(sentences))
+        return super().encode(sentences, convert_to_tensor, **kwargs)
+
+
+def test_concurrent_encodes_share_forward_passes():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=16, max_wait_ms=20)
+    questions = [f"Solve x^2 = {i}" for i in range(64)]
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        vectors = list(pool.map(batcher.encode, questions))
+
+    reference = FakeSentenceTransformer()
+    assert all(np.allclose(v, reference.encode(q)) for v, q in zip(vectors, questions))
+    assert sum(model.batch_sizes) == 64
+    assert max(model.batch_sizes) <= 16
+    assert len(model.batch_sizes) < 64
+    assert batcher.requests_served == 64
+
+
+def test_list_input_keeps_shape():
+    batcher = EmbeddingBatcher(FakeSentenceTransformer(), max_wait_ms=0)
+    assert batcher.encode("x + 1 = 2").shape == (384,)
+    assert batcher.encode(["a", "b", "c"]).shape == (3, 384)
+
+
+def test_bulk_requests_are_encoded_in_bounded_passes():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=16, max_wait_ms=0)
+    questions = [f"Integrate x^{i}" for i in range(100)]
+
+    vectors = batcher.encode(questions)
+    assert np.allclose(vectors, FakeSentenceTransformer().encode(questions))
+    assert model.batch_sizes == [16] * 6 + [4]
+    assert batcher.requests_served == 1
+
+    # The caller's batch_size is honored too
+    model.batch_sizes.clear()
+    batcher.encode(questions[:20], batch_size=8)
+    assert model.batch_sizes == [8, 8, 4]
+
+
+def test_queries_do_not_wait_for_a_whole_bulk_request():
+    class SlowModel(RecordingModel):
+        def encode(self, sentences, convert_to_tensor=False, **kwargs):
+            time.sleep(0.02)
+            return super().encode(sentences, convert_to_tensor, **kwargs)
+
+    model = SlowModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=8, max_wait_ms=0)
+    bulk = batcher.submit([f"Differentiate x^{i}" for i in range(400)])  # 50 passes, about 1 s
+    time.sleep(0.05)
+    assert batcher.encode("Solve x + 1 = 2").shape == (384,)
+    assert not bulk.done()
+    assert bulk.result(timeout=10).shape == (400, 384)
+    assert max(model.batch_sizes) <= 8
+
+
+def test_encode_errors_reach_every_caller():
+    class BrokenModel(FakeSentenceTransformer):
+        def encode(self, sentences, convert_to_tensor=False, **kwargs):
+            raise RuntimeError("out of memory")
+
+    batcher = EmbeddingBatcher(BrokenModel(), max_wait_ms=5)
+    futures = [batcher.submit([f"q{i}"]) for i in range(4)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+    # The batching thread survives the failure
+    batcher.model = FakeSentenceTransformer()
+    assert batcher.encode("still works").shape == (384,)
+
+
+def test_concurrent_queries_reach_the_batcher_together(isolated_app, monkeypatch):
+    import httpx
+
+    monkeypatch.setenv("EMBEDDING_BATCHING", "true")
+    monkeypatch.setenv("EMBEDDING_BATCH_WAIT_MS", "50")
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+
+    async def ask(client, question):
+        response = await client.post("/query", json={"question": question})
+        assert response.status_code == 200
+
+    async def main():
+        transport = httpx.ASGITransport(app=isolated_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await ask(client, "Solve for x: x^2 - 1 = 0")  # initializes the KB and workflow
+            batcher = isolated_app.kb.embedding_model
+            served, batches = batcher.requests_served, batcher.batches_run
+            await asyncio.gather(*(ask(client, f"Solve for x: x^2 - {i} = {i + 3}") for i in range(2, 10)))
+            return batcher.requests_served - served, batcher.batches_run - batches
+
+    served, batches = asyncio.run(main())
+    assert served == 8
+    assert served / batches > 1
@@ -0,0 +1,108 @@
+# Tests for the Unix-socket embedding service and RemoteEmbedder
+
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.embedding_service import EmbeddingServer, RemoteEmbedder
+from conftest import FakeSentenceTransformer
+from test_embedding_batcher import RecordingModel
+
+
+@pytest.fixture
+def embedding_server(tmp_path):
+    import asyncio
+
+    server = EmbeddingServer(FakeSentenceTransformer(), str(tmp_path / "embed.sock"), max_batch_size=32, max_wait_ms=20)
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(server.serve(ready)), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield server
+    server.stop()
+    thread.join(5)
+
+
+def test_remote_embedder_matches_local_model(embedding_server):
+    embedder = RemoteEmbedder(embedding_server.socket_path)
+    local = FakeSentenceTransformer()
+
+    single = embedder.encode("Solve x^2 - 1 = 0")
+    assert single.shape == (384,)
+    assert np.allclose(single, local.encode("Solve x^2 - 1 = 0"))
+
+    batch = embedder.encode(["integrate x dx", "derivative of x^x"])
+    assert batch.shape == (2, 384)
+    assert embedder.get_sentence_embedding_dimension() == 384
+
+
+def test_concurrent_requests_are_batched(embedding_server):
+    embedder = RemoteEmbedder(embedding_server.socket_path)
+    questions = [f"Solve x^2 - {i} = 0" for i in range(40)]
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        vectors = list(pool.map(embedder.encode, questions))
+
+    local = FakeSentenceTransformer()
+    assert all(np.allclose(v, local.encode(q)) for v, q in zip(vectors, questions))
+    info = embedder.info()
+    assert info["requests_served"] == 40
+    assert info["batches_run"] < 40
+
+
+def test_bulk_requests_are_encoded_in_bounded_passes(embedding_server):
+    model = RecordingModel()
+    embedding_server.batcher.model = model
+    embedder = RemoteEmbedder(embedding_server.socket_path)
+    questions = [f"Expand (x + {i})^2" for i in range(100)]
+
+    vectors = embedder.encode(questions)
+    assert np.allclose(vectors, FakeSentenceTransformer().encode(questions))
+    assert model.batch_sizes == [32, 32, 32, 4]  # --max-batch-size 32
+
+    model.batch_sizes.clear()
+    embedder.encode(questions[:25], batch_size=10)
+    assert model.batch_sizes == [10, 10, 5]
+
+
+def _encode_in_child(embedder, offset):
+    inherited = embedder._local.conn
+    local = FakeSentenceTransformer()
+    for i in range(30):
+        question = f"Child {offset} question {i}"
+        assert np.allclose(embedder.encode(question), local.encode(question))
+    assert embedder._local.conn is not inherited
+
+
+def test_forked_processes_open_their_own_connection(embedding_server):
+    # The gunicorn master connects while seeding, then forks the workers
+    embedder = RemoteEmbedder(embedding_server.socket_path)
+    embedder.encode("Seed in the master")
+
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_encode_in_child, args=(embedder, i)) for i in range(3)]
+    for process in processes:
+        process.start()
+    local = FakeSentenceTransformer()
+    for i in range(30):
+        assert np.allclose(embedder.encode(f"Master question {i}"), local.encode(f"Master question {i}"))
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+
+def test_knowledge_base_uses_embedding_socket(embedding_server, fake_encoder, monkeypatch, sample_problems):
+    from app.vector_db import MathKnowledgeBase
+
+    monkeypatch.setenv("EMBEDDING_SOCKET", embedding_server.socket_path)
+    kb = MathKnowledgeBase()
+    assert isinstance(kb.embedding_model, RemoteEmbedder)
+    assert fake_encoder.load_count == 0
+
+    for problem in sample_problems:
+        kb.add_problem(**problem)
+    results = kb.search_similar("Solve for x: x^3 - 3x + 2 = 0", top_k=1, score_threshold=0.0)
+    assert results[0]["problem_id"] == "alg_001"
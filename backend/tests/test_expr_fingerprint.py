@@ -0,0 +1,138 @@
+# Tests for structural expression fingerprints and the exact-problem lookup
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("sympy")
+
+import app.expr_fingerprint
+from app.expr_fingerprint import expression_fingerprint
+from app.vector_db import MathKnowledgeBase
+
+
+def test_cosmetic_variants_share_a_fingerprint():
+    fingerprint = expression_fingerprint("Solve for x: x³ - 3x + 2 = 0")
+    assert fingerprint is not None
+    assert expression_fingerprint("solve y**3 + 2 = 3*y") == fingerprint  # renamed, rearranged, sides swapped
+    assert expression_fingerprint("Solve 2 - 3t + t^3 = 0") == fingerprint
+    # Different task, different bounds, different expression
+    assert expression_fingerprint("Differentiate x^3 - 3x + 2") != fingerprint
+    assert expression_fingerprint("Integrate x^2 from 0 to 1") != expression_fingerprint("Integrate x^2 from 0 to 2")
+    assert expression_fingerprint("Solve x^3 - 3x + 3 = 0") != fingerprint
+    assert expression_fingerprint("Find all roots of the polynomial t^3 + 2 = 3t") == fingerprint
+    assert expression_fingerprint("Evaluate ∫ 1/(x² + 4) dx") == expression_fingerprint("integrate 1/(4+y^2) dy")
+    assert expression_fingerprint("Find the inflection points of f(x) = x^4 - 4x^3") != \
+        expression_fingerprint("Find the local maximum of f(x) = x^4 - 4x^3")
+
+
+@pytest.mark.parametrize("question", [
+    "Find the area of a triangle with sides 5, 12 and 13",  # no expression
+    "What is 3 * 4 + 2?",                                     # no variable
+    "Find the modulus of z = 1 + i",                          # i is the imaginary unit: no variable
+    "Solve the system 2x + 3y = 7 and 4x - y = 5",            # two expressions
+    "solve __import__('os').system('true') = 0",              # not whitelisted
+    "solve x^9^9^9 = 1",                                      # power tower
+    "solve ((x + = 2",                                        # parse error
+])
+def test_unfingerprintable_questions_return_none(question):
+    assert expression_fingerprint(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Solve (a+b+c+1)^20 = x",    # 1,771 terms once expanded
+    "Solve (a+b+c+x+1)^20 = 0",  # 10,626 terms
+    "Simplify (x+y)^20 (x-y)^20 (x+2)^20",
+])
+def test_expressions_too_large_to_expand_return_none_quickly(question):
+    expression_fingerprint("Solve x + 1 = 0")  # sympy imported and warm
+    start = time.perf_counter()
+    assert expression_fingerprint(question) is None
+    assert time.perf_counter() - start < 0.2
+
+
+def test_sympy_runs_under_a_time_budget(monkeypatch):
+    expression_fingerprint("Solve x + 1 = 0")
+    release = threading.Event()
+    structure = app.expr_fingerprint._structure
+
+    def slow(expression):
+        if expression.startswith("x^4"):
+            release.wait(5)
+        return structure(expression)
+
+    monkeypatch.setattr(app.expr_fingerprint, "_structure", slow)
+    monkeypatch.setattr(app.expr_fingerprint, "_TIME_BUDGET", 0.1)
+    try:
+        start = time.perf_counter()
+        assert expression_fingerprint("Solve x^4 - 7x = 1") is None
+        assert time.perf_counter() - start < 1
+        # Calls don't queue behind the computation that overran, and aren't cached as unfingerprintable
+        start = time.perf_counter()
+        assert expression_fingerprint("Solve x^2 - 6x = 1") is None
+        assert time.perf_counter() - start < 0.05
+    finally:
+        release.set()
+        app.expr_fingerprint._worker()["overrun"].result(timeout=5)
+    assert expression_fingerprint("Solve x^2 - 6x = 1") is not None
+
+
+def test_fingerprint_hit_skips_embedding(fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    encoded = []
+    encode = kb.embedding_model.encode
+
+    def recording(sentences, **kwargs):
+        encoded.append(sentences)
+        return encode(sentences, **kwargs)
+
+    kb.embedding_model.encode = recording
+    timings = {}
+    results = kb.search_similar("Find all real t with t**3 + 2 = 3*t, then solve", top_k=3, timings=timings)
+
+    assert [(r["problem_id"], r["score"], r["match"]) for r in results] == [("alg_001", 1.0, "fingerprint")]
+    assert encoded == [] and timings["embed"] == 0.0
+
+    # A topic filter the match doesn't satisfy, or no fingerprint, falls back to dense search
+    assert kb.search_similar("Solve t**3 + 2 = 3*t", top_k=1, score_threshold=-1.0, topic_filter="Calculus")[0]["match"] == "dense"
+    assert kb.search_similar("What is a prime number?", top_k=1, score_threshold=-1.0)[0]["match"] == "dense"
+    assert len(encoded) == 2
+
+    # The table follows KB writes
+    kb.delete_problems(["alg_001"])
+    assert kb.search_similar("Solve t**3 + 2 = 3*t", top_k=1, score_threshold=-1.0)[0]["match"] == "dense"
+
+
+def test_fingerprint_table_follows_writes_without_rescanning(monkeypatch, tmp_path, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_INDEX_REFRESH_MS", "0")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    kb.fingerprint_index()
+    scans = []
+    stored_payloads = kb._stored_payloads
+    monkeypatch.setattr(kb, "_stored_payloads", lambda: scans.append(threading.current_thread().name) or stored_payloads())
+
+    def problem(problem_id, question):
+        return {**sample_problems[0], "problem_id": problem_id, "question": question}
+
+    def match(query):
+        return kb.search_similar(query, top_k=1, score_threshold=-1.0)[0]
+
+    kb.upsert_problems([problem("alg_050", "Solve x^5 - 2x = 7")])
+    assert (match("solve t^5 - 2t = 7")["problem_id"], match("solve t^5 - 2t = 7")["match"]) == ("alg_050", "fingerprint")
+    kb.delete_problems(["alg_050"])
+    assert match("solve t^5 - 2t = 7")["match"] == "dense"
+    assert scans == []
+
+    # Another worker's write: the table is re-indexed off the request thread
+    MathKnowledgeBase().upsert_problems([problem("alg_051", "Solve x^4 + x = 9")])
+    match("solve t^4 + t = 9")
+    deadline = time.monotonic() + 5
+    while kb._fingerprints.generation != kb.generation and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert match("solve t^4 + t = 9")["problem_id"] == "alg_051"
+    assert scans and set(scans) == {"fingerprint-reindex"}
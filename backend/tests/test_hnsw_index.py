@@ -0,0 +1,78 @@
+# Tests for the approximate nearest-neighbour (HNSW) index mode
+
+import numpy as np
+import pytest
+
+pytest.importorskip("hnswlib")
+
+from app.hnsw_index import HnswVectorIndex
+from app.vector_db import KBRebuildError, MathKnowledgeBase
+
+
+def _clustered(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim))
+    vectors = centers[rng.integers(0, 20, n)] + 0.5 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_recall_against_exact_search():
+    vectors = _clustered(3000)
+    index = HnswVectorIndex(64, m=16, ef_construction=200, ef=128, initial_capacity=16, write_chunk_size=500)
+    index.upsert([(v, {"problem_id": f"p{i}", "topic": "Algebra" if i % 2 else "Calculus"}) for i, v in enumerate(vectors)])
+    assert index.count() == 3000
+
+    hits = 0
+    for query in vectors[:100]:
+        exact = {f"p{i}" for i in np.argsort(-(vectors @ query))[:10]}
+        hits += len(exact & {p["problem_id"] for _, p in index.search(query, top_k=10)})
+    assert hits / 1000 >= 0.95
+
+    filtered = index.search(vectors[1], top_k=5, payload_filter=lambda p: p["topic"] == "Algebra")
+    assert filtered[0][1]["problem_id"] == "p1"
+    assert all(p["topic"] == "Algebra" for _, p in filtered)
+
+
+def test_upsert_delete_and_filter_with_few_matches():
+    vectors = _clustered(50)
+    index = HnswVectorIndex(64, initial_capacity=8)
+    points = [(v, {"problem_id": f"p{i}", "topic": "Geometry" if i == 7 else "Algebra"}) for i, v in enumerate(vectors)]
+    index.upsert(points)
+    generation = index.generation
+
+    index.upsert(points[:10])
+    assert index.generation == generation  # unchanged points are skipped
+
+    # Only one problem passes the filter: fewer results than top_k, not an error
+    assert [p["problem_id"] for _, p in index.search(vectors[0], top_k=5, score_threshold=-1.0, payload_filter=lambda p: p["topic"] == "Geometry")] == ["p7"]
+
+    index.delete(["p0", "missing"])
+    assert index.get("p0") is None and index.count() == 49
+    assert "p0" not in [p["problem_id"] for _, p in index.search(vectors[0], top_k=3)]
+
+    index.upsert([points[0]])
+    assert index.search(vectors[0], top_k=1)[0][1]["problem_id"] == "p0"
+    assert index.vectors(["p0"])[0] == pytest.approx(vectors[0], abs=1e-5)
+
+
+def test_knowledge_base_hnsw_backend(monkeypatch, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "hnsw")
+    monkeypatch.setenv("KB_HNSW_M", "8")
+    monkeypatch.setenv("KB_HNSW_EF", "32")
+    kb = MathKnowledgeBase()
+    assert kb.client is None and kb.index.m == 8
+
+    kb.upsert_problems(sample_problems)
+    assert kb.count_problems() == 3
+    results = kb.search_similar(sample_problems[1]["question"], top_k=1)
+    assert results[0]["problem_id"] == "alg_001"
+    assert kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=0.0, topic_filter="Probability")[0]["problem_id"] == "prob_001"
+    assert kb.facet_counts()["topic"] == {"Calculus": 1, "Algebra": 1, "Probability": 1}
+
+    with pytest.raises(KBRebuildError):
+        kb.rebuild(sample_problems[:2], validation_queries=[("unrelated", "missing_999")])
+    assert kb.count_problems() == 3
+
+    report = kb.rebuild(sample_problems[:2])
+    assert report["count"] == 2 and kb.count_problems() == 2
+    assert not kb.has_problem("prob_001")
@@ -0,0 +1,71 @@
+# Tests for race-free one-time initialization
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.init_once import InitOnce
+
+
+def test_concurrent_first_requests_load_model_once(isolated_app, fake_encoder, monkeypatch):
+    original_init = fake_encoder.__init__
+
+    def slow_init(self, *args, **kwargs):
+        time.sleep(0.2)  # Widen the race window like a real model load
+        original_init(self, *args, **kwargs)
+
+    monkeypatch.setattr(fake_encoder, "__init__", slow_init)
+    isolated_app.user_sessions["127.0.0.1"] = {"count": 0, "logged_in": True}
+
+    async def fire():
+        transport = httpx.ASGITransport(app=isolated_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/query", json={"question": "Solve for x: x^3 - 3x + 2 = 0"})
+                for _ in range(50)
+            ])
+
+    responses = asyncio.run(fire())
+
+    assert all(r.status_code == 200 for r in responses)
+    assert fake_encoder.load_count == 1
+    assert isolated_app.kb.count_problems() == 5
+
+
+def test_init_once_threads_share_single_run():
+    calls = []
+
+    def initializer():
+        time.sleep(0.1)
+        calls.append(1)
+
+    once = InitOnce(initializer)
+    threads = [threading.Thread(target=once.run) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert once.done
+
+
+def test_init_once_retries_after_failure():
+    attempts = []
+
+    def initializer():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model download failed")
+
+    once = InitOnce(initializer)
+    with pytest.raises(RuntimeError):
+        once.run()
+    assert not once.done
+
+    asyncio.run(once.run_async())
+    assert once.done
+    assert len(attempts) == 2
@@ -0,0 +1,125 @@
+# Tests for the canonical seed dataset and its compiled index artifact
+
+import json
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.kb_artifact import DEFAULT_DATASET_PATH, build_artifact, dataset_version, read_manifest, seed_knowledge_base
+from app.kb_dataset import load_problems
+from app.vector_db import MathKnowledgeBase
+
+
+def _encoded_texts(monkeypatch, kb):
+    """Record every text the KB embeds"""
+    texts = []
+    original = kb.generate_embeddings
+
+    def recording(batch, **kwargs):
+        texts.extend(batch)
+        return original(batch, **kwargs)
+
+    monkeypatch.setattr(kb, "generate_embeddings", recording)
+    return texts
+
+
+def test_canonical_dataset_is_valid_and_unique():
+    problems = load_problems(DEFAULT_DATASET_PATH)
+    ids = [p["problem_id"] for p in problems]
+    assert len(ids) == len(set(ids)) >= 50
+    assert dataset_version(DEFAULT_DATASET_PATH)["version"] == "v1"
+    # The problems the app has always served keep their ids
+    assert {"calc_001", "alg_001", "calc_004", "prob_001", "trig_001"} <= set(ids)
+
+
+def test_seed_loads_artifact_without_embedding_questions(tmp_path, monkeypatch, fake_encoder):
+    artifact = str(tmp_path / "artifact")
+    manifest = build_artifact(MathKnowledgeBase(), output=artifact)
+    assert manifest["count"] == len(manifest["problem_ids"])
+    assert sum(manifest["facets"]["topic"].values()) == manifest["count"]
+    assert read_manifest(artifact)["dataset"]["sha256"] == dataset_version(DEFAULT_DATASET_PATH)["sha256"]
+
+    kb = MathKnowledgeBase()
+    texts = _encoded_texts(monkeypatch, kb)
+    report = seed_knowledge_base(kb, artifact=artifact)
+
+    assert report["source"] == "artifact"
+    assert kb.count_problems() == manifest["count"]
+    # Nothing was embedded: the model fingerprint is checked without a forward pass
+    assert texts == []
+    assert kb.search_similar("Find the derivative of f(x) = x^x for x > 0", top_k=1)[0]["problem_id"] == "calc_004"
+
+
+def test_stale_dataset_falls_back_to_embedding(tmp_path, fake_encoder):
+    dataset = tmp_path / "math_problems.v2.jsonl"
+    lines = open(DEFAULT_DATASET_PATH, encoding="utf-8").readlines()[:4]
+    dataset.write_text("".join(lines), encoding="utf-8")
+    artifact = str(tmp_path / "artifact")
+    build_artifact(MathKnowledgeBase(), dataset=str(dataset), output=artifact)
+
+    changed = json.loads(lines[0])
+    changed["final_answer"] = "-1/9 (edited)"
+    dataset.write_text(json.dumps(changed, ensure_ascii=False) + "\n" + "".join(lines[1:]), encoding="utf-8")
+
+    kb = MathKnowledgeBase()
+    report = seed_knowledge_base(kb, dataset=str(dataset), artifact=artifact)
+    assert report["source"] == "dataset"
+    assert "different version" in report["reason"]
+    assert kb.get_problem(changed["problem_id"])["final_answer"] == "-1/9 (edited)"
+
+
+def test_different_model_falls_back_to_embedding(tmp_path, fake_encoder):
+    artifact = str(tmp_path / "artifact")
+    build_artifact(MathKnowledgeBase(), output=artifact)
+
+    class OtherModel(fake_encoder):
+        def encode(self, sentences, convert_to_tensor=False, **kwargs):
+            return -super().encode(sentences, convert_to_tensor, **kwargs)
+
+    kb = MathKnowledgeBase(embedding_model=OtherModel())
+    report = seed_knowledge_base(kb, artifact=artifact)
+    assert report["source"] == "dataset"
+    assert "different model" in report["reason"]
+    assert kb.count_problems() == report["count"]
+    assert np.isclose(kb.search_similar("Solve for x: x³ - 3x + 2 = 0", top_k=1)[0]["score"], 1.0, atol=1e-5)
+
+
+def test_model_fingerprint_compares_weights_not_names(tmp_path, fake_encoder):
+    import torch
+
+    class WeightedModel(fake_encoder):
+        weight = torch.ones(4)
+
+        def state_dict(self):
+            return {"weight": self.weight}
+
+    class SameWeights(WeightedModel):
+        pass
+
+    class OtherWeights(WeightedModel):
+        weight = torch.zeros(4)
+
+    artifact = str(tmp_path / "artifact")
+    build_artifact(MathKnowledgeBase(embedding_model=WeightedModel()), output=artifact)
+    # Same weights under another name (e.g. a local copy of the model) reuse the artifact
+    assert seed_knowledge_base(MathKnowledgeBase(embedding_model=SameWeights()), artifact=artifact)["source"] == "artifact"
+    report = seed_knowledge_base(MathKnowledgeBase(embedding_model=OtherWeights()), artifact=artifact)
+    assert report["source"] == "dataset" and "different model" in report["reason"]
+
+
+def test_app_startup_seeds_from_artifact(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    monkeypatch.setattr(isolated_app, "WARMUP_ON_STARTUP", True)
+    build_artifact(MathKnowledgeBase(), dataset=isolated_app.KB_DATASET_PATH, output=isolated_app.KB_ARTIFACT_PATH)
+
+    with TestClient(isolated_app.app) as client:
+        deadline = time.time() + 30
+        response = client.get("/ready")
+        while response.status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+            response = client.get("/ready")
+
+        body = response.json()
+        assert body["kb_seed"]["source"] == "artifact"
+        assert body["kb_count"] == 5
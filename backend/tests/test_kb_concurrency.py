@@ -0,0 +1,96 @@
+# Stress tests for concurrent KB searches and writes
+
+import threading
+import time
+
+from app.rwlock import RWLock
+from app.vector_db import MathKnowledgeBase
+
+
+def _problem(i):
+    return {
+        "problem_id": f"bulk_{i:05d}",
+        "question": f"Compute the sum of the first {i} odd numbers",
+        "solution_steps": ["Use n^2"],
+        "final_answer": str(i * i),
+        "difficulty": "JEE_Main",
+        "tags": ["series"],
+        "topic": "Algebra" if i % 2 else "Arithmetic"
+    }
+
+
+def test_rwlock_writer_excludes_readers_and_is_not_starved():
+    lock = RWLock()
+    events = []
+    reader_holding = threading.Event()
+
+    def reader(name, hold):
+        with lock.read_locked():
+            events.append(("read_start", name))
+            reader_holding.set()
+            time.sleep(hold)
+            events.append(("read_end", name))
+
+    def writer():
+        with lock.write_locked():
+            events.append(("write_start", None))
+            time.sleep(0.05)
+            events.append(("write_end", None))
+
+    first = threading.Thread(target=reader, args=("first", 0.1))
+    first.start()
+    reader_holding.wait()
+    w = threading.Thread(target=writer)
+    w.start()
+    time.sleep(0.02)
+    # A reader arriving while the writer waits queues behind the writer
+    late = threading.Thread(target=reader, args=("late", 0))
+    late.start()
+    for thread in (first, w, late):
+        thread.join()
+
+    order = [kind + (f":{name}" if name else "") for kind, name in events]
+    assert order.index("write_start") > order.index("read_end:first")
+    assert order.index("read_start:late") > order.index("write_end")
+
+
+def test_searches_during_bulk_ingest(fake_encoder):
+    kb = MathKnowledgeBase()
+    kb.write_chunk_size = 50
+    kb.upsert_problems([_problem(i) for i in range(100)])
+    errors, latencies = [], []
+    stop, deleting = threading.Event(), threading.Event()
+
+    def search_loop():
+        last_count = 0
+        while not stop.is_set():
+            try:
+                start = time.perf_counter()
+                results = kb.search_similar("Compute the sum of the first 7 odd numbers", top_k=3, score_threshold=0.0)
+                latencies.append(time.perf_counter() - start)
+                assert results[0]["problem_id"] == "bulk_00007"
+                count = kb.count_problems()
+                assert deleting.is_set() or count >= last_count  # inserts never go backwards
+                last_count = count
+                facets = kb.facet_counts()
+                assert sum(facets["topic"].values()) >= 100 - (500 if deleting.is_set() else 0)
+                assert kb.has_problem("bulk_00007")
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(repr(e))
+
+    readers = [threading.Thread(target=search_loop) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for start in range(100, 2100, 250):
+        kb.upsert_problems([_problem(i) for i in range(start, start + 250)])
+    deleting.set()
+    kb.delete_problems([f"bulk_{i:05d}" for i in range(1000, 1500)])
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert latencies
+    assert kb.count_problems() == 2100 - 500
+    assert sum(kb.facet_counts()["topic"].values()) == 2100 - 500
+    assert not kb.has_problem("bulk_01200")
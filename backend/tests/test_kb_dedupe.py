@@ -0,0 +1,121 @@
+# Tests for ingestion-time near-duplicate detection (MinHash/LSH + math + embedding checks)
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("sympy")
+
+import app.expr_fingerprint
+from app.expr_fingerprint import math_content
+from app.kb_artifact import DEFAULT_DATASET_PATH
+from app.kb_dataset import load_problems
+from app.kb_dedupe import NearDuplicateDetector
+from app.vector_db import MathKnowledgeBase
+
+
+def _problem(problem_id, question, tags, topic="calculus"):
+    return {
+        "problem_id": problem_id,
+        "question": question,
+        "solution_steps": ["..."],
+        "final_answer": "...",
+        "difficulty": "JEE_Main",
+        "tags": tags,
+        "topic": topic
+    }
+
+
+X_TO_X = _problem("calc_004", "Find the derivative of f(x) = x^x for x > 0", ["differentiation", "exponential"])
+X_TO_X_AGAIN = _problem("calc_002", "Find the derivative of f(x) = x^x with respect to x", ["differentiation", "logarithmic differentiation"])
+
+
+def test_dataset_report_flags_the_x_to_the_x_pair_only():
+    duplicates = NearDuplicateDetector("report").check(load_problems(DEFAULT_DATASET_PATH))
+    assert [(d["problem_id"], d["duplicate_of"]) for d in duplicates] == [("calc_002", "calc_004")]
+
+
+def test_shared_prose_with_different_math_is_not_a_duplicate():
+    detector = NearDuplicateDetector("report")
+    detector.add([_problem("a", "Find the Maclaurin series of sin(x) up to the x^5 term", [])])
+    assert detector.check([_problem("b", "Find the Maclaurin series of e^x up to the x^5 term", [])]) == []
+    # The same problem_id is an update, not a duplicate
+    assert detector.check([_problem("a", "Find the Maclaurin series of sin(x) up to the x^5 term.", [])]) == []
+
+
+def test_math_key_is_bounded_in_size_and_time(monkeypatch):
+    math_content("Solve x + 1 = 0")  # sympy imported and warm
+    start = time.perf_counter()
+    assert math_content("Expand (a+b+c+x+1)^20") == "runs:(a+b+c+x+1)^20"  # 10,626 terms once expanded
+    assert time.perf_counter() - start < 0.2
+
+    release = threading.Event()
+    structure = app.expr_fingerprint._structure
+    monkeypatch.setattr(app.expr_fingerprint, "_structure", lambda expression: release.wait(5) and structure(expression))
+    monkeypatch.setattr(app.expr_fingerprint, "_TIME_BUDGET", 0.1)
+    try:
+        start = time.perf_counter()
+        assert math_content("Solve x^5 - 4x = 2") == "runs:x^5-4x=2"
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        app.expr_fingerprint._worker()["overrun"].result(timeout=5)
+    assert math_content("Solve x^5 - 4x = 2").startswith("expr:")  # The skip wasn't cached
+
+
+@pytest.fixture
+def dedupe_kb(monkeypatch, fake_encoder):
+    def make(action):
+        monkeypatch.setenv("KB_DEDUPE", action)
+        monkeypatch.setenv("KB_DEDUPE_COSINE", "0.6")  # trigram-hash embeddings are less forgiving than MiniLM
+        kb = MathKnowledgeBase()
+        kb.upsert_problems([X_TO_X])
+        return kb
+    return make
+
+
+def test_report_writes_and_records(dedupe_kb):
+    kb = dedupe_kb("report")
+    report = {}
+    assert kb.upsert_problems([X_TO_X_AGAIN], dedupe_report=report) == 1
+    assert kb.has_problem("calc_002")
+    assert report["duplicates"][0]["duplicate_of"] == "calc_004"
+    assert report["duplicates"][0]["cosine"] >= 0.6
+
+
+def test_skip_drops_duplicates_within_and_across_batches(dedupe_kb):
+    kb = dedupe_kb("skip")
+    batch = [X_TO_X_AGAIN, _problem("calc_099", "Find the derivative of f(x) = x^x w.r.t. x", [])]
+    report = {}
+    assert kb.upsert_problems(batch, dedupe_report=report) == 0
+    assert kb.count_problems() == 1
+    assert {d["duplicate_of"] for d in report["duplicates"]} == {"calc_004"}
+    # Unrelated problems still go through
+    assert kb.upsert_problems([_problem("calc_100", "Find the derivative of f(x) = x^2 sin(x)", [])]) == 1
+
+
+def test_merge_moves_tags_to_the_stored_problem(dedupe_kb):
+    kb = dedupe_kb("merge")
+    report = {}
+    kb.upsert_problems([X_TO_X_AGAIN], dedupe_report=report)
+    assert not kb.has_problem("calc_002")
+    assert kb.get_problem("calc_004")["tags"] == ["differentiation", "exponential", "logarithmic differentiation"]
+    assert report["merged"] == ["calc_004"]
+    # The merged problem keeps its own embedding
+    assert kb.search_similar("derivative of x^x for x > 0", top_k=1)[0]["problem_id"] == "calc_004"
+
+
+def test_detector_follows_writes_from_other_paths_without_rescanning(dedupe_kb, monkeypatch):
+    kb = dedupe_kb("report")
+    scans = []
+    stored_payloads = kb._stored_payloads
+    monkeypatch.setattr(kb, "_stored_payloads", lambda: scans.append(1) or stored_payloads())
+
+    # Writes that skip the dedupe path: a delete and an already-embedded upsert (artifact, sync)
+    kb.delete_problems(["calc_004"])
+    kb.upsert_embedded([X_TO_X_AGAIN], kb.generate_embeddings([X_TO_X_AGAIN["question"]]))
+    report = {}
+    kb.upsert_problems([X_TO_X], dedupe_report=report)
+    assert [(d["problem_id"], d["duplicate_of"]) for d in report["duplicates"]] == [("calc_004", "calc_002")]
+    assert scans == []
@@ -0,0 +1,191 @@
+# Tests for blue/green knowledge base rebuilds
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.vector_db import KBRebuildError, MathKnowledgeBase
+
+
+def _dataset(n):
+    return [
+        {
+            "problem_id": f"gen_{i:03d}",
+            "question": f"Find the roots of the polynomial x^2 - {i + 2}x + {i + 1} = 0",
+            "solution_steps": [f"Factor as (x - 1)(x - {i + 1})"],
+            "final_answer": f"x = 1, x = {i + 1}",
+            "difficulty": "JEE_Main",
+            "tags": ["quadratic"],
+            "topic": "Algebra"
+        }
+        for i in range(n)
+    ]
+
+
+def _collections(kb):
+    return {c.name for c in kb.client.get_collections().collections}
+
+
+def test_rebuild_swaps_to_new_collection_and_drops_old(fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    for problem in sample_problems:
+        kb.add_problem(**problem)
+
+    report = kb.rebuild(_dataset(20))
+
+    assert report["count"] == 20
+    assert report["generation"] == 1
+    assert kb.collection_name == "math_problems_v1"
+    assert kb.count_problems() == 20
+    assert _collections(kb) == {"math_problems_v1"}
+    assert kb.search_similar("Find the roots of the polynomial x^2 - 7x + 6 = 0", top_k=1)[0]["problem_id"] == "gen_005"
+
+
+def test_failed_validation_keeps_live_collection(fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    for problem in sample_problems:
+        kb.add_problem(**problem)
+
+    with pytest.raises(KBRebuildError):
+        kb.rebuild(_dataset(10), validation_queries=[("What is the capital of France?", "missing_999")])
+
+    assert kb.collection_name == "math_problems"
+    assert kb.count_problems() == len(sample_problems)
+    assert _collections(kb) == {"math_problems"}
+
+
+def test_in_flight_reader_keeps_old_collection_until_done(fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    for problem in sample_problems:
+        kb.add_problem(**problem)
+    reading, release = threading.Event(), threading.Event()
+    seen = {}
+
+    def slow_reader():
+        with kb._reading() as pinned:
+            reading.set()
+            release.wait(5)
+            # The search that started before the switch still sees a complete old snapshot
+            seen["name"] = pinned
+            seen["count"] = kb.client.get_collection(pinned).points_count
+
+    reader = threading.Thread(target=slow_reader)
+    reader.start()
+    reading.wait(5)
+    rebuild = threading.Thread(target=kb.rebuild, args=(_dataset(10),))
+    rebuild.start()
+
+    # The new collection is built while the reader runs, but the switch waits for it
+    deadline = time.time() + 5
+    while "math_problems_v1" not in _collections(kb) and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    assert kb.collection_name == "math_problems"
+
+    release.set()
+    reader.join()
+    rebuild.join()
+    assert seen == {"name": "math_problems", "count": len(sample_problems)}
+    assert kb.count_problems() == 10
+    assert _collections(kb) == {"math_problems_v1"}
+
+
+def test_searches_keep_working_during_rebuilds(fake_encoder):
+    kb = MathKnowledgeBase()
+    kb.rebuild(_dataset(30))
+    errors = []
+    stop = threading.Event()
+
+    def search_loop():
+        while not stop.is_set():
+            try:
+                results = kb.search_similar("Find the roots of the polynomial x^2 - 4x + 3 = 0", top_k=1)
+                assert results and results[0]["problem_id"] == "gen_002"
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+    threads = [threading.Thread(target=search_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for _ in range(3):
+        kb.rebuild(_dataset(30))
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert kb.collection_generation == 4
+
+
+def test_mmap_rebuild_validation_failure_keeps_generation(tmp_path, monkeypatch, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb.bin"))
+    kb = MathKnowledgeBase()
+    for problem in sample_problems:
+        kb.add_problem(**problem)
+    generation = kb.index.generation
+
+    with pytest.raises(KBRebuildError):
+        kb.rebuild(_dataset(5), validation_queries=[("unrelated", "missing_999")])
+    assert kb.index.generation == generation
+    assert not (tmp_path / "kb.bin.staging").exists()
+
+    report = kb.rebuild(_dataset(5))
+    assert report["generation"] == generation + 1
+    assert kb.count_problems() == 5
+
+
+def test_rebuild_endpoint_runs_in_background(isolated_app, monkeypatch, tmp_path):
+    source = tmp_path / "problems.jsonl"
+    source.write_text("\n".join(json.dumps(p) for p in _dataset(12)), encoding="utf-8")
+    monkeypatch.setattr(isolated_app, "KB_SOURCE_PATH", str(source))
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", "admin")
+    monkeypatch.setattr(isolated_app, "rebuild_state", {"status": "idle", "report": None, "error": None})
+
+    with TestClient(isolated_app.app) as client:
+        response = client.post("/kb/rebuild", headers={"Authorization": "Bearer admin"})
+        assert response.status_code == 202
+
+        deadline = time.time() + 30
+        status = client.get("/kb/rebuild").json()
+        while status["status"] == "running" and time.time() < deadline:
+            time.sleep(0.05)
+            status = client.get("/kb/rebuild").json()
+
+        assert status["status"] == "done"
+        assert status["report"]["count"] == 12
+        assert client.get("/kb/status").json()["total_problems"] == 12
+
+
+def test_concurrent_rebuild_requests_start_one_rebuild(isolated_app, monkeypatch, tmp_path):
+    import httpx
+
+    source = tmp_path / "problems.jsonl"
+    source.write_text("\n".join(json.dumps(p) for p in _dataset(12)), encoding="utf-8")
+    monkeypatch.setattr(isolated_app, "KB_SOURCE_PATH", str(source))
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", "admin")
+    monkeypatch.setattr(isolated_app, "rebuild_state", {"status": "idle", "report": None, "error": None})
+
+    async def main():
+        transport = httpx.ASGITransport(app=isolated_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # Both requests reach the KB initialization await before either rebuild starts
+            responses = await asyncio.gather(*(
+                client.post("/kb/rebuild", headers={"Authorization": "Bearer admin"}) for _ in range(2)
+            ))
+            await isolated_app.rebuild_task
+            return sorted(r.status_code for r in responses)
+
+    assert asyncio.run(main()) == [202, 409]
+    assert isolated_app.rebuild_state["status"] == "done"
+    assert isolated_app.rebuild_state["report"]["count"] == 12
+
+
+def test_rebuild_endpoint_requires_source(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "KB_SOURCE_PATH", None)
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", "admin")
+    assert TestClient(isolated_app.app).post("/kb/rebuild", headers={"Authorization": "Bearer admin"}).status_code == 400
@@ -0,0 +1,118 @@
+# Tests for cross-worker KB coherence through the shared SQLite store
+
+import multiprocessing
+
+import pytest
+
+from app.kb_store import KBStore
+from app.vector_db import MathKnowledgeBase
+
+
+def _problem(problem_id, question, topic="Algebra"):
+    return {
+        "problem_id": problem_id,
+        "question": question,
+        "solution_steps": ["Step 1"],
+        "final_answer": "1",
+        "difficulty": "JEE_Main",
+        "tags": ["test"],
+        "topic": topic
+    }
+
+
+@pytest.fixture
+def shared_store(tmp_path, monkeypatch, fake_encoder):
+    path = str(tmp_path / "kb.sqlite")
+    monkeypatch.setenv("KB_STORE_PATH", path)
+    monkeypatch.setenv("KB_SYNC_INTERVAL_MS", "0")
+    return path
+
+
+def test_write_in_one_worker_is_visible_in_another(shared_store, sample_problems):
+    worker_a = MathKnowledgeBase()
+    worker_b = MathKnowledgeBase()
+    for problem in sample_problems:
+        worker_a.add_problem(**problem)
+
+    assert worker_b.count_problems() == len(sample_problems)
+    assert worker_b.search_similar(sample_problems[1]["question"], top_k=1)[0]["problem_id"] == "alg_001"
+    assert worker_b.facet_counts()["topic"] == {"Calculus": 1, "Algebra": 1, "Probability": 1}
+
+    worker_b.delete_problems(["alg_001"])
+    assert not worker_a.has_problem("alg_001")
+    assert worker_a.count_problems() == len(sample_problems) - 1
+
+
+def test_sync_applies_only_the_delta(shared_store):
+    worker_a = MathKnowledgeBase()
+    worker_b = MathKnowledgeBase()
+    worker_a.upsert_problems([_problem(f"p{i}", f"Solve x + {i} = 0") for i in range(50)])
+    worker_b.sync()
+    assert worker_b.last_sync["upserts"] == 50
+
+    worker_a.upsert_problems([_problem("p7", "Solve x + 7 = 0", topic="Arithmetic")])
+    assert worker_b.sync()
+    assert worker_b.last_sync["upserts"] == 1
+    assert worker_b.get_problem("p7")["topic"] == "Arithmetic"
+
+    # Nothing new: no delta is fetched
+    assert not worker_b.sync()
+
+
+def test_unchanged_upserts_are_not_reembedded(shared_store, sample_problems):
+    worker_a = MathKnowledgeBase()
+    assert worker_a.upsert_problems(sample_problems) == 3
+    generation = worker_a.store.generation()
+
+    # A second worker seeding the same problems at startup writes nothing
+    worker_b = MathKnowledgeBase()
+    assert worker_b.upsert_problems(sample_problems) == 0
+    assert worker_b.store.generation() == generation
+
+
+def test_staleness_is_bounded_by_sync_interval(shared_store, monkeypatch):
+    monkeypatch.setenv("KB_SYNC_INTERVAL_MS", "60000")
+    worker_a = MathKnowledgeBase()
+    worker_b = MathKnowledgeBase()
+    worker_a.upsert_problems([_problem("late", "Integrate e^x")])
+
+    # Within the interval worker B keeps serving its current version...
+    assert not worker_b.has_problem("late")
+    # ...and catches up at the next check
+    worker_b._store_checked_at -= 61
+    assert worker_b.has_problem("late")
+
+
+def test_rebuild_propagates_to_other_workers(shared_store, sample_problems):
+    worker_a = MathKnowledgeBase()
+    worker_b = MathKnowledgeBase()
+    worker_a.upsert_problems(sample_problems)
+    assert worker_b.count_problems() == 3
+
+    worker_a.rebuild([_problem(f"new_{i}", f"Find the area of a circle of radius {i}", "Geometry") for i in range(1, 9)])
+    assert worker_b.count_problems() == 8
+    assert not worker_b.has_problem("calc_001")
+    assert worker_b.facet_counts()["topic"] == {"Geometry": 8}
+
+
+def _write_from_process(path, start):
+    store = KBStore(path)
+    import numpy as np
+    for i in range(start, start + 10):
+        store.upsert([_problem(f"proc_{i}", f"Question {i}")], np.ones((1, 384), dtype=np.float32))
+
+
+def test_store_serializes_writers_across_processes(tmp_path):
+    path = str(tmp_path / "kb.sqlite")
+    KBStore(path)
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_write_from_process, args=(path, i * 10)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    upserts, deleted, generation = KBStore(path).changes_since(0)
+    assert generation == 40
+    assert len(upserts) == 40 and deleted == []
@@ -0,0 +1,93 @@
+# Tests for incremental KB sync (only new or changed questions are embedded)
+
+import copy
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.vector_db import MathKnowledgeBase
+
+
+def _edited_dataset(sample_problems):
+    """calc_001 gets a new question, alg_001 a new answer, prob_001 is removed, geom_001 is new"""
+    calc, alg, _ = copy.deepcopy(sample_problems)
+    calc["question"] = "Evaluate the integral of x^3 ln(x) from 0 to 1 using integration by parts"
+    alg["final_answer"] = "x = 1 (double root), x = -2"
+    new = dict(alg, problem_id="geom_001", question="Find the area of a triangle with sides 5, 12 and 13", topic="Geometry")
+    return [calc, alg, new]
+
+
+def _count_encoded(monkeypatch, kb):
+    texts = []
+    original = kb.generate_embeddings
+
+    def recording(batch, **kwargs):
+        texts.extend(batch)
+        return original(batch, **kwargs)
+
+    monkeypatch.setattr(kb, "generate_embeddings", recording)
+    return texts
+
+
+@pytest.mark.parametrize("backend", ["qdrant", "mmap", "store"])
+def test_sync_embeds_only_new_and_changed_questions(backend, tmp_path, monkeypatch, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap" if backend == "mmap" else "qdrant")
+    if backend == "store":
+        monkeypatch.setenv("KB_STORE_PATH", str(tmp_path / "kb.sqlite"))
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb.bin"))
+    monkeypatch.setenv("KB_INDEX_REFRESH_MS", "0")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    alg_vector = kb._stored_vectors(["alg_001"])[0]
+    encoded = _count_encoded(monkeypatch, kb)
+
+    report = kb.sync_problems(_edited_dataset(sample_problems))
+
+    assert {k: report[k] for k in ("added", "reembedded", "payload_only", "unchanged", "deleted", "embedded")} == {
+        "added": 1, "reembedded": 1, "payload_only": 1, "unchanged": 0, "deleted": 1, "embedded": 2
+    }
+    assert sorted(encoded) == sorted([
+        "Evaluate the integral of x^3 ln(x) from 0 to 1 using integration by parts",
+        "Find the area of a triangle with sides 5, 12 and 13"
+    ])
+    assert kb.get_problem("alg_001")["final_answer"] == "x = 1 (double root), x = -2"
+    assert kb._stored_vectors(["alg_001"])[0] == pytest.approx(alg_vector, abs=1e-6)
+    assert not kb.has_problem("prob_001")
+    assert kb.count_problems() == 3
+
+    # Re-running the same sync is a no-op
+    encoded.clear()
+    again = kb.sync_problems(_edited_dataset(sample_problems))
+    assert again["unchanged"] == 3 and again["embedded"] == 0 and encoded == []
+
+
+def test_dry_run_and_keep_missing(fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    generation = kb.generation
+
+    report = kb.sync_problems(_edited_dataset(sample_problems), dry_run=True)
+    assert report["deleted"] == 1 and report["embedded"] == 0
+    assert kb.generation == generation
+
+    report = kb.sync_problems(sample_problems[:1], delete_missing=False)
+    assert report == dict(report, unchanged=1, deleted=0)
+    assert kb.count_problems() == 3
+
+
+def test_sync_endpoint(isolated_app, monkeypatch, tmp_path, sample_problems):
+    source = tmp_path / "problems.jsonl"
+    source.write_text("\n".join(json.dumps(p) for p in sample_problems), encoding="utf-8")
+    monkeypatch.setattr(isolated_app, "KB_SOURCE_PATH", str(source))
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", "admin")
+    headers = {"Authorization": "Bearer admin"}
+
+    with TestClient(isolated_app.app) as client:
+        assert client.post("/kb/sync").status_code == 401
+        preview = client.post("/kb/sync?dry_run=true", headers=headers).json()
+        # calc_001/alg_001/prob_001 differ from the seeded copies; the other two seeds are not in the source
+        assert preview["dry_run"] and preview["deleted"] == 2
+        report = client.post("/kb/sync", headers=headers).json()
+        assert report["deleted"] == 2 and report["added"] + report["reembedded"] + report["payload_only"] + report["unchanged"] == 3
+        assert client.get("/kb/status").json()["total_problems"] == 3
@@ -0,0 +1,185 @@
+# Tests for the runtime KB write API and background ingestion
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.kb_ingest import KBIngestQueue
+from app.vector_db import MathKnowledgeBase
+
+TOKEN = "test-admin-token"
+AUTH = {"Authorization": f"Bearer {TOKEN}"}
+
+
+def _problem(problem_id, question, topic="Algebra", difficulty="JEE_Main"):
+    return {
+        "problem_id": problem_id,
+        "question": question,
+        "solution_steps": ["Step 1"],
+        "final_answer": "42",
+        "difficulty": difficulty,
+        "tags": ["test"],
+        "topic": topic
+    }
+
+
+@pytest.fixture
+def client(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(isolated_app, "kb_ingest", None)
+    with TestClient(isolated_app.app) as client:
+        yield client
+
+
+def test_writes_require_token(client, isolated_app, monkeypatch):
+    problem = _problem("new_001", "Solve 2x + 3 = 7")
+    assert client.post("/kb/problems", json=problem).status_code == 401
+    assert client.post("/kb/problems", json=problem, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.delete("/kb/problems/alg_001").status_code == 401
+
+    monkeypatch.setattr(isolated_app, "KB_ADMIN_TOKEN", None)
+    assert client.post("/kb/problems", json=problem, headers=AUTH).status_code == 503
+
+
+def test_add_update_delete_keep_layers_consistent(client, isolated_app):
+    response = client.post("/kb/problems", json=_problem("new_001", "Solve 2x + 3 = 7"), headers=AUTH)
+    assert response.status_code == 202
+    assert response.json()["status"] in ("queued", "indexing", "indexed")
+    isolated_app.kb_ingest.join()
+
+    status = client.get("/kb/problems/new_001/status").json()
+    assert status["status"] == "indexed"
+    kb_status = client.get("/kb/status").json()
+    assert kb_status["total_problems"] == 6
+    assert kb_status["facets"]["topic"]["Algebra"] == 2
+    generation = kb_status["generation"]
+    assert isolated_app.kb.search_similar("Solve 2x + 3 = 7", top_k=1)[0]["problem_id"] == "new_001"
+
+    updated = _problem("new_001", "Solve 2x + 3 = 7", topic="Arithmetic")
+    assert client.put("/kb/problems/new_001", json=updated, headers=AUTH).status_code == 202
+    isolated_app.kb_ingest.join()
+    assert client.get("/kb/problems/new_001").json()["topic"] == "Arithmetic"
+    kb_status = client.get("/kb/status").json()
+    assert kb_status["total_problems"] == 6
+    assert kb_status["facets"]["topic"]["Algebra"] == 1
+    assert kb_status["generation"] > generation
+
+    assert client.delete("/kb/problems/new_001", headers=AUTH).status_code == 202
+    isolated_app.kb_ingest.join()
+    assert client.get("/kb/problems/new_001/status").json()["status"] == "deleted"
+    assert client.get("/kb/problems/new_001").status_code == 404
+    assert "Arithmetic" not in client.get("/kb/status").json()["facets"]["topic"]
+
+
+def test_update_and_delete_unknown_problem_404(client):
+    assert client.put("/kb/problems/nope", json=_problem("nope", "x"), headers=AUTH).status_code == 404
+    assert client.delete("/kb/problems/nope", headers=AUTH).status_code == 404
+    assert client.get("/kb/problems/nope/status").status_code == 404
+
+
+def test_bulk_ndjson_upload(client, isolated_app):
+    lines = [json.dumps(_problem(f"bulk_{i:03d}", f"Compute {i} + {i} times {i}")) for i in range(40)]
+    lines.append('{"problem_id": "broken"}')
+    lines.append("not json")
+    lines.append(json.dumps({"op": "delete", "problem_id": "bulk_000"}))
+    response = client.post("/kb/problems/bulk", content="\n".join(lines), headers=AUTH)
+    assert response.status_code == 202
+    body = response.json()
+    assert body["accepted"] == 41
+    assert [r["line"] for r in body["rejected"]] == [41, 42]
+
+    isolated_app.kb_ingest.join()
+    assert client.get("/kb/status").json()["total_problems"] == 5 + 39
+    assert client.get("/kb/problems/bulk_000/status").json()["status"] == "deleted"
+    assert client.get("/kb/problems/bulk_039/status").json()["status"] == "indexed"
+
+
+def test_bulk_rejects_lines_with_wrong_field_types(client, isolated_app):
+    lines = [
+        json.dumps(_problem("typed_001", "Compute 3 + 4")),
+        json.dumps({**_problem("x", "x"), "problem_id": 5, "question": ["x"]}),
+        json.dumps(_problem("typed_002", "Compute 5 + 6")),
+    ]
+    body = client.post("/kb/problems/bulk", content="\n".join(lines), headers=AUTH).json()
+    assert body["accepted"] == 2
+    assert [r["line"] for r in body["rejected"]] == [2]
+
+    isolated_app.kb_ingest.join()
+    assert client.get("/kb/problems/typed_001/status").json()["status"] == "indexed"
+    assert client.get("/kb/problems/typed_002/status").json()["status"] == "indexed"
+
+
+def test_ingest_queue_batches_embeddings(fake_encoder):
+    kb = MathKnowledgeBase()
+    batch_sizes = []
+    encode = kb.embedding_model.encode
+
+    def recording_encode(sentences, **kwargs):
+        if not isinstance(sentences, str):
+            batch_sizes.append(len(sentences))
+        return encode(sentences, **kwargs)
+
+    kb.embedding_model.encode = recording_encode
+    ingest = KBIngestQueue(kb, batch_size=16, max_wait_ms=200)
+    ingest.submit_upserts([_problem(f"p{i}", f"Question number {i}") for i in range(32)])
+    ingest.join()
+
+    assert kb.count_problems() == 32
+    assert max(batch_sizes) == 16
+    assert len(batch_sizes) <= 4
+
+
+def test_failed_batch_reports_error(fake_encoder):
+    kb = MathKnowledgeBase()
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("encoder unavailable")
+
+    kb.embedding_model.encode = broken
+    ingest = KBIngestQueue(kb, max_wait_ms=0)
+    ingest.submit_upserts([_problem("p1", "Question")])
+    ingest.join()
+    status = ingest.status("p1")
+    assert status["status"] == "failed"
+    assert "encoder unavailable" in status["error"]
+
+
+def test_bad_record_does_not_fail_its_batch(fake_encoder):
+    kb = MathKnowledgeBase()
+    upsert = kb.upsert_problems
+
+    def upsert_rejecting_bad(problems, **kwargs):
+        if any(p["problem_id"] == "bad" for p in problems):
+            raise ValueError("unsupported record")
+        return upsert(problems, **kwargs)
+
+    kb.upsert_problems = upsert_rejecting_bad
+    ingest = KBIngestQueue(kb, max_wait_ms=200)
+    ingest.submit_upserts([_problem("p1", "Question one"), _problem("bad", "Bad"), _problem("p2", "Question two")])
+    ingest.join()
+    assert ingest.status("p1")["status"] == "indexed" and ingest.status("p2")["status"] == "indexed"
+    assert ingest.status("bad")["status"] == "failed" and "unsupported record" in ingest.status("bad")["error"]
+    assert kb.has_problem("p1") and kb.has_problem("p2") and not kb.has_problem("bad")
+
+
+def test_ingest_labels_duplicates_from_its_own_dedupe_report(fake_encoder, monkeypatch):
+    monkeypatch.setenv("KB_DEDUPE", "skip")
+    monkeypatch.setenv("KB_DEDUPE_COSINE", "0.6")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems([_problem("calc_004", "Find the derivative of f(x) = x^x for x > 0", topic="Calculus")])
+    upsert = kb.upsert_problems
+
+    def upsert_then_another_write(problems, **kwargs):
+        written = upsert(problems, **kwargs)
+        # A synchronous /kb/problems write landing before the ingest thread reads its outcome
+        upsert([_problem("calc_050", "Find the area under y = sin(x) from 0 to pi", topic="Calculus")])
+        return written
+
+    kb.upsert_problems = upsert_then_another_write
+    ingest = KBIngestQueue(kb, max_wait_ms=0)
+    ingest.submit_upserts([_problem("calc_002", "Find the derivative of f(x) = x^x with respect to x", topic="Calculus")])
+    ingest.join()
+    status = ingest.status("calc_002")
+    assert status["status"] == "duplicate" and "calc_004" in status["error"]
+    assert not kb.has_problem("calc_002")
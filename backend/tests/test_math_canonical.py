@@ -0,0 +1,43 @@
+# Tests for math-aware query canonicalization and the query embedding cache
+
+import pytest
+
+from app.math_canonical import canonicalize
+from app.vector_db import MathKnowledgeBase
+
+
+@pytest.mark.parametrize("variants", [
+    ["x³ - 3x + 2 = 0", "x^3-3x+2=0", "x**3 - 3*x + 2 = 0", "$x^{3} - 3x + 2 = 0$", "X^3 − 3X + 2 = 0"],
+    ["x⁻¹ + a₁", "x^-1 + a_1", "x^{-1}+a_{1}", "x^(-1) + a_1"],
+    ["\\frac{1}{2} \\cdot x \\le 3", "1/2*x ≤ 3", "½x <= 3"],
+    ["Find the derivative of sin(x)", "find the derivative of   sin( x )?"],
+])
+def test_equivalent_spellings_share_a_canonical_form(variants):
+    assert len({canonicalize(v) for v in variants}) == 1
+
+
+def test_different_problems_stay_different():
+    assert canonicalize("x^2 + 1") != canonicalize("x^2 - 1")
+    assert canonicalize("3 * 4") == "3*4"  # no implicit product between numbers
+    assert canonicalize("x^23") != canonicalize("x^2 3")
+
+
+def test_query_spellings_share_one_embedding(monkeypatch, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")  # exercise the dense path
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    encoded = []
+    encode = kb.embedding_model.encode
+
+    def recording(sentences, **kwargs):
+        encoded.append(sentences)
+        return encode(sentences, **kwargs)
+
+    kb.embedding_model.encode = recording
+    results = [kb.search_similar(q, top_k=1)[0] for q in ("Solve for x: x³ - 3x + 2 = 0", "solve for x: x**3 - 3*x + 2 = 0", "Solve for x: $x^{3}-3x+2=0$")]
+
+    assert encoded == ["solve for x: x^3-3x+2=0"]
+    assert kb.query_cache.stats()["hits"] == 2
+    assert {r["problem_id"] for r in results} == {"alg_001"}
+    # Stored questions keep their original notation for display
+    assert results[0]["question"] == sample_problems[1]["question"]
@@ -0,0 +1,66 @@
+# Tests for the Prometheus metrics registry and /metrics endpoint
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import MetricsRegistry
+
+client = TestClient(app)
+
+
+def test_counter_merges_thread_shards():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_events_total", "Events", ("kind",))
+
+    def worker():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.value(kind="a") == 8000
+    assert 'test_events_total{kind="a"} 8000' in registry.render()
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5.0)
+
+    text = registry.render()
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+    assert "# TYPE test_latency_seconds histogram" in text
+
+
+def test_gauge_in_progress_and_callback():
+    registry = MetricsRegistry()
+    in_flight = registry.gauge("test_in_flight", "In flight")
+    with in_flight.track_inprogress():
+        assert in_flight.value() == 1
+    assert in_flight.value() == 0
+
+    size = registry.gauge("test_size", "Size")
+    size.set_function(lambda: 42)
+    assert "test_size 42" in registry.render()
+
+
+def test_metrics_endpoint_reports_routes():
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'math_http_requests_total{route="/health",method="GET",status="200"}' in body
+    assert "# TYPE math_query_duration_seconds histogram" in body
+    assert "math_kb_problems" in body
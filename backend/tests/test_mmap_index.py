@@ -0,0 +1,118 @@
+# Tests for the shared memory-mapped exact-search index
+
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from app.mmap_index import MmapVectorIndex
+from conftest import FakeSentenceTransformer
+
+
+def _point(encoder, problem_id, question, topic="Algebra"):
+    return encoder.encode(question), {"problem_id": problem_id, "question": question, "topic": topic}
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    encoder = FakeSentenceTransformer()
+    index = MmapVectorIndex(str(tmp_path / "kb.bin"), dim=384, refresh_interval=0)
+    questions = [f"Solve the equation x^2 - {i}x + {i} = 0" for i in range(50)]
+    index.upsert([_point(encoder, f"p{i}", q) for i, q in enumerate(questions)])
+
+    query = encoder.encode("Solve the equation x^2 - 7x + 7 = 0")
+    hits = index.search(query, top_k=5)
+
+    matrix = encoder.encode(questions)
+    expected = np.argsort(-(matrix @ query))[:5]
+    assert [payload["problem_id"] for _, payload in hits] == [f"p{i}" for i in expected]
+    assert hits[0][1]["problem_id"] == "p7"
+    assert hits[0][0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_topic_filter_and_threshold(tmp_path):
+    encoder = FakeSentenceTransformer()
+    index = MmapVectorIndex(str(tmp_path / "kb.bin"), dim=384, refresh_interval=0)
+    index.upsert([
+        _point(encoder, "alg", "Solve x^2 = 4", "Algebra"),
+        _point(encoder, "calc", "Differentiate x^2", "Calculus"),
+    ])
+    query = encoder.encode("Solve x^2 = 4")
+    assert [p["problem_id"] for _, p in index.search(query, top_k=3, payload_filter=lambda p: p["topic"] == "Calculus")] == ["calc"]
+    assert [p["problem_id"] for _, p in index.search(query, top_k=3, score_threshold=0.99)] == ["alg"]
+
+
+def test_unchanged_upsert_keeps_generation(tmp_path):
+    encoder = FakeSentenceTransformer()
+    index = MmapVectorIndex(str(tmp_path / "kb.bin"), dim=384, refresh_interval=0)
+    index.upsert([_point(encoder, "a", "Solve x + 1 = 2")])
+    generation = index.generation
+
+    index.upsert([_point(encoder, "a", "Solve x + 1 = 2")])
+    assert index.generation == generation
+
+    index.delete(["a"])
+    assert index.generation == generation + 1
+    assert index.count() == 0
+
+
+def test_readers_pick_up_new_generation_and_keep_old_snapshot(tmp_path):
+    encoder = FakeSentenceTransformer()
+    path = str(tmp_path / "kb.bin")
+    writer = MmapVectorIndex(path, dim=384, refresh_interval=0)
+    reader = MmapVectorIndex(path, dim=384, refresh_interval=0)
+    writer.upsert([_point(encoder, "a", "Solve x + 1 = 2")])
+
+    old = reader.snapshot()
+    assert old.count == 1
+    inode = os.stat(path).st_ino
+
+    writer.upsert([_point(encoder, "b", "Find the derivative of sin(x)")])
+
+    # Atomic rename: new file, new inode; the old mapping is still readable
+    assert os.stat(path).st_ino != inode
+    assert old.count == 1 and old.payload(0)["problem_id"] == "a"
+    assert reader.count() == 2
+    assert reader.generation == old.generation + 1
+
+
+def _write_from_process(path, problem_id):
+    encoder = FakeSentenceTransformer()
+    MmapVectorIndex(path, dim=384).upsert([_point(encoder, problem_id, f"Question {problem_id}")])
+
+
+def test_concurrent_writers_from_processes_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / "kb.bin")
+    MmapVectorIndex(path, dim=384)
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_write_from_process, args=(path, f"p{i}")) for i in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    index = MmapVectorIndex(path, dim=384)
+    assert index.count() == 8
+    assert index.generation == 8
+
+
+def test_knowledge_base_mmap_backend(tmp_path, monkeypatch, fake_encoder, sample_problems):
+    from app.vector_db import MathKnowledgeBase
+
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb.bin"))
+    monkeypatch.setenv("KB_INDEX_REFRESH_MS", "0")
+    worker_a = MathKnowledgeBase()
+    worker_b = MathKnowledgeBase()
+    assert worker_a.client is None
+
+    for problem in sample_problems:
+        worker_a.add_problem(**problem)
+
+    # The second "worker" sees the problems written by the first without restarting
+    assert worker_b.count_problems() == len(sample_problems)
+    results = worker_b.search_similar(sample_problems[0]["question"], top_k=1)
+    assert results[0]["problem_id"] == sample_problems[0]["problem_id"]
+    assert results[0]["id"] == MathKnowledgeBase.point_id(sample_problems[0]["problem_id"])
+    assert results[0]["solution_steps"] == sample_problems[0]["solution_steps"]
@@ -0,0 +1,89 @@
+# Tests for lightweight search hits and on-demand payload hydration
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.mmap_index
+from app.langgraph_workflow import MathRAGWorkflow
+from app.vector_db import HIT_FIELDS, MathKnowledgeBase
+
+
+@pytest.fixture(params=["qdrant", "mmap", "hnsw"])
+def kb(request, monkeypatch, tmp_path, fake_encoder, sample_problems):
+    if request.param == "hnsw":
+        pytest.importorskip("hnswlib")
+    monkeypatch.setenv("KB_BACKEND", request.param)
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    return kb
+
+
+def test_lightweight_hits_hydrate_to_the_full_results(kb, sample_problems):
+    query = sample_problems[0]["question"]
+    full = kb.search_similar(query, top_k=3, score_threshold=-1.0)
+    hits = kb.search_similar(query, top_k=3, score_threshold=-1.0, hydrate=False)
+
+    assert [h["problem_id"] for h in hits] == [r["problem_id"] for r in full]
+    assert all(set(h) <= set(HIT_FIELDS) for h in hits)
+    assert hits[0]["topic"] == full[0]["topic"] and hits[0]["score"] == pytest.approx(full[0]["score"])
+
+    timings = {}
+    assert kb.hydrate(hits[:1], timings=timings) == full[:1]
+    assert kb.hydrate(hits) == full
+    assert "kb_hydrate" in timings
+    # Full results pass through unchanged, hits of deleted problems stay lightweight
+    assert kb.hydrate(full) == full
+    kb.delete_problems([hits[1]["problem_id"]])
+    assert kb.hydrate(hits)[1] == hits[1]
+
+
+def test_best_match_deleted_before_hydration_takes_the_web_path(kb, sample_problems, monkeypatch):
+    search = kb.search_similar
+
+    def search_then_delete(*args, **kwargs):
+        hits = search(*args, **kwargs)
+        kb.delete_problems([hits[0]["problem_id"]])
+        return hits
+
+    monkeypatch.setattr(kb, "search_similar", search_then_delete)
+    state = MathRAGWorkflow(kb, lambda q: "Step 1: search the web", executor="direct").run(sample_problems[0]["question"])
+    assert state["source"] == "perplexity_web"
+    assert state["kb_results"] == [] and state["confidence_score"] == 0.0
+
+
+def test_mmap_hits_come_from_the_catalog(monkeypatch, tmp_path, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    kb.search_similar("warm up", top_k=3, score_threshold=-1.0, hydrate=False)
+
+    decoded = []
+    original = app.mmap_index._Snapshot.payload
+    monkeypatch.setattr(app.mmap_index._Snapshot, "payload", lambda snap, row: decoded.append(row) or original(snap, row))
+    hits = kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=-1.0, hydrate=False)
+    assert len(hits) == 3 and decoded == []
+
+    kb.hydrate(hits[:1])
+    assert len(decoded) == 1
+
+
+def test_query_returns_full_kb_results_only_on_request(isolated_app, monkeypatch):
+    client = TestClient(isolated_app.app)
+    question = "Solve for x: x^3 - 3x + 2 = 0"
+
+    light = client.post("/query", json={"question": question}).json()
+    assert light["kb_results"] and all("solution_steps" not in r for r in light["kb_results"])
+    assert {"problem_id", "score", "topic"} <= set(light["kb_results"][0])
+
+    fetched = []
+    get_problems = isolated_app.kb.get_problems
+    monkeypatch.setattr(isolated_app.kb, "get_problems", lambda ids: fetched.append(list(ids)) or get_problems(ids))
+    full = client.post("/query", json={"question": question, "include_kb_results": True}).json()
+    assert [r["problem_id"] for r in full["kb_results"]] == [r["problem_id"] for r in light["kb_results"]]
+    assert all(r["question"] and r["solution_steps"] for r in full["kb_results"])
+    # The best match hydrated by the workflow isn't fetched again
+    assert sum(fetched, []) == [r["problem_id"] for r in full["kb_results"]]
@@ -0,0 +1,68 @@
+# Tests for quantized codes with full-precision rescoring (mmap backend)
+
+import numpy as np
+import pytest
+
+from app.mmap_index import MmapVectorIndex
+from app.quantization import BinaryCodes, Int8Codes, build_codes
+from app.vector_db import MathKnowledgeBase
+
+
+def _clustered(n, dim=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim))
+    vectors = centers[rng.integers(0, 20, n)] + 0.5 * rng.standard_normal((n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_codes_are_compact_and_rank_like_exact_scores():
+    vectors = _clustered(500)
+    query = vectors[3]
+    exact = vectors @ query
+
+    int8 = Int8Codes(vectors)
+    assert int8.codes.nbytes == vectors.nbytes // 4
+    assert np.abs(int8.scores(query) - exact).max() < 0.02
+
+    binary = BinaryCodes(vectors)
+    assert binary.codes.nbytes == vectors.nbytes // 32
+    assert np.corrcoef(binary.scores(query), exact)[0, 1] > 0.8
+
+    assert build_codes(vectors, "none") is None
+    with pytest.raises(ValueError):
+        build_codes(vectors, "int4")
+
+
+@pytest.mark.parametrize("mode,min_recall", [("int8", 0.99), ("binary", 0.9)])
+def test_rescored_search_recall(tmp_path, mode, min_recall):
+    vectors = _clustered(3000)
+    index = MmapVectorIndex(str(tmp_path / "kb.bin"), dim=64, refresh_interval=0, quantization=mode, rescore_factor=10)
+    index.upsert([(v, {"problem_id": f"p{i}", "topic": "Geometry" if i == 7 else "Algebra"}) for i, v in enumerate(vectors)])
+
+    hits = 0
+    for query in vectors[:100]:
+        expected = {f"p{i}" for i in np.argsort(-(vectors @ query))[:10]}
+        found = index.search(query, top_k=10, score_threshold=-1.0)
+        hits += len(expected & {p["problem_id"] for _, p in found})
+        # Returned scores are exact (rescored), not approximations
+        assert found[0][0] == pytest.approx(float(np.max(vectors @ query)), abs=1e-5)
+    assert hits / 1000 >= min_recall
+
+    # A filter matching a row outside the shortlist widens it instead of returning nothing
+    only = index.search(vectors[0], top_k=3, score_threshold=-1.0, payload_filter=lambda p: p["topic"] == "Geometry")
+    assert [p["problem_id"] for _, p in only] == ["p7"]
+
+
+def test_knowledge_base_quantized_backend(tmp_path, monkeypatch, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb.bin"))
+    monkeypatch.setenv("KB_INDEX_REFRESH_MS", "0")
+    monkeypatch.setenv("KB_QUANTIZATION", "int8")
+    monkeypatch.setenv("KB_RESCORE_FACTOR", "1")
+    kb = MathKnowledgeBase()
+    assert kb.index.quantization == "int8" and kb.index.rescore_factor == 1
+
+    kb.upsert_problems(sample_problems)
+    assert kb.search_similar(sample_problems[1]["question"], top_k=1)[0]["problem_id"] == "alg_001"
+    results = kb.search_similar(sample_problems[1]["question"], top_k=1, score_threshold=-1.0, topic_filter="Probability")
+    assert [r["problem_id"] for r in results] == ["prob_001"]
@@ -0,0 +1,98 @@
+# Tests for background warm-up and the /ready endpoint
+
+import gc
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_ready_is_503_before_initialization(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    client = TestClient(isolated_app.app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "pending"
+
+
+def test_background_warm_up_makes_service_ready(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    monkeypatch.setattr(isolated_app, "WARMUP_ON_STARTUP", True)
+
+    with TestClient(isolated_app.app) as client:
+        deadline = time.time() + 30
+        response = client.get("/ready")
+        while response.status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+            response = client.get("/ready")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["kb_count"] == 5
+        assert set(body["phases_ms"]) == {"import", "load_model", "seed_kb", "build_workflow", "warm_encode"}
+
+    assert isolated_app.kb is not None
+    assert isolated_app.workflow is not None
+
+
+def test_warm_up_disabled_keeps_lazy_init(isolated_app, monkeypatch):
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    monkeypatch.setattr(isolated_app, "WARMUP_ON_STARTUP", False)
+
+    with TestClient(isolated_app.app) as client:
+        assert client.get("/ready").status_code == 503
+        client.post("/query", json={"question": "Solve for x: x^3 - 3x + 2 = 0"})
+        assert client.get("/ready").status_code == 200
+
+
+def test_preloaded_worker_only_warms_encoder(isolated_app, fake_encoder, monkeypatch):
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    monkeypatch.setattr(isolated_app, "WARMUP_ON_STARTUP", True)
+
+    isolated_app.preload_components()  # What the gunicorn master does before fork
+    assert isolated_app.startup_state["status"] == "loaded"
+    assert "warm_encode" not in isolated_app.startup_state["phases"]
+
+    with TestClient(isolated_app.app) as client:
+        deadline = time.time() + 30
+        while client.get("/ready").status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+        assert client.get("/ready").status_code == 200
+
+    assert fake_encoder.load_count == 1
+
+
+@pytest.mark.parametrize("fresh_artifact", [True, False])
+def test_load_before_fork_runs_no_forward_pass(isolated_app, fake_encoder, monkeypatch, fresh_artifact):
+    import app.preload
+    from app.kb_artifact import build_artifact
+    from app.vector_db import MathKnowledgeBase
+
+    monkeypatch.setattr(isolated_app, "startup_state", {"status": "pending", "phases": {}, "error": None})
+    monkeypatch.setattr(isolated_app, "WARMUP_ON_STARTUP", True)
+    monkeypatch.setattr(app.preload, "_set_torch_threads", lambda count: None)
+    monkeypatch.setenv("TOKENIZERS_PARALLELISM", "false")
+    if fresh_artifact:
+        build_artifact(MathKnowledgeBase(), dataset=isolated_app.KB_DATASET_PATH, output=isolated_app.KB_ARTIFACT_PATH)
+
+    encoded = []
+    encode = fake_encoder.encode
+    monkeypatch.setattr(fake_encoder, "encode", lambda self, sentences, *args, **kwargs: (
+        encoded.append(sentences) or encode(self, sentences, *args, **kwargs)
+    ))
+    try:
+        app.preload.load_before_fork()  # What the gunicorn master does
+    finally:
+        gc.unfreeze()
+    assert encoded == []
+    # A stale artifact is embedded by the worker after the fork instead
+    assert isolated_app.startup_state["seed"]["source"] == ("artifact" if fresh_artifact else "deferred")
+
+    with TestClient(isolated_app.app) as client:
+        deadline = time.time() + 30
+        while client.get("/ready").status_code == 503 and time.time() < deadline:
+            time.sleep(0.05)
+        body = client.get("/ready").json()
+    assert body["kb_count"] == 5
+    assert isolated_app.startup_state["seed"]["source"] == ("artifact" if fresh_artifact else "dataset")
@@ -0,0 +1,82 @@
+# Tests for latency-budgeted cross-encoder re-ranking (KB_RERANK)
+
+import time
+
+import pytest
+
+import app.reranker
+from app.reranker import CrossEncoderReranker
+from app.vector_db import MathKnowledgeBase
+
+
+class FakeCrossEncoder:
+    """Prefers the shortest candidate; records each predict() batch"""
+
+    delay = 0.0
+    batches = []
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def predict(self, pairs, **kwargs):
+        type(self).batches.append(list(pairs))
+        time.sleep(self.delay)
+        return [-float(len(candidate)) for _, candidate in pairs]
+
+
+@pytest.fixture
+def fake_cross_encoder(monkeypatch):
+    monkeypatch.setattr(app.reranker, "CrossEncoder", FakeCrossEncoder)
+    monkeypatch.setattr(FakeCrossEncoder, "delay", 0.0)
+    monkeypatch.setattr(FakeCrossEncoder, "batches", [])
+    return FakeCrossEncoder
+
+
+def _results(*questions):
+    return [{"problem_id": f"p{i}", "question": q, "score": 0.9 - i / 10} for i, q in enumerate(questions)]
+
+
+def test_rerank_scores_the_top_n_in_one_batch_and_caches(fake_cross_encoder):
+    reranker = CrossEncoderReranker(top_n=3, budget_ms=1000)
+    results = _results("a longer candidate", "mid one", "x", "not scored at all, outside the top n")
+    timings = {}
+    ranked = reranker.rerank("q", "Solve q", results, timings=timings)
+    assert [r["problem_id"] for r in ranked] == ["p2", "p1", "p0", "p3"]
+    assert ranked[0]["rerank_score"] == -1.0 and "rerank_score" not in ranked[3]
+    assert len(fake_cross_encoder.batches) == 1 and len(fake_cross_encoder.batches[0]) == 3
+    assert timings["rerank"] >= 0.0
+
+    # The same (canonical) question again is answered from the cache
+    ranked = reranker.rerank("q", "solve q", _results("a longer candidate", "mid one", "x"))
+    assert [r["problem_id"] for r in ranked] == ["p2", "p1", "p0"]
+    assert len(fake_cross_encoder.batches) == 1
+
+
+def test_over_budget_keeps_the_cosine_order_and_fills_the_cache_later(fake_cross_encoder):
+    fake_cross_encoder.delay = 0.3
+    reranker = CrossEncoderReranker(top_n=3, budget_ms=20)
+    results = _results("a longer candidate", "mid one", "x")
+    assert [r["problem_id"] for r in reranker.rerank("q", "q", results)] == ["p0", "p1", "p2"]
+
+    deadline = time.monotonic() + 5
+    while len(reranker.cache) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ranked = reranker.rerank("q", "q", _results("a longer candidate", "mid one", "x"))
+    assert [r["problem_id"] for r in ranked] == ["p2", "p1", "p0"]
+    assert len(fake_cross_encoder.batches) == 1
+
+
+def test_search_similar_returns_the_reranked_top_k(monkeypatch, fake_encoder, fake_cross_encoder, sample_problems):
+    monkeypatch.setenv("KB_RERANK", "true")
+    monkeypatch.setenv("KB_RERANK_BUDGET_MS", "1000")
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+
+    timings = {}
+    cosine_best = kb.search_similar(sample_problems[0]["question"], top_k=3, score_threshold=-1.0)
+    results = kb.search_similar(sample_problems[0]["question"], top_k=1, score_threshold=-1.0, timings=timings)
+    # The fake cross-encoder prefers the shortest question, whatever the cosine order
+    assert [r["problem_id"] for r in results] == ["alg_001"]
+    assert results[0]["score"] == next(r["score"] for r in cosine_best if r["problem_id"] == "alg_001")
+    assert "rerank" in timings
@@ -0,0 +1,92 @@
+# Tests for topic/difficulty/tags prefilters (payload indexes) across the KB backends
+
+import pytest
+
+from app.langgraph_workflow import MathRAGWorkflow
+from app.payload_index import PayloadIndex, matches
+from app.vector_db import MathKnowledgeBase
+
+LIMITS = {
+    "problem_id": "calc_010",
+    "question": "Find the limit of sin(x)/x as x approaches 0",
+    "solution_steps": ["Standard limit"],
+    "final_answer": "1",
+    "difficulty": "JEE_Main",
+    "tags": ["limits"],
+    "topic": "Calculus - Limits"
+}
+
+
+def test_payload_index_intersects_fields_and_unions_values():
+    payloads = [
+        {"topic": "Calculus", "difficulty": "JEE_Advanced", "tags": ["integration"]},
+        {"topic": "Calculus - Limits", "difficulty": "JEE_Main", "tags": ["limits", "trig"]},
+        {"topic": "Algebra", "difficulty": "JEE_Main", "tags": ["trig"]},
+    ]
+    index = PayloadIndex()
+    for row, payload in enumerate(payloads):
+        index.add(row, payload)
+
+    where = {"topic": {"Calculus", "Calculus - Limits"}, "difficulty": {"JEE_Main"}}
+    assert index.select(where) == {1}
+    assert index.select({"tags": {"trig", "integration"}}) == {0, 1, 2}
+    assert list(index.arrays().select({"tags": {"trig"}, "difficulty": {"JEE_Main"}})) == [1, 2]
+    assert [row for row, p in enumerate(payloads) if matches(p, where)] == [1]
+
+    index.remove(1, payloads[1])
+    assert index.select(where) == set()
+    assert list(index.arrays().select({"tags": {"limits"}})) == []
+
+
+@pytest.fixture(params=["qdrant", "mmap", "hnsw"])
+def filtered_kb(request, monkeypatch, tmp_path, fake_encoder, sample_problems):
+    if request.param == "hnsw":
+        pytest.importorskip("hnswlib")
+    monkeypatch.setenv("KB_BACKEND", request.param)
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems + [LIMITS])
+    return kb
+
+
+def _ids(kb, **filters):
+    return sorted(r["problem_id"] for r in kb.search_similar("Find the limit", top_k=10, score_threshold=-1.0, **filters))
+
+
+def test_topic_and_difficulty_prefilters(filtered_kb):
+    kb = filtered_kb
+    assert _ids(kb) == ["alg_001", "calc_001", "calc_010", "prob_001"]
+    # A topic includes its subtopics and matches case-insensitively
+    assert _ids(kb, topic_filter="calculus") == ["calc_001", "calc_010"]
+    assert _ids(kb, topic_filter="Calculus - Limits") == ["calc_010"]
+    assert _ids(kb, difficulty_filter="JEE_Main") == ["alg_001", "calc_010", "prob_001"]
+    assert _ids(kb, topic_filter="Calculus", difficulty_filter="JEE_Advanced") == ["calc_001"]
+    assert _ids(kb, tags_filter=["limits", "polynomial"]) == ["alg_001", "calc_010"]
+    # Filters outside the KB return nothing without embedding the query
+    timings = {}
+    assert kb.search_similar("Find the limit", score_threshold=-1.0, topic_filter="Geometry", timings=timings) == []
+    assert timings["embed"] == 0.0
+
+
+def test_filters_follow_writes(filtered_kb):
+    kb = filtered_kb
+    kb.upsert_problems([dict(LIMITS, difficulty="JEE_Advanced")])
+    assert _ids(kb, difficulty_filter="JEE_Advanced") == ["calc_001", "calc_010"]
+    kb.delete_problems(["calc_001"])
+    assert _ids(kb, topic_filter="Calculus") == ["calc_010"]
+
+
+def test_workflow_passes_the_query_filters_to_the_kb():
+    calls = []
+
+    class RecordingKB:
+        def search_similar(self, query, **kwargs):
+            calls.append(kwargs)
+            return []
+
+        def get_retrieval_confidence(self, results):
+            return "none", 0.0
+
+    MathRAGWorkflow(RecordingKB(), lambda q: None, executor="direct").run("Find the limit", difficulty="JEE_Main", topic="Calculus")
+    assert calls[0]["topic_filter"] == "Calculus" and calls[0]["difficulty_filter"] == "JEE_Main"
@@ -0,0 +1,40 @@
+# Tests for Server-Timing headers on /query
+
+from fastapi.testclient import TestClient
+
+from app.metrics import format_server_timing
+
+
+def test_format_server_timing():
+    header = format_server_timing({"embed": 0.0123, "llm": 1.5})
+    assert header == "embed;dur=12.3, llm;dur=1500.0"
+
+
+def test_query_reports_stage_timings(isolated_app):
+    client = TestClient(isolated_app.app)
+    response = client.post(
+        "/query",
+        json={"question": "Solve for x: x^3 - 3x + 2 = 0", "include_timings": True}
+    )
+    assert response.status_code == 200
+
+    stages = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert stages == ["guardrail_in", "embed", "kb_search", "kb_hydrate", "llm", "guardrail_out", "serialize"]
+
+    timings = response.json()["timings"]
+    assert set(timings) == {"guardrail_in", "embed", "kb_search", "kb_hydrate", "llm", "guardrail_out"}
+    assert all(value >= 0 for value in timings.values())
+
+
+def test_timings_field_is_optional(isolated_app):
+    client = TestClient(isolated_app.app)
+    response = client.post("/query", json={"question": "Solve for x: x^3 - 3x + 2 = 0"})
+    assert "timings" not in response.json()
+    assert response.headers["Server-Timing"].startswith("guardrail_in;dur=")
+
+
+def test_rejected_query_still_has_header(isolated_app):
+    client = TestClient(isolated_app.app)
+    response = client.post("/query", json={"question": "Tell me a story about dragons"})
+    assert response.json()["source"] == "guardrails_rejected"
+    assert response.headers["Server-Timing"].startswith("guardrail_in;dur=")
@@ -0,0 +1,82 @@
+# Tests for the topic-sharded index layout (KB_SHARD_BY_TOPIC)
+
+import pytest
+
+from app.sharded_index import shard_name
+from app.vector_db import KBRebuildError, MathKnowledgeBase
+
+
+def test_shard_names_use_the_top_level_topic():
+    assert shard_name("Calculus - Integration") == shard_name("Calculus") == "calculus"
+    assert shard_name("Complex Numbers - Basic") == "complex_numbers"
+    assert shard_name(None) == shard_name("") == "general"
+
+
+@pytest.fixture
+def sharded_kb(monkeypatch, tmp_path, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_SHARD_BY_TOPIC", "true")
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    return kb
+
+
+def test_topic_search_reads_one_shard_and_fan_out_merges(sharded_kb, sample_problems, tmp_path):
+    kb = sharded_kb
+    assert sorted(p.name for p in tmp_path.glob("kb_index.*.bin")) == [
+        "kb_index.algebra.bin", "kb_index.calculus.bin", "kb_index.probability.bin"
+    ]
+    assert kb.index.shard_counts() == {"algebra": 1, "calculus": 1, "probability": 1}
+
+    searched = []
+    for name, index in kb.index.shards().items():
+        search = index.search
+        index.search = lambda *args, _name=name, _search=search, **kwargs: searched.append(_name) or _search(*args, **kwargs)
+
+    results = kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=-1.0)
+    assert sorted(searched) == ["algebra", "calculus", "probability"]
+    assert [r["problem_id"] for r in results][0] == "alg_001" and len(results) == 3
+    assert results == sorted(results, key=lambda r: r["score"], reverse=True)
+
+    searched.clear()
+    results = kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=-1.0, topic_filter="Probability")
+    assert searched == ["probability"]
+    assert [r["problem_id"] for r in results] == ["prob_001"]
+
+
+def test_topic_change_moves_a_problem_and_other_workers_see_new_shards(sharded_kb, sample_problems):
+    kb = sharded_kb
+    kb.upsert_problems([dict(sample_problems[1], topic="Geometry - Lines")])
+    assert kb.index.shard_counts() == {"algebra": 0, "calculus": 1, "geometry": 1, "probability": 1}
+    assert kb.get_problem("alg_001")["topic"] == "Geometry - Lines"
+    assert kb.count_problems() == 3
+
+    other = MathKnowledgeBase()
+    assert set(other.index.shards()) == {"algebra", "calculus", "geometry", "probability"}
+    assert other.has_problem("alg_001")
+
+
+def test_one_shard_rebuilds_while_the_others_stay_untouched(sharded_kb, sample_problems):
+    kb = sharded_kb
+    generations = {name: index.generation for name, index in kb.index.shards().items()}
+    replacement = dict(sample_problems[1], problem_id="alg_002", question="Solve 2x + 3 = 7")
+
+    report = kb.rebuild(sample_problems + [replacement], topic="Algebra")
+    assert report["shard"] == "algebra" and report["count"] == 2
+    after = {name: index.generation for name, index in kb.index.shards().items()}
+    assert after["algebra"] > generations["algebra"]
+    assert {k: v for k, v in after.items() if k != "algebra"} == {k: v for k, v in generations.items() if k != "algebra"}
+    assert kb.count_problems() == 4
+
+    # A failed validation of the whole layout rolls every shard back
+    with pytest.raises(KBRebuildError):
+        kb.rebuild(sample_problems[:1], validation_queries=[("unrelated", "missing_999")])
+    assert kb.count_problems() == 4 and kb.has_problem("alg_002")
+
+
+def test_topic_rebuild_needs_sharding(monkeypatch, fake_encoder, sample_problems):
+    kb = MathKnowledgeBase()
+    with pytest.raises(ValueError):
+        kb.rebuild(sample_problems, topic="Algebra")
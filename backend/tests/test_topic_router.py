@@ -0,0 +1,91 @@
+# Tests for the embedding-centroid topic router (KB_TOPIC_ROUTER)
+
+import numpy as np
+import pytest
+
+from app.topic_router import TopicRouter
+from app.vector_db import MathKnowledgeBase
+
+
+def test_incremental_centroids_match_a_full_recompute(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(6, 8))
+    topics = ["Calculus", "Calculus - Limits", "Algebra", "Algebra", "Probability", "Calculus"]
+
+    incremental = TopicRouter(8)
+    incremental.add(zip(topics, vectors))
+    incremental.remove([(topics[5], vectors[5]), (topics[4], vectors[4])])
+    full = TopicRouter(8)
+    full.reset(zip(topics[:4], vectors[:4]), generation=3)
+
+    assert incremental.counts() == full.counts() == {"Algebra": 2, "Calculus": 2}
+    assert np.allclose(incremental.centroids()[1], full.centroids()[1], atol=1e-6)
+
+    path = str(tmp_path / "kb_index.bin.centroids.npz")
+    full.save(path)
+    loaded = TopicRouter(8)
+    assert not loaded.load(path, generation=4)
+    assert loaded.load(path, generation=3) and loaded.counts() == full.counts()
+
+
+def test_prediction_needs_a_clear_winner():
+    router = TopicRouter(3, min_similarity=0.5, min_margin=0.1)
+    router.add([("Algebra", [1, 0, 0]), ("Calculus", [0, 1, 0])])
+    assert router.predict([1, 0.1, 0]).topic == "Algebra" and router.predict([1, 0.1, 0]).confident
+    assert not router.predict([1, 1, 0]).confident   # tie
+    assert not router.predict([0, 0.1, 1]).confident  # far from every topic
+
+
+@pytest.fixture
+def routed_kb(monkeypatch, tmp_path, fake_encoder, sample_problems):
+    monkeypatch.setenv("KB_BACKEND", "mmap")
+    monkeypatch.setenv("KB_INDEX_PATH", str(tmp_path / "kb_index.bin"))
+    monkeypatch.setenv("KB_SHARD_BY_TOPIC", "true")
+    monkeypatch.setenv("KB_TOPIC_ROUTER", "true")
+    monkeypatch.setenv("KB_FINGERPRINT_LOOKUP", "false")
+    kb = MathKnowledgeBase()
+    kb.upsert_problems(sample_problems)
+    return kb
+
+
+def _record_shard_searches(kb):
+    searched = []
+    for name, index in kb.index.shards().items():
+        search = index.search
+        index.search = lambda *args, _name=name, _search=search, **kwargs: searched.append(_name) or _search(*args, **kwargs)
+    return searched
+
+
+def test_confident_queries_search_one_shard_and_others_fall_back(routed_kb, sample_problems, monkeypatch):
+    kb = routed_kb
+    searched = _record_shard_searches(kb)
+    results = kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=-1.0)
+    assert searched == ["algebra"]
+    assert [r["problem_id"] for r in results] == ["alg_001"]
+
+    # Not confident: the whole KB is searched
+    searched.clear()
+    monkeypatch.setattr(kb.topic_router, "min_margin", 2.0)
+    assert len(kb.search_similar(sample_problems[1]["question"], top_k=3, score_threshold=-1.0)) == 3
+    assert sorted(searched) == ["algebra", "calculus", "probability"]
+
+
+def test_writes_update_the_centroids_and_other_workers_load_them(routed_kb, sample_problems, monkeypatch):
+    kb = routed_kb
+    kb.current_topic_router()
+    monkeypatch.setattr(kb.topic_router, "reset", lambda *args: pytest.fail("recomputed instead of updating"))
+    limits = dict(sample_problems[0], problem_id="calc_010", question="Find the limit of sin(x)/x as x approaches 0", topic="Calculus - Limits")
+    kb.upsert_problems([limits])
+    kb.delete_problems(["prob_001"])
+    router = kb.current_topic_router()
+    assert router.generation == kb.generation
+    assert router.counts() == {"Algebra": 1, "Calculus": 2}
+
+    expected = TopicRouter(kb.embedding_dim)
+    catalog = kb.index.catalog()
+    expected.reset(((catalog[pid][0], kb.index.vectors([pid])[0]) for pid in catalog), kb.generation)
+    assert np.allclose(router.centroids()[1], expected.centroids()[1], atol=1e-5)
+
+    other = MathKnowledgeBase()
+    monkeypatch.setattr(other.topic_router, "reset", lambda *args: pytest.fail("recomputed instead of loading"))
+    assert other.current_topic_router().counts() == router.counts()
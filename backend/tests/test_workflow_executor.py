@@ -0,0 +1,64 @@
+# Tests that the direct executor matches LangGraph's graph.invoke
+
+import pytest
+
+from app.langgraph_workflow import MathRAGWorkflow
+
+
+class StubKB:
+    def __init__(self, results):
+        self.results = results
+
+    def search_similar(self, query, **kwargs):
+        return [dict(r) for r in self.results]
+
+    def hydrate(self, hits, timings=None):
+        return [dict(h) for h in hits]
+
+    def get_retrieval_confidence(self, results):
+        if not results:
+            return "none", 0.0
+        return "high", results[0]["score"]
+
+
+MATCH = {
+    "problem_id": "alg_001",
+    "score": 0.92,
+    "question": "Solve for x: x^3 - 3x + 2 = 0",
+    "solution_steps": ["Factor"],
+    "final_answer": "x = 1, x = -2",
+    "difficulty": "JEE_Main",
+    "topic": "Algebra"
+}
+
+
+def _strip_timings(state):
+    return {k: v for k, v in state.items() if k != "timings"}
+
+
+@pytest.mark.parametrize("results, answer, expected_source", [
+    ([MATCH], "Step 1: factor", "perplexity_with_db"),
+    ([], "Step 1: search the web", "perplexity_web"),
+    ([], None, "not_found"),
+])
+def test_direct_executor_matches_langgraph(results, answer, expected_source):
+    states = {}
+    for executor in ("langgraph", "direct"):
+        workflow = MathRAGWorkflow(StubKB(results), lambda q: answer, executor=executor)
+        states[executor] = workflow.run("Solve for x: x^3 - 3x + 2 = 0")
+
+    assert states["direct"]["source"] == expected_source
+    assert _strip_timings(states["direct"]) == _strip_timings(states["langgraph"])
+    assert set(states["direct"]["timings"]) == set(states["langgraph"]["timings"])
+
+
+def test_executor_from_environment(monkeypatch):
+    monkeypatch.setenv("WORKFLOW_EXECUTOR", "direct")
+    workflow = MathRAGWorkflow(StubKB([]), lambda q: "ok")
+    assert workflow.executor == "direct"
+    assert workflow.graph is None
+
+
+def test_unknown_executor_rejected():
+    with pytest.raises(ValueError):
+        MathRAGWorkflow(StubKB([]), lambda q: "ok", executor="threads")
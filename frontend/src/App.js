@@ -658,7 +658,7 @@ function App() {
                         {(match.score * 100).toFixed(1)}%
                       </span>
                     </div>
-                    <p className="match-question">{match.question}</p>
+                    {match.question && <p className="match-question">{match.question}</p>}
                     <div className="match-meta">
                       <span className="match-topic">{match.topic}</span>
                       <span className="match-difficulty">{match.difficulty}</span>